@@ -13,6 +13,8 @@ from app.models.ruleset import Ruleset
 from app.models.setting import Setting
 from app.services.ruleset_parser import RulesetParser
 from app.services.role_manager import RoleManager
+from app.services.ruleset_cache import RulesetCache
+from app.services.balance_ledger import BalanceLedgerService
 from app.templates_config import templates
 from app.utils.flash import flash
 
@@ -46,7 +48,7 @@ def _get_ruleset_filename_for_event_type(event_type: str, year: int) -> Optional
     return f"{prefix}_{year}.yaml"
 
 
-async def _try_import_ruleset_from_github(
+def _try_import_ruleset_from_github(
     db: Session,
     event_id: int,
     event_type: str,
@@ -92,8 +94,8 @@ async def _try_import_ruleset_from_github(
         logger.info(f"Attempting to import ruleset from: {raw_url}")
 
         # Datei von GitHub herunterladen
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(raw_url)
+        with httpx.Client(timeout=10.0) as client:
+            response = client.get(raw_url)
 
             if response.status_code != 200:
                 logger.info(f"Ruleset file not found on GitHub (HTTP {response.status_code})")
@@ -139,6 +141,7 @@ async def _try_import_ruleset_from_github(
         db.add(ruleset)
         db.commit()
         db.refresh(ruleset)
+        RulesetCache.invalidate(event_id)
 
         # Rollen aus Ruleset erstellen
         if data.get("role_discounts"):
@@ -158,7 +161,7 @@ async def _try_import_ruleset_from_github(
 
 
 @router.get("/", response_class=HTMLResponse)
-async def landing_page(request: Request, db: Session = Depends(get_db), error: str = None):
+def landing_page(request: Request, db: Session = Depends(get_db), error: str = None):
     """Landing Page für Freizeit-Auswahl oder -Erstellung"""
     logger.info("Loading landing page")
 
@@ -178,7 +181,7 @@ async def landing_page(request: Request, db: Session = Depends(get_db), error: s
 
 
 @router.post("/select", response_class=HTMLResponse)
-async def select_event(
+def select_event(
     request: Request,
     db: Session = Depends(get_db),
     event_id: int = Form(...)
@@ -207,7 +210,7 @@ async def select_event(
 
 
 @router.post("/create", response_class=HTMLResponse)
-async def create_event(
+def create_event(
     request: Request,
     db: Session = Depends(get_db),
     name: str = Form(...),
@@ -251,7 +254,7 @@ async def create_event(
             logger.info(f"Created default settings for event {event.id}")
 
         # Versuche passendes Ruleset von GitHub zu importieren
-        await _try_import_ruleset_from_github(db, event.id, event_type, start_date_obj, request)
+        _try_import_ruleset_from_github(db, event.id, event_type, start_date_obj, request)
 
         # Event-ID in Session speichern
         request.session["event_id"] = event.id
@@ -269,7 +272,7 @@ async def create_event(
 
 
 @router.get("/logout")
-async def logout(request: Request):
+def logout(request: Request):
     """Logout - Entfernt Event aus Session"""
     event_id = request.session.get("event_id")
     event_name = request.session.get("event_name")
@@ -281,13 +284,13 @@ async def logout(request: Request):
 
 
 @router.get("/switch", response_class=HTMLResponse)
-async def switch_event_page(request: Request):
+def switch_event_page(request: Request):
     """Seite zum Wechseln der Freizeit"""
     return RedirectResponse(url="/auth/logout", status_code=303)
 
 
 @router.post("/delete", response_class=HTMLResponse)
-async def delete_event(
+def delete_event(
     request: Request,
     db: Session = Depends(get_db),
     event_id: int = Form(...)
@@ -312,9 +315,11 @@ async def delete_event(
         request.session.clear()
         logger.debug(f"Cleared session as deleted event was currently active")
 
-    # Event löschen (Cascade löscht alle zugehörigen Daten)
+    # Event löschen (Cascade löscht alle zugehörigen Daten, das Ledger hat keinen Fremdschlüssel)
     db.delete(event)
+    BalanceLedgerService.remove(db, event_id)
     db.commit()
+    RulesetCache.invalidate(event_id)
 
     logger.info(f"Successfully deleted event {event_id} ('{event_name}')")
     flash(request, f"Event '{event_name}' wurde gelöscht", "info")
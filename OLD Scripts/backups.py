@@ -7,6 +7,10 @@ from sqlalchemy.orm import Session
 from app.database import get_db
 from app.dependencies import get_current_event_id
 from app.services.backup_service import BackupService
+from app.services.search_index import SearchIndexService
+from app.services.event_revision import EventRevisionService
+from app.services.payment_rollup import PaymentRollupService
+from app.services.dashboard_charts import DashboardChartService
 from app.utils.flash import flash
 from app.templates_config import templates
 from app.config import settings
@@ -23,7 +27,7 @@ backup_service = BackupService(
 
 
 @router.get("/", response_class=HTMLResponse)
-async def list_backups(
+def list_backups(
     request: Request,
     db: Session = Depends(get_db),
     event_id: int = Depends(get_current_event_id)
@@ -49,7 +53,7 @@ async def list_backups(
 
 
 @router.post("/create")
-async def create_backup(
+def create_backup(
     request: Request,
     description: str = Form(default=""),
     db: Session = Depends(get_db),
@@ -67,7 +71,7 @@ async def create_backup(
 
 
 @router.post("/{filename}/delete")
-async def delete_backup(
+def delete_backup(
     filename: str,
     request: Request,
     db: Session = Depends(get_db),
@@ -87,7 +91,7 @@ async def delete_backup(
 
 
 @router.get("/{filename}/download")
-async def download_backup(
+def download_backup(
     filename: str,
     db: Session = Depends(get_db),
     event_id: int = Depends(get_current_event_id)
@@ -111,7 +115,7 @@ async def download_backup(
 
 
 @router.post("/cleanup")
-async def cleanup_old_backups(
+def cleanup_old_backups(
     request: Request,
     max_age_days: int = Form(default=30),
     keep_min: int = Form(default=5),
@@ -133,7 +137,7 @@ async def cleanup_old_backups(
 
 
 @router.post("/{filename}/restore")
-async def restore_backup(
+def restore_backup(
     filename: str,
     request: Request,
     db: Session = Depends(get_db),
@@ -142,6 +146,10 @@ async def restore_backup(
     """Stellt ein Backup wieder her"""
     try:
         backup_service.restore_backup(filename)
+        SearchIndexService.invalidate()
+        EventRevisionService.invalidate()
+        PaymentRollupService.invalidate()
+        DashboardChartService.invalidate()
         flash(request, f"Backup '{filename}' erfolgreich wiederhergestellt. Bitte Anwendung neu starten!", "success")
     except FileNotFoundError:
         flash(request, f"Backup '{filename}' nicht gefunden", "error")
@@ -0,0 +1,597 @@
+"""Balance Ledger Service - Materialisierte Salden pro Event, Teilnehmer und Familie"""
+import logging
+import argparse
+from collections import defaultdict
+from typing import Dict, Any, Optional, Tuple, List, Iterable
+from sqlalchemy import Column, Integer, String, Numeric, DateTime, UniqueConstraint, Index, func
+from sqlalchemy.orm import Session
+
+from app.database import Base
+from app.utils.datetime_utils import utcnow
+
+logger = logging.getLogger(__name__)
+
+# Geltungsbereiche eines Ledger-Eintrags
+SCOPE_EVENT = "event"
+SCOPE_PARTICIPANT = "participant"
+SCOPE_FAMILY = "family"
+
+# Betragsfelder eines Ledger-Eintrags
+LEDGER_FIELDS = ("expected_income", "payments_total", "incomes_total", "expenses_total", "expenses_settled_total")
+
+# Zahlungsstatus-Felder (nur Teilnehmer/Familie, inkl. anteiliger Familienzahlungen)
+STATUS_FIELDS = ("total_paid", "outstanding")
+
+# Zahlungsstatus
+PAYMENT_STATUS_PAID = "paid"
+PAYMENT_STATUS_OUTSTANDING = "outstanding"
+
+# Ab diesem offenen Betrag gilt ein Teilnehmer/eine Familie als nicht bezahlt
+PAYMENT_STATUS_TOLERANCE = 0.01
+
+# Toleranz beim Abgleich mit der vollständigen Neuberechnung (Rundung auf Cent)
+VERIFY_TOLERANCE = 0.005
+
+
+class BalanceLedger(Base):
+    """
+    Materialisierter Saldo
+
+    Ein Eintrag pro Event (reference_id = 0), pro Teilnehmer und pro Familie.
+    Wird von den Schreib-Handlern in derselben Transaktion aktualisiert.
+
+    - expected_income: Summe final_price (nur aktive Teilnehmer)
+    - payments_total: Zahlungseingänge (Event: alle Zahlungen, Teilnehmer: direkte Zahlungen,
+      Familie: Familienzahlungen + Zahlungen an Mitglieder)
+    - incomes_total / expenses_total / expenses_settled_total: nur auf Event-Ebene
+    - total_paid / outstanding / payment_status: Zahlungsstatus wie in der Teilnehmerliste
+      (PaymentAllocation, d.h. inkl. anteiliger Familienzahlungen), nur Teilnehmer/Familie
+    """
+    __tablename__ = "balance_ledger"
+    __table_args__ = (
+        UniqueConstraint("event_id", "scope", "reference_id", name="uq_balance_ledger_scope"),
+        Index("ix_balance_ledger_event_scope", "event_id", "scope"),
+        Index("ix_balance_ledger_payment_status", "event_id", "scope", "payment_status"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    event_id = Column(Integer, nullable=False)
+    scope = Column(String(20), nullable=False)
+    reference_id = Column(Integer, nullable=False, default=0)
+
+    expected_income = Column(Numeric(12, 2), nullable=False, default=0)
+    payments_total = Column(Numeric(12, 2), nullable=False, default=0)
+    incomes_total = Column(Numeric(12, 2), nullable=False, default=0)
+    expenses_total = Column(Numeric(12, 2), nullable=False, default=0)
+    expenses_settled_total = Column(Numeric(12, 2), nullable=False, default=0)
+
+    total_paid = Column(Numeric(12, 2), nullable=False, default=0)
+    outstanding = Column(Numeric(12, 2), nullable=False, default=0)
+    payment_status = Column(String(20), nullable=True)
+
+    updated_at = Column(DateTime, default=utcnow, onupdate=utcnow)
+
+    @property
+    def outstanding_income(self) -> float:
+        """Offene Zahlungseingänge (Soll - Ist)"""
+        return float(self.expected_income or 0) - float(self.payments_total or 0)
+
+    @property
+    def open_expenses(self) -> float:
+        """Noch nicht beglichene Ausgaben"""
+        return float(self.expenses_total or 0) - float(self.expenses_settled_total or 0)
+
+
+class BalanceLedgerService:
+    """Service für das Pflegen, Lesen und Neuaufbauen des Balance-Ledgers"""
+
+    # ===== Lesen =====
+
+    @staticmethod
+    def get_event_balance(db: Session, event_id: int) -> BalanceLedger:
+        """
+        Liefert den Event-Saldo (O(1) Lookup), baut das Ledger bei Bedarf auf
+
+        Args:
+            db: Datenbank-Session
+            event_id: ID des Events
+
+        Returns:
+            BalanceLedger-Eintrag des Events
+        """
+        entry = BalanceLedgerService._get_entry(db, event_id, SCOPE_EVENT, 0)
+        if entry is None:
+            logger.info(f"Balance ledger for event {event_id} missing, rebuilding")
+            BalanceLedgerService.rebuild(db, event_id)
+            db.commit()
+            entry = BalanceLedgerService._get_entry(db, event_id, SCOPE_EVENT, 0)
+        return entry
+
+    # ===== Inkrementelle Aktualisierung (von den Schreib-Handlern aufgerufen) =====
+
+    @staticmethod
+    def snapshot_payment(payment) -> Optional[Tuple[float, Optional[int], Optional[int]]]:
+        """Momentaufnahme einer Zahlung für payment_changed (Betrag, Teilnehmer-ID, Familien-ID)"""
+        if payment is None:
+            return None
+        return (float(payment.amount or 0), payment.participant_id, payment.family_id)
+
+    @staticmethod
+    def snapshot_expense(expense) -> Optional[Tuple[float, bool]]:
+        """Momentaufnahme einer Ausgabe für expense_changed (Betrag, beglichen)"""
+        if expense is None:
+            return None
+        return (float(expense.amount or 0), bool(expense.is_settled))
+
+    @staticmethod
+    def snapshot_participant(participant) -> Optional[Tuple[float, Optional[int]]]:
+        """Momentaufnahme eines Teilnehmers für participant_changed (Sollpreis wenn aktiv, Familien-ID)"""
+        if participant is None:
+            return None
+        expected = float(participant.final_price) if participant.is_active else 0.0
+        return (expected, participant.family_id)
+
+    @staticmethod
+    def payment_changed(
+        db: Session,
+        event_id: int,
+        old: Optional[Tuple[float, Optional[int], Optional[int]]] = None,
+        new: Optional[Tuple[float, Optional[int], Optional[int]]] = None
+    ) -> None:
+        """
+        Aktualisiert das Ledger nach Anlegen, Bearbeiten oder Löschen einer Zahlung
+
+        Args:
+            db: Datenbank-Session (Änderung wird vom Handler committed)
+            event_id: ID des Events
+            old: Momentaufnahme vor der Änderung (None bei Neuanlage)
+            new: Momentaufnahme nach der Änderung (None beim Löschen)
+        """
+        if not BalanceLedgerService._ensure_initialized(db, event_id):
+            return
+
+        old_amount = old[0] if old else 0.0
+        new_amount = new[0] if new else 0.0
+        BalanceLedgerService._apply_delta(db, event_id, SCOPE_EVENT, 0, payments_total=new_amount - old_amount)
+
+        participant_ids = {snap[1] for snap in (old, new) if snap and snap[1]}
+        family_ids = {snap[2] for snap in (old, new) if snap and snap[2]}
+        family_ids |= BalanceLedgerService._family_ids_of(db, participant_ids)
+
+        BalanceLedgerService._refresh_participants(db, event_id, participant_ids)
+        BalanceLedgerService._refresh_families(db, event_id, family_ids)
+        BalanceLedgerService._refresh_payment_status(db, event_id, participant_ids, family_ids)
+
+    @staticmethod
+    def income_changed(db: Session, event_id: int, old_amount: float = 0.0, new_amount: float = 0.0) -> None:
+        """
+        Aktualisiert das Ledger nach Anlegen, Bearbeiten oder Löschen einer Einnahme
+
+        Args:
+            db: Datenbank-Session
+            event_id: ID des Events
+            old_amount: Betrag vor der Änderung (0 bei Neuanlage)
+            new_amount: Betrag nach der Änderung (0 beim Löschen)
+        """
+        if not BalanceLedgerService._ensure_initialized(db, event_id):
+            return
+
+        BalanceLedgerService._apply_delta(
+            db, event_id, SCOPE_EVENT, 0,
+            incomes_total=float(new_amount or 0) - float(old_amount or 0)
+        )
+
+    @staticmethod
+    def expense_changed(
+        db: Session,
+        event_id: int,
+        old: Optional[Tuple[float, bool]] = None,
+        new: Optional[Tuple[float, bool]] = None
+    ) -> None:
+        """
+        Aktualisiert das Ledger nach Anlegen, Bearbeiten, Begleichen oder Löschen einer Ausgabe
+
+        Args:
+            db: Datenbank-Session
+            event_id: ID des Events
+            old: Momentaufnahme vor der Änderung (None bei Neuanlage)
+            new: Momentaufnahme nach der Änderung (None beim Löschen)
+        """
+        if not BalanceLedgerService._ensure_initialized(db, event_id):
+            return
+
+        old_amount, old_settled = old if old else (0.0, False)
+        new_amount, new_settled = new if new else (0.0, False)
+
+        BalanceLedgerService._apply_delta(
+            db, event_id, SCOPE_EVENT, 0,
+            expenses_total=new_amount - old_amount,
+            expenses_settled_total=(new_amount if new_settled else 0.0) - (old_amount if old_settled else 0.0)
+        )
+
+    @staticmethod
+    def participant_changed(
+        db: Session,
+        event_id: int,
+        participant,
+        old: Optional[Tuple[float, Optional[int]]] = None
+    ) -> None:
+        """
+        Aktualisiert das Ledger nach Anlegen, Bearbeiten oder (Soft-)Löschen eines Teilnehmers
+
+        Args:
+            db: Datenbank-Session
+            event_id: ID des Events
+            participant: Teilnehmer nach der Änderung
+            old: Momentaufnahme vor der Änderung (None bei Neuanlage)
+        """
+        if not BalanceLedgerService._ensure_initialized(db, event_id):
+            return
+
+        new = BalanceLedgerService.snapshot_participant(participant)
+        old_expected = old[0] if old else 0.0
+        BalanceLedgerService._apply_delta(db, event_id, SCOPE_EVENT, 0, expected_income=new[0] - old_expected)
+
+        family_ids = {snap[1] for snap in (old, new) if snap and snap[1]}
+        BalanceLedgerService._refresh_participants(db, event_id, {participant.id})
+        BalanceLedgerService._refresh_families(db, event_id, family_ids)
+        BalanceLedgerService._refresh_payment_status(db, event_id, {participant.id}, family_ids)
+
+    # ===== Neuaufbau und Prüfung =====
+
+    @staticmethod
+    def compute(db: Session, event_id: int) -> Dict[Tuple[str, int], Dict[str, float]]:
+        """
+        Berechnet alle Ledger-Werte eines Events vollständig aus den Quelltabellen
+
+        Args:
+            db: Datenbank-Session
+            event_id: ID des Events
+
+        Returns:
+            Dictionary (scope, reference_id) -> Betragsfelder
+        """
+        from app.models import Participant, Family, Payment, Income, Expense
+        from app.services.payment_allocation import PaymentAllocationService
+
+        entries = defaultdict(lambda: {field: 0.0 for field in LEDGER_FIELDS + STATUS_FIELDS})
+        event_entry = entries[(SCOPE_EVENT, 0)]
+
+        participants = db.query(Participant).filter(Participant.event_id == event_id).all()
+        family_of = {}
+        for participant in participants:
+            expected = float(participant.final_price) if participant.is_active else 0.0
+            entries[(SCOPE_PARTICIPANT, participant.id)]["expected_income"] += expected
+            event_entry["expected_income"] += expected
+            if participant.family_id:
+                family_of[participant.id] = participant.family_id
+                entries[(SCOPE_FAMILY, participant.family_id)]["expected_income"] += expected
+
+        payments = db.query(Payment.participant_id, Payment.family_id, Payment.amount).filter(
+            Payment.event_id == event_id
+        ).all()
+        for participant_id, family_id, amount in payments:
+            amount = float(amount or 0)
+            event_entry["payments_total"] += amount
+            if participant_id:
+                entries[(SCOPE_PARTICIPANT, participant_id)]["payments_total"] += amount
+                if participant_id in family_of:
+                    entries[(SCOPE_FAMILY, family_of[participant_id])]["payments_total"] += amount
+            if family_id:
+                entries[(SCOPE_FAMILY, family_id)]["payments_total"] += amount
+
+        event_entry["incomes_total"] = float(db.query(func.sum(Income.amount)).filter(
+            Income.event_id == event_id
+        ).scalar() or 0)
+
+        for amount, is_settled in db.query(Expense.amount, Expense.is_settled).filter(Expense.event_id == event_id).all():
+            event_entry["expenses_total"] += float(amount or 0)
+            if is_settled:
+                event_entry["expenses_settled_total"] += float(amount or 0)
+
+        # Zahlungsstatus (gleiche Verteilung wie in der Teilnehmerliste), ein Eintrag je Familie
+        allocation = PaymentAllocationService.allocate(
+            participants,
+            {key[1]: values["payments_total"] for key, values in entries.items() if key[0] == SCOPE_PARTICIPANT},
+            {
+                family_id: float(amount)
+                for family_id, amount in db.query(Payment.family_id, func.sum(Payment.amount)).filter(
+                    Payment.event_id == event_id,
+                    Payment.family_id.isnot(None)
+                ).group_by(Payment.family_id).all()
+            }
+        )
+        for participant_id, balance in allocation.participant_balances.items():
+            entries[(SCOPE_PARTICIPANT, participant_id)]["total_paid"] = round(balance["total_paid"], 2)
+            entries[(SCOPE_PARTICIPANT, participant_id)]["outstanding"] = round(balance["outstanding"], 2)
+        for (family_id,) in db.query(Family.id).filter(Family.event_id == event_id).all():
+            balance = allocation.get_family(family_id)
+            entries[(SCOPE_FAMILY, family_id)]["total_paid"] = round(balance["total_paid"], 2)
+            entries[(SCOPE_FAMILY, family_id)]["outstanding"] = round(balance["outstanding"], 2)
+
+        return dict(entries)
+
+    @staticmethod
+    def rebuild(db: Session, event_id: int) -> int:
+        """
+        Baut das Ledger eines Events vollständig neu auf (ohne Commit)
+
+        Args:
+            db: Datenbank-Session
+            event_id: ID des Events
+
+        Returns:
+            Anzahl der geschriebenen Ledger-Einträge
+        """
+        db.flush()
+        computed = BalanceLedgerService.compute(db, event_id)
+
+        db.query(BalanceLedger).filter(BalanceLedger.event_id == event_id).delete(synchronize_session=False)
+        db.bulk_insert_mappings(BalanceLedger, [
+            {
+                "event_id": event_id,
+                "scope": scope,
+                "reference_id": reference_id,
+                **values,
+                "payment_status": None if scope == SCOPE_EVENT else BalanceLedgerService.status_for(values["outstanding"])
+            }
+            for (scope, reference_id), values in computed.items()
+        ])
+
+        logger.info(f"Balance ledger rebuilt for event {event_id}: {len(computed)} entries")
+        return len(computed)
+
+    @staticmethod
+    def remove(db: Session, event_id: int) -> int:
+        """
+        Entfernt alle Ledger-Einträge eines Events (ohne Commit), z.B. beim Löschen des Events
+
+        Das Ledger hat keinen Fremdschlüssel auf das Event; ohne Entfernen würde
+        ein neues Event mit wiederverwendeter ID die alten Salden übernehmen.
+
+        Args:
+            db: Datenbank-Session
+            event_id: ID des Events
+
+        Returns:
+            Anzahl der gelöschten Ledger-Einträge
+        """
+        removed = db.query(BalanceLedger).filter(BalanceLedger.event_id == event_id).delete(synchronize_session=False)
+        logger.info(f"Balance ledger removed for event {event_id}: {removed} entries")
+        return removed
+
+    @staticmethod
+    def verify(db: Session, event_id: int) -> List[str]:
+        """
+        Vergleicht das gespeicherte Ledger mit einer vollständigen Neuberechnung
+
+        Args:
+            db: Datenbank-Session
+            event_id: ID des Events
+
+        Returns:
+            Liste der gefundenen Abweichungen (leer wenn konsistent)
+        """
+        computed = BalanceLedgerService.compute(db, event_id)
+        stored = {
+            (entry.scope, entry.reference_id): entry
+            for entry in db.query(BalanceLedger).filter(BalanceLedger.event_id == event_id).all()
+        }
+
+        differences = []
+        for key in sorted(set(computed) | set(stored), key=lambda k: (k[0], k[1])):
+            expected_values = computed.get(key, {field: 0.0 for field in LEDGER_FIELDS + STATUS_FIELDS})
+            entry = stored.get(key)
+            for field in LEDGER_FIELDS + STATUS_FIELDS:
+                actual = float(getattr(entry, field) or 0) if entry else 0.0
+                if abs(actual - expected_values[field]) > VERIFY_TOLERANCE:
+                    differences.append(
+                        f"{key[0]}:{key[1]} {field}: gespeichert {actual:.2f}, berechnet {expected_values[field]:.2f}"
+                    )
+            if key[0] != SCOPE_EVENT:
+                expected_status = BalanceLedgerService.status_for(expected_values["outstanding"])
+                actual_status = entry.payment_status if entry else None
+                if actual_status != expected_status:
+                    differences.append(
+                        f"{key[0]}:{key[1]} payment_status: gespeichert {actual_status}, berechnet {expected_status}"
+                    )
+        return differences
+
+    @staticmethod
+    def status_for(outstanding: float) -> str:
+        """Zahlungsstatus zu einem offenen Betrag (paid oder outstanding)"""
+        return PAYMENT_STATUS_OUTSTANDING if float(outstanding or 0) > PAYMENT_STATUS_TOLERANCE else PAYMENT_STATUS_PAID
+
+    # ===== Interne Hilfsfunktionen =====
+
+    @staticmethod
+    def _get_entry(db: Session, event_id: int, scope: str, reference_id: int) -> Optional[BalanceLedger]:
+        return db.query(BalanceLedger).filter(
+            BalanceLedger.event_id == event_id,
+            BalanceLedger.scope == scope,
+            BalanceLedger.reference_id == reference_id
+        ).first()
+
+    @staticmethod
+    def _get_or_create_entry(db: Session, event_id: int, scope: str, reference_id: int) -> BalanceLedger:
+        entry = BalanceLedgerService._get_entry(db, event_id, scope, reference_id)
+        if entry is None:
+            entry = BalanceLedger(
+                event_id=event_id,
+                scope=scope,
+                reference_id=reference_id,
+                **{field: 0 for field in LEDGER_FIELDS + STATUS_FIELDS}
+            )
+            db.add(entry)
+        return entry
+
+    @staticmethod
+    def _ensure_initialized(db: Session, event_id: int) -> bool:
+        """
+        Stellt sicher, dass das Ledger des Events existiert
+
+        Fehlt es (z.B. nach einem Update), wird es inklusive der aktuellen,
+        noch nicht committeten Änderung neu aufgebaut.
+
+        Returns:
+            True wenn inkrementell aktualisiert werden soll, False wenn neu aufgebaut wurde
+        """
+        if BalanceLedgerService._get_entry(db, event_id, SCOPE_EVENT, 0) is not None:
+            return True
+        BalanceLedgerService.rebuild(db, event_id)
+        return False
+
+    @staticmethod
+    def _apply_delta(db: Session, event_id: int, scope: str, reference_id: int, **deltas: float) -> None:
+        entry = BalanceLedgerService._get_or_create_entry(db, event_id, scope, reference_id)
+        for field, delta in deltas.items():
+            setattr(entry, field, round(float(getattr(entry, field) or 0) + delta, 2))
+
+    @staticmethod
+    def _family_ids_of(db: Session, participant_ids: Iterable[int]) -> set:
+        from app.models import Participant
+
+        participant_ids = list(participant_ids)
+        if not participant_ids:
+            return set()
+        rows = db.query(Participant.family_id).filter(
+            Participant.id.in_(participant_ids),
+            Participant.family_id.isnot(None)
+        ).all()
+        return {row[0] for row in rows}
+
+    @staticmethod
+    def _refresh_participants(db: Session, event_id: int, participant_ids: Iterable[int]) -> None:
+        """Berechnet die Teilnehmer-Einträge aus den Quelltabellen neu (O(Zahlungen des Teilnehmers))"""
+        from app.models import Participant, Payment
+
+        db.flush()
+        for participant_id in participant_ids:
+            participant = db.query(Participant).filter(Participant.id == participant_id).first()
+            if not participant:
+                continue
+            entry = BalanceLedgerService._get_or_create_entry(db, event_id, SCOPE_PARTICIPANT, participant_id)
+            entry.expected_income = float(participant.final_price) if participant.is_active else 0.0
+            entry.payments_total = float(db.query(func.sum(Payment.amount)).filter(
+                Payment.participant_id == participant_id
+            ).scalar() or 0)
+
+    @staticmethod
+    def _refresh_families(db: Session, event_id: int, family_ids: Iterable[int]) -> None:
+        """Berechnet die Familien-Einträge aus den Quelltabellen neu (O(Familiengröße))"""
+        from app.models import Participant, Payment
+
+        db.flush()
+        for family_id in family_ids:
+            members = db.query(Participant).filter(Participant.family_id == family_id).all()
+            member_ids = [member.id for member in members]
+
+            family_payments = float(db.query(func.sum(Payment.amount)).filter(
+                Payment.family_id == family_id
+            ).scalar() or 0)
+            member_payments = 0.0
+            if member_ids:
+                member_payments = float(db.query(func.sum(Payment.amount)).filter(
+                    Payment.participant_id.in_(member_ids)
+                ).scalar() or 0)
+
+            entry = BalanceLedgerService._get_or_create_entry(db, event_id, SCOPE_FAMILY, family_id)
+            entry.expected_income = float(sum((m.final_price for m in members if m.is_active), 0))
+            entry.payments_total = family_payments + member_payments
+
+
+    @staticmethod
+    def _set_payment_status(db: Session, event_id: int, scope: str, reference_id: int, balance: Dict[str, Any]) -> None:
+        entry = BalanceLedgerService._get_or_create_entry(db, event_id, scope, reference_id)
+        entry.total_paid = round(balance["total_paid"], 2)
+        entry.outstanding = round(balance["outstanding"], 2)
+        entry.payment_status = BalanceLedgerService.status_for(balance["outstanding"])
+
+    @staticmethod
+    def _refresh_payment_status(
+        db: Session,
+        event_id: int,
+        participant_ids: Iterable[int],
+        family_ids: Iterable[int]
+    ) -> None:
+        """
+        Aktualisiert total_paid, outstanding und payment_status (O(Familiengröße))
+
+        Eine Zahlung an eine Familie oder ein Mitglied verschiebt die Anteile
+        aller Mitglieder, daher wird jeweils die ganze Familie neu verteilt.
+        """
+        from app.models import Participant, Payment
+        from app.services.payment_allocation import PaymentAllocationService
+
+        db.flush()
+        participant_ids = set(participant_ids)
+        family_ids = set(family_ids) | BalanceLedgerService._family_ids_of(db, participant_ids)
+
+        allocated = set()
+        for family_id in family_ids:
+            allocation = PaymentAllocationService.for_family(db, family_id)
+            for participant_id, balance in allocation.participant_balances.items():
+                BalanceLedgerService._set_payment_status(db, event_id, SCOPE_PARTICIPANT, participant_id, balance)
+                allocated.add(participant_id)
+            BalanceLedgerService._set_payment_status(
+                db, event_id, SCOPE_FAMILY, family_id, allocation.get_family(family_id)
+            )
+
+        for participant_id in participant_ids - allocated:
+            participant = db.query(Participant).filter(Participant.id == participant_id).first()
+            if not participant:
+                continue
+            direct_payments = float(db.query(func.sum(Payment.amount)).filter(
+                Payment.participant_id == participant_id
+            ).scalar() or 0)
+            allocation = PaymentAllocationService.allocate([participant], {participant_id: direct_payments}, {})
+            BalanceLedgerService._set_payment_status(
+                db, event_id, SCOPE_PARTICIPANT, participant_id, allocation.get_participant(participant_id)
+            )
+
+
+def main() -> int:
+    """Kommandozeile: Ledger neu aufbauen und gegen vollständige Neuberechnung prüfen"""
+    from app.database import get_db
+    from app.models import Event
+
+    parser = argparse.ArgumentParser(description="Balance-Ledger neu aufbauen und prüfen")
+    parser.add_argument("--event-id", type=int, help="Nur dieses Event (Standard: alle Events)")
+    parser.add_argument("--verify-only", action="store_true", help="Nur prüfen, nicht neu aufbauen")
+    args = parser.parse_args()
+
+    db_gen = get_db()
+    db = next(db_gen)
+    exit_code = 0
+    try:
+        if args.event_id:
+            event_ids = [args.event_id]
+        else:
+            event_ids = [row[0] for row in db.query(Event.id).all()]
+
+        for event_id in event_ids:
+            differences = BalanceLedgerService.verify(db, event_id)
+            if differences:
+                print(f"Event {event_id}: {len(differences)} Abweichung(en)")
+                for difference in differences:
+                    print(f"  {difference}")
+            else:
+                print(f"Event {event_id}: Ledger konsistent")
+
+            if not args.verify_only:
+                count = BalanceLedgerService.rebuild(db, event_id)
+                db.commit()
+                remaining = BalanceLedgerService.verify(db, event_id)
+                print(f"Event {event_id}: {count} Einträge neu aufgebaut, {len(remaining)} Abweichung(en) nach Neuaufbau")
+                if remaining:
+                    exit_code = 1
+            elif differences:
+                exit_code = 1
+    finally:
+        db_gen.close()
+
+    return exit_code
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,173 @@
+"""Concurrency-Benchmark: Latenz günstiger Seiten, während ein aufwändiger Report läuft
+
+Vergleicht zwei Varianten derselben Endpunkte mit synchroner SQLAlchemy-Session:
+- "async": async def-Handler rufen die Session direkt auf (blockiert den Event-Loop)
+- "threadpool": def-Handler, FastAPI führt sie im Threadpool aus (wie die Router)
+
+Aufruf:
+    python -m app.services.concurrency_benchmark --rows 200000 --requests 200
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from typing import List
+
+import httpx
+from fastapi import FastAPI, Depends
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker, Session
+
+# Aufwändiger Report: Aggregation über einen Self-Join (mehrere hundert Millisekunden)
+HEAVY_SQL = """
+    SELECT a.bucket, COUNT(*), SUM(a.amount * b.amount)
+    FROM bench_payments AS a
+    JOIN bench_payments AS b ON b.bucket = a.bucket AND b.id % 97 = a.id % 97
+    WHERE a.id % :modulo = 0
+    GROUP BY a.bucket
+"""
+
+# Günstige Seite: einzelner Datensatz per Primärschlüssel
+CHEAP_SQL = "SELECT id, amount FROM bench_payments WHERE id = :id"
+
+
+def _build_database(path: str, rows: int, seed: int) -> None:
+    """Legt eine Tabelle mit zufälligen Zahlungen an"""
+    rng = random.Random(seed)
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE bench_payments (id INTEGER PRIMARY KEY, bucket INTEGER, amount REAL)"))
+        conn.execute(
+            text("INSERT INTO bench_payments (id, bucket, amount) VALUES (:id, :bucket, :amount)"),
+            [{"id": i, "bucket": rng.randint(0, 49), "amount": rng.uniform(1, 500)} for i in range(1, rows + 1)]
+        )
+        conn.execute(text("CREATE INDEX ix_bench_bucket ON bench_payments (bucket)"))
+    engine.dispose()
+
+
+def _build_app(path: str, mode: str, rows: int, modulo: int) -> FastAPI:
+    """Erstellt die Benchmark-App mit Report- und Detail-Endpunkt"""
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False}, pool_size=20)
+    session_factory = sessionmaker(bind=engine)
+
+    def get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def heavy(db: Session) -> int:
+        return len(db.execute(text(HEAVY_SQL), {"modulo": modulo}).fetchall())
+
+    def cheap(db: Session) -> float:
+        row = db.execute(text(CHEAP_SQL), {"id": random.randint(1, rows)}).first()
+        return row.amount
+
+    app = FastAPI()
+
+    if mode == "async":
+        @app.get("/report")
+        async def report(db: Session = Depends(get_db)):
+            return {"groups": heavy(db)}
+
+        @app.get("/detail")
+        async def detail(db: Session = Depends(get_db)):
+            return {"amount": cheap(db)}
+    else:
+        @app.get("/report")
+        def report(db: Session = Depends(get_db)):
+            return {"groups": heavy(db)}
+
+        @app.get("/detail")
+        def detail(db: Session = Depends(get_db)):
+            return {"amount": cheap(db)}
+
+    return app
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(percent / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+async def _run(app: FastAPI, requests: int, interval: float, report_workers: int) -> dict:
+    """Feuert günstige Requests in festem Takt, während parallel Reports laufen"""
+    transport = httpx.ASGITransport(app=app)
+    latencies = []
+    reports_done = 0
+    stop = asyncio.Event()
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def report_loop():
+            nonlocal reports_done
+            while not stop.is_set():
+                response = await client.get("/report")
+                response.raise_for_status()
+                reports_done += 1
+
+        async def detail_request():
+            started = time.perf_counter()
+            response = await client.get("/detail")
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+        # Aufwärmen (Verbindungen, Threadpool)
+        await detail_request()
+        latencies.clear()
+
+        report_tasks = [asyncio.ensure_future(report_loop()) for _ in range(report_workers)]
+        await asyncio.sleep(interval)
+
+        detail_tasks = []
+        for _ in range(requests):
+            detail_tasks.append(asyncio.ensure_future(detail_request()))
+            await asyncio.sleep(interval)
+        await asyncio.gather(*detail_tasks)
+
+        stop.set()
+        await asyncio.gather(*report_tasks)
+
+    return {
+        "p50": statistics.median(latencies),
+        "p99": _percentile(latencies, 99),
+        "max": max(latencies),
+        "reports": reports_done
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latenz günstiger Seiten während eines Reports: async def vs. Threadpool")
+    parser.add_argument("--rows", type=int, default=200000, help="Anzahl Zahlungen in der Testdatenbank (Standard: 200000)")
+    parser.add_argument("--requests", type=int, default=200, help="Anzahl günstiger Requests (Standard: 200)")
+    parser.add_argument("--interval", type=float, default=0.01, help="Abstand zwischen den Requests in Sekunden (Standard: 0.01)")
+    parser.add_argument("--report-workers", type=int, default=1, help="Parallel laufende Reports (Standard: 1)")
+    parser.add_argument("--modulo", type=int, default=200, help="Report-Last: jede n-te Zeile (kleiner = langsamer, Standard: 200)")
+    parser.add_argument("--seed", type=int, default=42, help="Seed für die Testdaten")
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix=".sqlite")
+    os.close(fd)
+    os.unlink(path)
+    try:
+        _build_database(path, args.rows, args.seed)
+
+        print(f"Zeilen: {args.rows}, günstige Requests: {args.requests}, parallele Reports: {args.report_workers}")
+        for mode in ("async", "threadpool"):
+            app = _build_app(path, mode, args.rows, args.modulo)
+            result = asyncio.run(_run(app, args.requests, args.interval, args.report_workers))
+            print(
+                f"{mode:<11} p50: {result['p50'] * 1000:8.1f} ms   p99: {result['p99'] * 1000:8.1f} ms   "
+                f"max: {result['max'] * 1000:8.1f} ms   Reports: {result['reports']}"
+            )
+    finally:
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""CSV Stream Service - CSV-Exporte direkt aus einem Datenbank-Cursor, optional gzip-komprimiert"""
+import csv
+import io
+import logging
+import zlib
+from typing import Callable, Iterable, Iterator, List, Any, Optional
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+
+logger = logging.getLogger(__name__)
+
+CSV_MEDIA_TYPE = "text/csv; charset=utf-8"
+GZIP_MEDIA_TYPE = "application/gzip"
+
+# Ab dieser Puffergröße wird ein Block an den Client geschickt
+CSV_CHUNK_SIZE = 64 * 1024
+
+# Kompressionsstufe für gzip (Kompromiss aus Geschwindigkeit und Größe)
+GZIP_LEVEL = 6
+
+# BOM, damit Excel die Datei als UTF-8 erkennt
+UTF8_BOM = "\ufeff"
+
+
+def iter_csv(header: List[str], rows: Iterable[List[Any]], delimiter: str = ";") -> Iterator[bytes]:
+    """
+    Serialisiert Zeilen blockweise als CSV (UTF-8 mit BOM)
+
+    Die Kopfzeile wird sofort als eigener Block geliefert (konstante Zeit
+    bis zum ersten Byte), danach Blöcke von ca. CSV_CHUNK_SIZE Bytes.
+
+    Args:
+        header: Spaltenüberschriften
+        rows: Zeilen (werden nur einmal durchlaufen)
+        delimiter: Trennzeichen
+
+    Yields:
+        UTF-8-kodierte Blöcke
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=delimiter, quoting=csv.QUOTE_MINIMAL)
+
+    buffer.write(UTF8_BOM)
+    writer.writerow(header)
+
+    def take() -> bytes:
+        chunk = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        return chunk
+
+    yield take()
+
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= CSV_CHUNK_SIZE:
+            yield take()
+
+    if buffer.tell():
+        yield take()
+
+
+def iter_gzip(chunks: Iterable[bytes], level: int = GZIP_LEVEL) -> Iterator[bytes]:
+    """Komprimiert einen Byte-Stream als gzip (Blöcke werden ohne Zwischenspeicherung weitergereicht)"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def _rows_with_session(produce_rows: Callable[[Session], Iterable[List[Any]]]) -> Iterator[List[Any]]:
+    """
+    Liefert die Zeilen mit einer eigenen Datenbank-Session
+
+    Die Session des Requests ist beim Streamen der Antwort bereits
+    geschlossen; die Session wird daher erst beim ersten Block geöffnet und
+    nach dem letzten (oder bei Abbruch durch den Client) geschlossen.
+    """
+    db_gen = get_db()
+    db = next(db_gen)
+    try:
+        yield from produce_rows(db)
+    finally:
+        db_gen.close()
+
+
+def csv_response(
+    filename: str,
+    header: List[str],
+    produce_rows: Callable[[Session], Iterable[List[Any]]],
+    compress: bool = False,
+    accept_encoding: Optional[str] = None
+) -> StreamingResponse:
+    """
+    StreamingResponse für einen CSV-Export
+
+    Mit compress und gzip im Accept-Encoding wird die CSV-Datei mit
+    Content-Encoding: gzip übertragen (der Browser entpackt sie), sonst als
+    .csv.gz-Datei.
+
+    Args:
+        filename: Dateiname (ohne .gz)
+        header: Spaltenüberschriften
+        produce_rows: Funktion (Session) -> Zeilen, z.B. ein Generator über einen
+            Cursor mit yield_per; wird erst beim Streamen aufgerufen
+        compress: gzip-Übertragung anfordern
+        accept_encoding: Accept-Encoding-Header des Clients
+
+    Returns:
+        StreamingResponse
+    """
+    chunks = iter_csv(header, _rows_with_session(produce_rows))
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    media_type = CSV_MEDIA_TYPE
+
+    if compress:
+        chunks = iter_gzip(chunks)
+        if "gzip" in (accept_encoding or "").lower():
+            headers["Content-Encoding"] = "gzip"
+            headers["Vary"] = "Accept-Encoding"
+        else:
+            headers["Content-Disposition"] = f'attachment; filename="{filename}.gz"'
+            media_type = GZIP_MEDIA_TYPE
+
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
@@ -1,76 +1,50 @@
 """Dashboard Router"""
 from fastapi import APIRouter, Request, Depends
-from fastapi.responses import HTMLResponse, JSONResponse
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func, extract
-from datetime import date, timedelta
+from fastapi.responses import HTMLResponse, JSONResponse, Response
+from sqlalchemy.orm import Session
+from typing import Optional
 
 from app.database import get_db
-from app.models import Participant, Payment, Expense, Event, Family, Role, Income, Ruleset
 from app.dependencies import get_current_event_id
 from app.templates_config import templates
-from app.services.price_calculator import PriceCalculator
-from app.routers.cash_status import calculate_expected_subsidies, calculate_base_prices_sum
+from app.services.dashboard_aggregates import DashboardAggregateService
+from app.services.dashboard_charts import DashboardChartService
 
 router = APIRouter(prefix="/dashboard", tags=["dashboard"])
 
 
 @router.get("/", response_class=HTMLResponse)
-async def dashboard(request: Request, db: Session = Depends(get_db), event_id: int = Depends(get_current_event_id)):
+def dashboard(request: Request, db: Session = Depends(get_db), event_id: int = Depends(get_current_event_id)):
     """Hauptdashboard mit Statistiken"""
 
-    # Statistiken sammeln (gefiltert nach event_id)
-    total_participants = db.query(func.count(Participant.id)).filter(Participant.event_id == event_id).scalar() or 0
-    total_families = db.query(func.count(Family.id)).filter(Family.event_id == event_id).scalar() or 0
-
-    # Finanzielle Übersicht (gefiltert nach event_id)
-    # Einnahmen - Konvertiere Decimal zu float um Typ-Konflikte zu vermeiden
-
-    # Basispreise ohne Rabatte berechnen
-    base_prices_sum = calculate_base_prices_sum(db, event_id)
+    # Alle Kennzahlen in zwei SQL-Statements (gleiche Berechnung wie im Kassenstand)
+    summary = DashboardAggregateService.summary(db, event_id)
 
     # Zahlungseingänge mit Rabatten und manuellen Preisen (was Teilnehmer tatsächlich zahlen sollen)
-    # Verwende final_price (berücksichtigt manual_price_override UND calculated_price)
-    participants = db.query(Participant).filter(
-        Participant.event_id == event_id,
-        Participant.is_active == True
-    ).all()
-    soll_zahlungseingaenge = float(sum((p.final_price for p in participants), 0))
-
-    # Erwartete Zuschüsse berechnen (rollenbasiert + Familienrabatt)
+    soll_zahlungseingaenge = summary.expected_income
+
+    # Erwartete Zuschüsse (rollenbasiert + Familienrabatt)
     # WICHTIG: Diese Berechnung muss identisch sein mit der Summe im Zuschüsse-Tab!
-    soll_sonstige_einnahmen = calculate_expected_subsidies(db, event_id)
+    soll_sonstige_einnahmen = summary.expected_subsidies
 
     # Gesamteinnahmen (Soll) = Zahlungseingänge + Sonstige Einnahmen (Zuschüsse)
     soll_einnahmen_gesamt = soll_zahlungseingaenge + soll_sonstige_einnahmen
 
-    ist_zahlungseingaenge = float(db.query(func.sum(Payment.amount)).filter(Payment.event_id == event_id).scalar() or 0)
+    ist_zahlungseingaenge = summary.payments_total
     # Sonstige Einnahmen (z.B. erhaltene Zuschüsse, Spenden)
-    # Aus Income-Tabelle abfragen
-    ist_sonstige_einnahmen = float(db.query(func.sum(Income.amount)).filter(Income.event_id == event_id).scalar() or 0)
+    ist_sonstige_einnahmen = summary.incomes_total
     ist_einnahmen_gesamt = ist_zahlungseingaenge + ist_sonstige_einnahmen
 
     # Ausgaben
-    soll_ausgaben_gesamt = float(db.query(func.sum(Expense.amount)).filter(Expense.event_id == event_id).scalar() or 0)
-    ausgaben_beglichen = float(db.query(func.sum(Expense.amount)).filter(
-        Expense.event_id == event_id,
-        Expense.is_settled == True
-    ).scalar() or 0)
+    soll_ausgaben_gesamt = summary.expenses_total
+    ausgaben_beglichen = summary.expenses_settled_total
 
     # Saldo: Soll-Einnahmen - Soll-Ausgaben (korrigiert!)
     saldo_gesamt = soll_einnahmen_gesamt - soll_ausgaben_gesamt
 
-    # Offene Beträge
-    offene_zahlungseingaenge = soll_zahlungseingaenge - ist_zahlungseingaenge
-    offene_ausgaben = soll_ausgaben_gesamt - ausgaben_beglichen
-
-    # Zahlungsquoten
-    zahlungsquote_eingaenge = (ist_zahlungseingaenge / soll_zahlungseingaenge * 100) if soll_zahlungseingaenge > 0 else 0.0
-    zahlungsquote_ausgaben = (ausgaben_beglichen / soll_ausgaben_gesamt * 100) if soll_ausgaben_gesamt > 0 else 0.0
-
     stats = {
-        "total_participants": total_participants,
-        "total_families": total_families,
+        "total_participants": summary.participants_total,
+        "total_families": summary.families_total,
         # Einnahmen
         "soll_zahlungseingaenge": soll_zahlungseingaenge,
         "soll_sonstige_einnahmen": soll_sonstige_einnahmen,
@@ -81,18 +55,21 @@ async def dashboard(request: Request, db: Session = Depends(get_db), event_id: i
         # Ausgaben
         "soll_ausgaben_gesamt": soll_ausgaben_gesamt,
         "ausgaben_beglichen": ausgaben_beglichen,
-        "offene_ausgaben": offene_ausgaben,
+        "offene_ausgaben": summary.open_expenses,
         # Saldo & Offene Beträge
         "saldo_gesamt": saldo_gesamt,
-        "offene_zahlungseingaenge": offene_zahlungseingaenge,
+        "offene_zahlungseingaenge": summary.outstanding_income,
         # Zahlungsquoten
-        "zahlungsquote_eingaenge": zahlungsquote_eingaenge,
-        "zahlungsquote_ausgaben": zahlungsquote_ausgaben,
+        "zahlungsquote_eingaenge": summary.payment_rate,
+        "zahlungsquote_ausgaben": summary.expense_rate,
+        "teilnehmer_bezahlt": summary.participants_paid,
+        "teilnehmer_offen": summary.participants_outstanding,
+        "zahlungsquote_teilnehmer": summary.participant_payment_rate,
         # Legacy (für Kompatibilität) - Ziel = Basispreis ohne Rabatte
-        "total_revenue_target": base_prices_sum,
+        "total_revenue_target": summary.base_prices_total,
         "total_payments": ist_zahlungseingaenge,
         "total_expenses": soll_ausgaben_gesamt,
-        "outstanding": offene_zahlungseingaenge,
+        "outstanding": summary.outstanding_income,
         "balance": saldo_gesamt
     }
 
@@ -102,131 +79,55 @@ async def dashboard(request: Request, db: Session = Depends(get_db), event_id: i
     )
 
 
+def _chart_response(request: Request, db: Session, event_id: int, series: Optional[str] = None):
+    """
+    Diagramm-Daten mit ETag (alle Reihen oder eine einzelne)
+
+    Der ETag kommt aus der Revision der Event-Daten. Stimmt er mit
+    If-None-Match überein, wird 304 geliefert, ohne die Reihen zu berechnen.
+    """
+    etag = DashboardChartService.revision_etag(db, event_id)
+    if etag is not None:
+        if_none_match = request.headers.get("if-none-match", "")
+        if etag in [tag.strip() for tag in if_none_match.split(",")]:
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+    etag, charts = DashboardChartService.get(db, event_id)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"} if etag else {}
+    return JSONResponse(charts[series] if series else charts, headers=headers)
+
+
+@router.get("/api/charts", response_class=JSONResponse)
+def get_charts(request: Request, db: Session = Depends(get_db), event_id: int = Depends(get_current_event_id)):
+    """API: Alle Diagramm-Reihen des Dashboards in einer Antwort"""
+    return _chart_response(request, db, event_id)
+
+
 @router.get("/api/age-distribution", response_class=JSONResponse)
-async def get_age_distribution(db: Session = Depends(get_db), event_id: int = Depends(get_current_event_id)):
+def get_age_distribution(request: Request, db: Session = Depends(get_db), event_id: int = Depends(get_current_event_id)):
     """API: Altersverteilung der Teilnehmer"""
-    participants = db.query(Participant).options(
-        joinedload(Participant.event)
-    ).filter(
-        Participant.event_id == event_id,
-        Participant.is_active == True
-    ).all()
-
-    # Altersgruppen definieren
-    age_groups = {
-        "0-5": 0,
-        "6-11": 0,
-        "12-17": 0,
-        "18-25": 0,
-        "26-40": 0,
-        "41+": 0
-    }
-
-    for p in participants:
-        age = p.age_at_event
-        if age <= 5:
-            age_groups["0-5"] += 1
-        elif age <= 11:
-            age_groups["6-11"] += 1
-        elif age <= 17:
-            age_groups["12-17"] += 1
-        elif age <= 25:
-            age_groups["18-25"] += 1
-        elif age <= 40:
-            age_groups["26-40"] += 1
-        else:
-            age_groups["41+"] += 1
-
-    return {
-        "labels": list(age_groups.keys()),
-        "data": list(age_groups.values())
-    }
+    return _chart_response(request, db, event_id, "age_distribution")
 
 
 @router.get("/api/payment-timeline", response_class=JSONResponse)
-async def get_payment_timeline(db: Session = Depends(get_db), event_id: int = Depends(get_current_event_id)):
+def get_payment_timeline(request: Request, db: Session = Depends(get_db), event_id: int = Depends(get_current_event_id)):
     """API: Zahlungsverlauf über Zeit"""
-    # Gruppiere Zahlungen nach Datum
-    payments_by_date = db.query(
-        func.date(Payment.payment_date).label('date'),
-        func.sum(Payment.amount).label('total')
-    ).filter(
-        Payment.event_id == event_id
-    ).group_by(
-        func.date(Payment.payment_date)
-    ).order_by('date').all()
-
-    # Erstelle kumulative Summen
-    dates = []
-    amounts = []
-    cumulative = 0.0
-
-    for payment_date, amount in payments_by_date:
-        dates.append(str(payment_date))
-        cumulative += float(amount)
-        amounts.append(round(cumulative, 2))
-
-    return {
-        "labels": dates,
-        "data": amounts
-    }
+    return _chart_response(request, db, event_id, "payment_timeline")
 
 
 @router.get("/api/role-distribution", response_class=JSONResponse)
-async def get_role_distribution(db: Session = Depends(get_db), event_id: int = Depends(get_current_event_id)):
+def get_role_distribution(request: Request, db: Session = Depends(get_db), event_id: int = Depends(get_current_event_id)):
     """API: Verteilung nach Rollen"""
-    # Gruppiere Teilnehmer nach Rollen
-    role_counts = db.query(
-        Role.display_name,
-        func.count(Participant.id).label('count')
-    ).join(
-        Participant, Participant.role_id == Role.id
-    ).filter(
-        Participant.event_id == event_id,
-        Participant.is_active == True
-    ).group_by(
-        Role.display_name
-    ).all()
-
-    return {
-        "labels": [role for role, _ in role_counts],
-        "data": [count for _, count in role_counts]
-    }
+    return _chart_response(request, db, event_id, "role_distribution")
 
 
 @router.get("/api/expense-categories", response_class=JSONResponse)
-async def get_expense_categories(db: Session = Depends(get_db), event_id: int = Depends(get_current_event_id)):
+def get_expense_categories(request: Request, db: Session = Depends(get_db), event_id: int = Depends(get_current_event_id)):
     """API: Ausgaben nach Kategorien"""
-    # Gruppiere Ausgaben nach Kategorie
-    expenses_by_category = db.query(
-        Expense.category,
-        func.sum(Expense.amount).label('total')
-    ).filter(
-        Expense.event_id == event_id
-    ).group_by(
-        Expense.category
-    ).all()
-
-    return {
-        "labels": [cat or "Ohne Kategorie" for cat, _ in expenses_by_category],
-        "data": [float(total) for _, total in expenses_by_category]
-    }
+    return _chart_response(request, db, event_id, "expense_categories")
 
 
 @router.get("/api/payment-methods", response_class=JSONResponse)
-async def get_payment_methods(db: Session = Depends(get_db), event_id: int = Depends(get_current_event_id)):
+def get_payment_methods(request: Request, db: Session = Depends(get_db), event_id: int = Depends(get_current_event_id)):
     """API: Zahlungsmethoden-Verteilung"""
-    # Gruppiere Zahlungen nach Methode
-    payments_by_method = db.query(
-        Payment.payment_method,
-        func.sum(Payment.amount).label('total')
-    ).filter(
-        Payment.event_id == event_id
-    ).group_by(
-        Payment.payment_method
-    ).all()
-
-    return {
-        "labels": [method or "Unbekannt" for method, _ in payments_by_method],
-        "data": [float(total) for _, total in payments_by_method]
-    }
+    return _chart_response(request, db, event_id, "payment_methods")
@@ -0,0 +1,225 @@
+"""Dashboard Aggregate Service - Kennzahlen eines Events mit zwei SQL-Statements"""
+import logging
+from dataclasses import dataclass
+from datetime import date
+
+from sqlalchemy import select, func, and_
+from sqlalchemy.orm import Session, aliased
+
+from app.services.ruleset_cache import RulesetCache
+from app.services.subsidy_calculator import expected_subsidy_total, age_at
+from app.services.balance_ledger import (
+    BalanceLedger, BalanceLedgerService, SCOPE_PARTICIPANT, PAYMENT_STATUS_PAID, PAYMENT_STATUS_OUTSTANDING
+)
+
+logger = logging.getLogger(__name__)
+
+
+def final_price_expression():
+    """SQL-Ausdruck für Participant.final_price (manueller Preis vor berechnetem Preis)"""
+    from app.models import Participant
+
+    return func.coalesce(Participant.manual_price_override, Participant.calculated_price, 0)
+
+
+@dataclass(frozen=True)
+class EventSummary:
+    """
+    Kennzahlen eines Events für Dashboard und Kassenstand
+
+    Soll-Werte aus dem Regelwerk (Basispreise, Rabatte, Zuschüsse) und
+    Ist-Werte aus Zahlungen, Einnahmen und Ausgaben. Beträge in Euro.
+    """
+    participants_total: int = 0
+    families_total: int = 0
+    participants_paid: int = 0
+    participants_outstanding: int = 0
+
+    # Summe final_price der aktiven Teilnehmer (mit Rabatten und manuellen Preisen)
+    expected_income: float = 0.0
+    # Basispreise ohne Rabatte
+    base_prices_total: float = 0.0
+    # Rabatte nicht-zuschussberechtigter Rollen (Umlage auf die Gruppe)
+    non_subsidy_discounts: float = 0.0
+    # Erwartete Zuschüsse (rollenbasiert + Familienrabatt), identisch mit dem Zuschüsse-Tab
+    expected_subsidies: float = 0.0
+
+    payments_total: float = 0.0
+    incomes_total: float = 0.0
+    expenses_total: float = 0.0
+    expenses_settled_total: float = 0.0
+
+    @property
+    def outstanding_income(self) -> float:
+        """Offene Zahlungseingänge der Teilnehmer (Soll - Ist)"""
+        return self.expected_income - self.payments_total
+
+    @property
+    def open_expenses(self) -> float:
+        """Noch nicht beglichene Ausgaben"""
+        return self.expenses_total - self.expenses_settled_total
+
+    @property
+    def payment_rate(self) -> float:
+        """Zahlungsquote der Zahlungseingänge in Prozent"""
+        return (self.payments_total / self.expected_income * 100) if self.expected_income > 0 else 0.0
+
+    @property
+    def expense_rate(self) -> float:
+        """Anteil beglichener Ausgaben in Prozent"""
+        return (self.expenses_settled_total / self.expenses_total * 100) if self.expenses_total > 0 else 0.0
+
+    @property
+    def participant_payment_rate(self) -> float:
+        """Anteil vollständig bezahlter aktiver Teilnehmer in Prozent"""
+        counted = self.participants_paid + self.participants_outstanding
+        return (self.participants_paid / counted * 100) if counted > 0 else 0.0
+
+
+class DashboardAggregateService:
+    """
+    Berechnet alle Kennzahlen eines Events
+
+    1. Ein SELECT mit skalaren Subqueries für Anzahlen und Zahlungsstatus;
+       Soll-Einnahmen, Zahlungen, Einnahmen und Ausgaben kommen aus dem
+       Event-Eintrag des Balance-Ledgers (von den Schreib-Handlern gepflegt)
+    2. Ein SELECT über die aktiven Teilnehmer (Geburtsdatum, Rolle, Familie)
+       für Basispreise, Rollenrabatte und Zuschüsse mit dem kompilierten
+       Regelwerk aus dem Cache
+
+    Ersetzt die calculate_*-Hilfsfunktionen, die jeweils Event, Regelwerk und
+    Teilnehmer neu geladen haben.
+    """
+
+    @staticmethod
+    def _totals(db: Session, event_id: int):
+        """Statement 1: Startdatum, Anzahlen und Zahlungsstatus in einer Zeile"""
+        from app.models import Event, Participant, Family
+
+        def scalar(statement):
+            return statement.scalar_subquery()
+
+        def status_count(status: str):
+            return scalar(
+                select(func.count(BalanceLedger.id)).join(
+                    Participant, Participant.id == BalanceLedger.reference_id
+                ).where(
+                    BalanceLedger.event_id == event_id,
+                    BalanceLedger.scope == SCOPE_PARTICIPANT,
+                    BalanceLedger.payment_status == status,
+                    Participant.is_active == True
+                )
+            )
+
+        return db.execute(
+            select(
+                Event.start_date.label("start_date"),
+                scalar(select(func.count(Participant.id)).where(
+                    Participant.event_id == event_id
+                )).label("participants_total"),
+                scalar(select(func.count(Family.id)).where(
+                    Family.event_id == event_id
+                )).label("families_total"),
+                status_count(PAYMENT_STATUS_PAID).label("participants_paid"),
+                status_count(PAYMENT_STATUS_OUTSTANDING).label("participants_outstanding")
+            ).where(Event.id == event_id)
+        ).first()
+
+    @staticmethod
+    def _participant_rows(db: Session, event_id: int):
+        """
+        Statement 2: aktive Teilnehmer mit Rollenname
+
+        is_subsidy_role ist wahr, wenn die Rolle die erste aktive Rolle des
+        Events mit diesem Namen ist (so ordnet der Zuschüsse-Tab Regelwerk-
+        Rollen den Event-Rollen zu).
+        """
+        from app.models import Participant, Role
+
+        canonical_role = aliased(Role)
+        canonical_role_id = select(func.min(canonical_role.id)).where(
+            canonical_role.event_id == event_id,
+            canonical_role.is_active == True,
+            func.lower(canonical_role.name) == func.lower(Role.name)
+        ).scalar_subquery()
+
+        return db.execute(
+            select(
+                Participant.id,
+                Participant.birth_date,
+                Participant.family_id,
+                Participant.manual_price_override.isnot(None).label("has_override"),
+                Role.name.label("role_name"),
+                and_(Role.id.isnot(None), Role.id == canonical_role_id).label("is_subsidy_role")
+            ).outerjoin(
+                Role, Role.id == Participant.role_id
+            ).where(
+                Participant.event_id == event_id,
+                Participant.is_active == True
+            ).order_by(Participant.id)
+        ).all()
+
+    @staticmethod
+    def summary(db: Session, event_id: int) -> EventSummary:
+        """
+        Berechnet die Kennzahlen eines Events
+
+        Args:
+            db: Datenbank-Session
+            event_id: ID des Events
+
+        Returns:
+            EventSummary (leer, wenn das Event nicht existiert)
+        """
+        # Summen aus dem Event-Eintrag des Ledgers (baut das Ledger bei Bedarf auf,
+        # inkl. des persistierten Zahlungsstatus)
+        ledger = BalanceLedgerService.get_event_balance(db, event_id)
+
+        totals = DashboardAggregateService._totals(db, event_id)
+        if totals is None or ledger is None:
+            return EventSummary()
+
+        base_prices_total = 0.0
+        non_subsidy_discounts = 0.0
+        expected_subsidies = 0.0
+
+        start_date: date = totals.start_date
+        ruleset = RulesetCache.get_active(db, event_id, valid_on=start_date)
+        if ruleset:
+            rows = DashboardAggregateService._participant_rows(db, event_id)
+            ages = [age_at(start_date, row.birth_date) for row in rows]
+            base_prices = ruleset.bulk_base_prices(ages)
+            base_prices_total = round(sum(base_prices), 2)
+
+            # Rabatte nicht-zuschussberechtigter Rollen
+            for row, base_price in zip(rows, base_prices):
+                role_config = ruleset.get_role_config(row.role_name) if row.role_name else None
+                if role_config and not role_config.get("subsidy_eligible", True):
+                    non_subsidy_discounts += base_price * (role_config.get("discount_percent", 0) / 100)
+            non_subsidy_discounts = round(non_subsidy_discounts, 2)
+
+            expected_subsidies = expected_subsidy_total(ruleset, start_date, [
+                (
+                    row.id,
+                    row.birth_date,
+                    row.family_id,
+                    bool(row.has_override),
+                    row.role_name.lower() if row.is_subsidy_role else None
+                )
+                for row in rows
+            ])
+
+        return EventSummary(
+            participants_total=totals.participants_total or 0,
+            families_total=totals.families_total or 0,
+            participants_paid=totals.participants_paid or 0,
+            participants_outstanding=totals.participants_outstanding or 0,
+            expected_income=float(ledger.expected_income or 0),
+            base_prices_total=base_prices_total,
+            non_subsidy_discounts=non_subsidy_discounts,
+            expected_subsidies=expected_subsidies,
+            payments_total=float(ledger.payments_total or 0),
+            incomes_total=float(ledger.incomes_total or 0),
+            expenses_total=float(ledger.expenses_total or 0),
+            expenses_settled_total=float(ledger.expenses_settled_total or 0)
+        )
@@ -0,0 +1,231 @@
+"""Dashboard Chart Service - Diagramm-Reihen eines Events aus SQL-Aggregaten, gecacht pro Revision"""
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import select, func, case, extract, literal, cast, String, union_all
+from sqlalchemy.orm import Session
+
+from app.services.event_revision import EventRevisionService
+from app.services.payment_rollup import PaymentRollupService
+from app.services.balance_ledger import BalanceLedgerService
+
+logger = logging.getLogger(__name__)
+
+# Altersgruppen (Label, Höchstalter inkl.; None = offen)
+AGE_BUCKETS = (
+    ("0-5", 5),
+    ("6-11", 11),
+    ("12-17", 17),
+    ("18-25", 25),
+    ("26-40", 40),
+    ("41+", None)
+)
+
+# Reihen der Diagramm-Endpunkte
+CHART_SERIES = (
+    "age_distribution",
+    "payment_timeline",
+    "role_distribution",
+    "expense_categories",
+    "payment_methods"
+)
+
+# Maximale Anzahl gecachter Events
+CHART_CACHE_SIZE = 64
+
+
+def age_expression(reference_date, birth_date):
+    """SQL-Ausdruck für das Alter am Stichtag (wie subsidy_calculator.age_at)"""
+    reference_day = extract("month", reference_date) * 100 + extract("day", reference_date)
+    birth_day = extract("month", birth_date) * 100 + extract("day", birth_date)
+    return (
+        extract("year", reference_date) - extract("year", birth_date)
+        - case((reference_day < birth_day, 1), else_=0)
+    )
+
+
+def age_bucket_expression(age):
+    """CASE-Ausdruck: Alter -> Label der Altersgruppe (NULL ohne Geburts- oder Startdatum)"""
+    whens = []
+    lower = None
+    for label, upper in AGE_BUCKETS:
+        whens.append((age <= upper if upper is not None else age > lower, label))
+        lower = upper
+    return case(*whens)
+
+
+class DashboardChartService:
+    """
+    Diagramm-Daten des Dashboards
+
+    Verteilungen kommen aus einem UNION-ALL-Statement mit Zeilen
+    (Reihe, Label, Wert); Altersgruppen werden per CASE über das in SQL
+    berechnete Alter gebildet statt Teilnehmer-Objekte zu laden. Der
+    Zahlungsverlauf kommt aus den Tagessummen (PaymentRollupService) und
+    enthält die Soll-Einnahmen aus dem Balance-Ledger als Vergleichslinie.
+
+    Das Ergebnis wird prozessweit pro Event und Revision
+    (EventRevisionService) gecacht. Der ETag leitet sich aus der Revision ab,
+    wiederholte Dashboard-Aufrufe ohne Datenänderung kosten damit nur das
+    Lesen des Zählers.
+    """
+
+    _lock = threading.Lock()
+    _entries: "OrderedDict[int, Tuple[str, Dict[str, Dict[str, list]]]]" = OrderedDict()
+    _hits = 0
+    _misses = 0
+
+    @staticmethod
+    def _series_statement(event_id: int):
+        from app.models import Event, Participant, Payment, Expense, Role
+
+        def rows(series: str, label, value):
+            return select(
+                literal(series).label("series"),
+                cast(label, String).label("label"),
+                value.label("value")
+            )
+
+        bucket = age_bucket_expression(age_expression(Event.start_date, Participant.birth_date))
+
+        return union_all(
+            rows("age_distribution", bucket, func.count(Participant.id)).join(
+                Event, Event.id == Participant.event_id
+            ).where(
+                Participant.event_id == event_id,
+                Participant.is_active == True
+            ).group_by(bucket),
+
+            rows("role_distribution", Role.display_name, func.count(Participant.id)).join(
+                Participant, Participant.role_id == Role.id
+            ).where(
+                Participant.event_id == event_id,
+                Participant.is_active == True
+            ).group_by(Role.display_name),
+
+            rows("expense_categories", Expense.category, func.sum(Expense.amount)).where(
+                Expense.event_id == event_id
+            ).group_by(Expense.category),
+
+            rows("payment_methods", Payment.payment_method, func.sum(Payment.amount)).where(
+                Payment.event_id == event_id
+            ).group_by(Payment.payment_method)
+        )
+
+    @staticmethod
+    def compute(db: Session, event_id: int) -> Dict[str, Dict[str, list]]:
+        """
+        Berechnet alle Diagramm-Reihen eines Events (ohne Cache)
+
+        Args:
+            db: Datenbank-Session
+            event_id: ID des Events
+
+        Returns:
+            Dict Reihe -> {"labels": [...], "data": [...]}
+        """
+        grouped: Dict[str, list] = {series: [] for series in CHART_SERIES if series != "payment_timeline"}
+        for row in db.execute(DashboardChartService._series_statement(event_id)):
+            grouped[row.series].append((row.label, row.value))
+
+        age_counts = {label: 0 for label, _ in AGE_BUCKETS}
+        for label, count in grouped["age_distribution"]:
+            if label is not None:
+                age_counts[label] = count
+
+        # Kumulativer Verlauf aus den Tagessummen, Soll-Linie aus dem Balance-Ledger
+        timeline = PaymentRollupService.cumulative_timeline(db, event_id)
+        expected_income = round(float(BalanceLedgerService.get_event_balance(db, event_id).expected_income or 0), 2)
+
+        return {
+            "age_distribution": {
+                "labels": list(age_counts.keys()),
+                "data": list(age_counts.values())
+            },
+            "payment_timeline": {
+                "labels": [day for day, _ in timeline],
+                "data": [cumulative for _, cumulative in timeline],
+                "expected": [expected_income] * len(timeline),
+                "expected_total": expected_income
+            },
+            "role_distribution": {
+                "labels": [role for role, _ in grouped["role_distribution"]],
+                "data": [count for _, count in grouped["role_distribution"]]
+            },
+            "expense_categories": {
+                "labels": [category or "Ohne Kategorie" for category, _ in grouped["expense_categories"]],
+                "data": [float(total or 0) for _, total in grouped["expense_categories"]]
+            },
+            "payment_methods": {
+                "labels": [method or "Unbekannt" for method, _ in grouped["payment_methods"]],
+                "data": [float(total or 0) for _, total in grouped["payment_methods"]]
+            }
+        }
+
+    @staticmethod
+    def etag_for(event_id: int, revision: str) -> str:
+        """ETag der Diagramm-Daten einer Revision"""
+        digest = hashlib.sha1(f"charts:{event_id}:{revision}".encode()).hexdigest()[:20]
+        return f'"{digest}"'
+
+    @classmethod
+    def revision_etag(cls, db: Session, event_id: int) -> Optional[str]:
+        """
+        ETag der aktuellen Daten, ohne die Reihen zu berechnen
+
+        Returns:
+            ETag oder None, wenn keine Revisionen verfügbar sind
+        """
+        revision = EventRevisionService.current(db, event_id)
+        return cls.etag_for(event_id, revision) if revision is not None else None
+
+    @classmethod
+    def get(cls, db: Session, event_id: int) -> Tuple[Optional[str], Dict[str, Dict[str, list]]]:
+        """
+        Diagramm-Reihen eines Events aus dem Cache (bei Bedarf neu berechnet)
+
+        Args:
+            db: Datenbank-Session
+            event_id: ID des Events
+
+        Returns:
+            Tupel (ETag oder None, Reihen)
+        """
+        etag = cls.revision_etag(db, event_id)
+        if etag is None:
+            return None, cls.compute(db, event_id)
+
+        with cls._lock:
+            entry = cls._entries.get(event_id)
+            if entry and entry[0] == etag:
+                cls._hits += 1
+                cls._entries.move_to_end(event_id)
+                return entry
+
+        # Revision vor der Berechnung gelesen: spätere Änderungen erhöhen sie und verwerfen den Eintrag
+        series = cls.compute(db, event_id)
+
+        with cls._lock:
+            cls._misses += 1
+            cls._entries[event_id] = (etag, series)
+            cls._entries.move_to_end(event_id)
+            while len(cls._entries) > CHART_CACHE_SIZE:
+                cls._entries.popitem(last=False)
+
+        logger.debug(f"Chart cache miss for event {event_id}")
+        return etag, series
+
+    @classmethod
+    def invalidate(cls) -> None:
+        """Verwirft alle Cache-Einträge"""
+        with cls._lock:
+            cls._entries.clear()
+
+    @classmethod
+    def stats(cls) -> Dict[str, int]:
+        """Cache-Statistik (Treffer, Fehlversuche, Einträge)"""
+        with cls._lock:
+            return {"hits": cls._hits, "misses": cls._misses, "entries": len(cls._entries)}
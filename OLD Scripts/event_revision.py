@@ -0,0 +1,145 @@
+"""Event Revision Service - Änderungszähler pro Event, gepflegt von SQLite-Triggern"""
+import logging
+import secrets
+import threading
+from typing import Dict, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Tabelle mit einem Zähler pro Event
+EVENT_REVISION_TABLE = "event_revisions"
+
+
+class EventRevisionService:
+    """
+    Revisionszähler der Daten eines Events (z.B. als Cache-Schlüssel und ETag)
+
+    Trigger auf Teilnehmern, Familien, Rollen, Zahlungen, Einnahmen, Ausgaben
+    und dem Event selbst erhöhen den Zähler bei jedem INSERT, UPDATE und
+    DELETE - auch bei bulk_insert_mappings und Änderungen außerhalb der
+    Router. Gleiche Revision bedeutet damit gleiche Daten.
+
+    Die Epoche wird bei invalidate() (z.B. nach Restore eines Backups) neu
+    erzeugt, damit ein zurückgesetzter Zähler keine alten Cache-Einträge oder
+    ETags trifft.
+    """
+
+    _lock = threading.Lock()
+    _ready: Dict[str, bool] = {}
+    _epoch = secrets.token_hex(4)
+
+    @staticmethod
+    def _watched_tables() -> Dict[str, str]:
+        """Beobachtete Tabellen und ihre Event-Spalte"""
+        from app.models import Event, Participant, Family, Role, Payment, Income, Expense
+
+        tables = {
+            model.__tablename__: "event_id"
+            for model in (Participant, Family, Role, Payment, Income, Expense)
+        }
+        tables[Event.__tablename__] = "id"
+        return tables
+
+    @staticmethod
+    def _bump_sql(event_ref: str) -> str:
+        """Erhöht den Zähler des Events in event_ref (z.B. NEW.event_id)"""
+        return (
+            f"INSERT OR IGNORE INTO {EVENT_REVISION_TABLE} (event_id, revision) "
+            f"SELECT {event_ref}, 0 WHERE {event_ref} IS NOT NULL; "
+            f"UPDATE {EVENT_REVISION_TABLE} SET revision = revision + 1 WHERE event_id = {event_ref};"
+        )
+
+    @staticmethod
+    def _ddl_statements() -> list:
+        """CREATE-Statements für Zählertabelle und Trigger"""
+        statements = [
+            f"CREATE TABLE IF NOT EXISTS {EVENT_REVISION_TABLE} ("
+            f"event_id INTEGER PRIMARY KEY, revision INTEGER NOT NULL DEFAULT 0)"
+        ]
+
+        bump = EventRevisionService._bump_sql
+        for table_name, column in EventRevisionService._watched_tables().items():
+            prefix = f"{EVENT_REVISION_TABLE}_{table_name}"
+            statements.append(
+                f"CREATE TRIGGER IF NOT EXISTS {prefix}_ai AFTER INSERT ON {table_name} "
+                f"BEGIN {bump(f'NEW.{column}')} END"
+            )
+            # Bei einem Wechsel des Events ändern sich beide Events
+            statements.append(
+                f"CREATE TRIGGER IF NOT EXISTS {prefix}_au AFTER UPDATE ON {table_name} "
+                f"BEGIN {bump(f'NEW.{column}')} "
+                f"UPDATE {EVENT_REVISION_TABLE} SET revision = revision + 1 "
+                f"WHERE event_id = OLD.{column} AND OLD.{column} IS NOT NEW.{column}; END"
+            )
+            statements.append(
+                f"CREATE TRIGGER IF NOT EXISTS {prefix}_ad AFTER DELETE ON {table_name} "
+                f"BEGIN {bump(f'OLD.{column}')} END"
+            )
+        return statements
+
+    @staticmethod
+    def ensure(db: Session) -> bool:
+        """
+        Legt Zählertabelle und Trigger bei Bedarf an
+
+        Args:
+            db: Datenbank-Session
+
+        Returns:
+            True, wenn Revisionen verfügbar sind
+        """
+        engine = db.get_bind()
+        key = str(engine.url)
+        ready = EventRevisionService._ready.get(key)
+        if ready is not None:
+            return ready
+
+        with EventRevisionService._lock:
+            if key in EventRevisionService._ready:
+                return EventRevisionService._ready[key]
+
+            if engine.dialect.name != "sqlite":
+                EventRevisionService._ready[key] = False
+                return False
+
+            try:
+                with engine.begin() as conn:
+                    for statement in EventRevisionService._ddl_statements():
+                        conn.execute(text(statement))
+                EventRevisionService._ready[key] = True
+            except Exception as e:
+                logger.warning(f"Event revisions unavailable, caching disabled: {e}")
+                EventRevisionService._ready[key] = False
+
+        return EventRevisionService._ready[key]
+
+    @staticmethod
+    def current(db: Session, event_id: int) -> Optional[str]:
+        """
+        Aktuelle Revision eines Events
+
+        Args:
+            db: Datenbank-Session
+            event_id: ID des Events
+
+        Returns:
+            Revision als "<Epoche>-<Zähler>" oder None, wenn keine Revisionen verfügbar sind
+        """
+        if not EventRevisionService.ensure(db):
+            return None
+
+        revision = db.execute(
+            text(f"SELECT revision FROM {EVENT_REVISION_TABLE} WHERE event_id = :event_id"),
+            {"event_id": event_id}
+        ).scalar()
+        return f"{EventRevisionService._epoch}-{revision or 0}"
+
+    @staticmethod
+    def invalidate() -> None:
+        """Neue Epoche und erneute Prüfung der Trigger beim nächsten Zugriff"""
+        with EventRevisionService._lock:
+            EventRevisionService._ready.clear()
+            EventRevisionService._epoch = secrets.token_hex(4)
@@ -0,0 +1,212 @@
+"""Excel Stream Service - Write-only Workbooks mit Named Styles, gestreamt über eine Spool-Datei"""
+import logging
+import re
+import tempfile
+from copy import copy
+from typing import Dict, Any, Optional, Iterable, Iterator, List
+
+from fastapi.responses import StreamingResponse
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import NamedStyle, Font, PatternFill, Alignment, Border, Side
+from openpyxl.utils import get_column_letter
+
+logger = logging.getLogger(__name__)
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Bis zu dieser Größe bleibt die fertige Datei im Speicher, danach temporäre Datei
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+# Blockgröße beim Streamen der Datei an den Client
+STREAM_CHUNK_SIZE = 64 * 1024
+
+MONEY_FORMAT = "#,##0.00"
+
+# In Blattnamen nicht erlaubte Zeichen
+_INVALID_SHEET_CHARS = re.compile(r"[\\*?:/\[\]]")
+
+
+def _named_styles() -> List[NamedStyle]:
+    """Alle Named Styles der Exporte (einmal pro Workbook registriert statt Font/Fill pro Zelle)"""
+    thin = Side(style="thin", color="BFBFBF")
+
+    def style(name: str, **kwargs) -> NamedStyle:
+        named = NamedStyle(name=name)
+        for key, value in kwargs.items():
+            setattr(named, key, value)
+        return named
+
+    return [
+        style(
+            "header",
+            font=Font(bold=True, color="FFFFFF"),
+            fill=PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid"),
+            alignment=Alignment(horizontal="center", vertical="center", wrap_text=True),
+            border=Border(left=thin, right=thin, top=thin, bottom=thin)
+        ),
+        style(
+            "group",
+            font=Font(bold=True, size=11),
+            fill=PatternFill(start_color="E7E6E6", end_color="E7E6E6", fill_type="solid")
+        ),
+        style("money", number_format=MONEY_FORMAT),
+        style("money_positive", number_format=MONEY_FORMAT, font=Font(color="008000")),
+        style("money_negative", number_format=MONEY_FORMAT, font=Font(color="FF0000")),
+        style("money_alert", number_format=MONEY_FORMAT, font=Font(color="FF0000", bold=True)),
+        style(
+            "summary",
+            font=Font(bold=True),
+            fill=PatternFill(start_color="D9E1F2", end_color="D9E1F2", fill_type="solid")
+        ),
+        style(
+            "summary_money",
+            font=Font(bold=True),
+            fill=PatternFill(start_color="D9E1F2", end_color="D9E1F2", fill_type="solid"),
+            number_format=MONEY_FORMAT
+        ),
+        style("bold", font=Font(bold=True)),
+        style("heading", font=Font(bold=True, size=12)),
+        style("title", font=Font(size=16, bold=True, color="1E40AF")),
+        style("subtitle", font=Font(size=12, bold=True, color="1E40AF")),
+        style("small", font=Font(size=10)),
+        style("small_right", font=Font(size=10), alignment=Alignment(horizontal="right")),
+        style("center", alignment=Alignment(horizontal="center"))
+    ]
+
+
+class StreamingWorkbook:
+    """
+    Write-only Workbook für Exporte mit beschränktem Speicherbedarf
+
+    Zeilen werden per append() geschrieben und von openpyxl direkt in
+    temporäre Dateien serialisiert, statt als Zell-Objekte im Speicher zu
+    bleiben. Formatierungen kommen aus registrierten Named Styles. Die fertige
+    Datei landet in einer SpooledTemporaryFile und wird blockweise gestreamt.
+    """
+
+    def __init__(self):
+        self.workbook = Workbook(write_only=True)
+        self._style_arrays = {}
+        for named_style in _named_styles():
+            self.workbook.add_named_style(named_style)
+
+    def _style_array(self, ws, style: str):
+        """Aufgelöster Style eines Named Styles (einmal pro Name statt Lookup pro Zelle)"""
+        style_array = self._style_arrays.get(style)
+        if style_array is None:
+            template = WriteOnlyCell(ws)
+            template.style = style
+            style_array = self._style_arrays[style] = template._style
+        return style_array
+
+    def create_sheet(self, title: str, column_widths: Optional[Dict[int, float]] = None):
+        """
+        Legt ein Arbeitsblatt an
+
+        Args:
+            title: Blattname (ungültige Zeichen werden ersetzt, max. 31 Zeichen)
+            column_widths: Spaltenbreiten {Spaltennummer: Breite}
+
+        Returns:
+            Write-only Worksheet
+        """
+        ws = self.workbook.create_sheet(title=_INVALID_SHEET_CHARS.sub("-", title)[:31])
+        for column, width in (column_widths or {}).items():
+            ws.column_dimensions[get_column_letter(column)].width = width
+        return ws
+
+    def cell(self, ws, value: Any, style: Optional[str] = None) -> WriteOnlyCell:
+        """Erstellt eine Zelle mit Named Style"""
+        cell = WriteOnlyCell(ws, value=value)
+        if style:
+            cell._style = copy(self._style_array(ws, style))
+        return cell
+
+    def append(self, ws, values: Iterable[Any], styles: Optional[Dict[int, str]] = None) -> None:
+        """
+        Schreibt eine Zeile
+
+        Args:
+            ws: Worksheet
+            values: Zellwerte
+            styles: Named Styles je Spaltennummer (ab 1)
+        """
+        if styles:
+            values = [
+                self.cell(ws, value, styles[column]) if column in styles else value
+                for column, value in enumerate(values, 1)
+            ]
+        ws.append(values)
+
+    def append_header(self, ws, headers: List[str]) -> None:
+        """Schreibt eine Kopfzeile im Stil "header" """
+        ws.append([self.cell(ws, header, "header") for header in headers])
+
+    def append_styled(self, ws, values: Iterable[Any], style: str, columns: int = 0) -> None:
+        """
+        Schreibt eine Zeile, in der alle Zellen denselben Named Style haben
+
+        Args:
+            ws: Worksheet
+            values: Zellwerte
+            style: Named Style
+            columns: Zeile mit leeren Zellen bis zu dieser Spalte auffüllen
+        """
+        values = list(values)
+        values += [None] * (columns - len(values))
+        ws.append([self.cell(ws, value, style) for value in values])
+
+    @staticmethod
+    def money_style_by_value(value: float) -> str:
+        """Grün für positive, Rot für negative Beträge"""
+        if value > 0:
+            return "money_positive"
+        if value < 0:
+            return "money_negative"
+        return "money"
+
+    def write_to(self, file_obj) -> None:
+        """Schreibt das Workbook in ein Datei-Objekt (z.B. die Ergebnisdatei eines Export-Jobs)"""
+        self.workbook.save(file_obj)
+
+    def save(self):
+        """
+        Speichert das Workbook in eine SpooledTemporaryFile
+
+        Returns:
+            Datei-Objekt, auf Position 0
+        """
+        spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        self.write_to(spool)
+        spool.seek(0)
+        return spool
+
+    def response(self, filename: str) -> StreamingResponse:
+        """
+        Speichert das Workbook und streamt es als Download
+
+        Args:
+            filename: Dateiname für Content-Disposition
+
+        Returns:
+            StreamingResponse
+        """
+        spool = self.save()
+        return StreamingResponse(
+            iter_file(spool),
+            media_type=XLSX_MEDIA_TYPE,
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        )
+
+
+def iter_file(file_obj) -> Iterator[bytes]:
+    """Liest eine Datei blockweise und schließt sie danach"""
+    try:
+        while True:
+            chunk = file_obj.read(STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        file_obj.close()
@@ -1,8 +1,10 @@
 """Expenses (Ausgaben) Router"""
 import logging
 from pathlib import Path
+from anyio import from_thread
 from fastapi import APIRouter, Request, Depends, Form, HTTPException, UploadFile, File
 from fastapi.responses import HTMLResponse, RedirectResponse, FileResponse
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError, DataError
 from datetime import date, datetime
@@ -15,6 +17,9 @@ from app.dependencies import get_current_event_id
 from app.utils.error_handler import handle_db_exception
 from app.utils.flash import flash
 from app.utils.file_upload import save_receipt_file, delete_receipt_file
+from app.services.balance_ledger import BalanceLedgerService
+from app.services.search_index import SearchIndexService
+from app.services.csv_stream import csv_response
 from app.utils.datetime_utils import utcnow
 from app.schemas import ExpenseCreateSchema, ExpenseUpdateSchema
 from app.templates_config import templates
@@ -25,7 +30,7 @@ router = APIRouter(prefix="/expenses", tags=["expenses"])
 
 
 @router.get("/", response_class=HTMLResponse)
-async def list_expenses(
+def list_expenses(
     request: Request,
     db: Session = Depends(get_db),
     event_id: int = Depends(get_current_event_id),
@@ -41,14 +46,10 @@ async def list_expenses(
     if category:
         query = query.filter(Expense.category == category)
 
-    # Volltextsuche
+    # Volltextsuche (FTS5-Index: Titel, Beschreibung, Bezahlt von, Belegnummer)
     if search and search.strip():
-        search_filter = f"%{search}%"
         query = query.filter(
-            (Expense.title.ilike(search_filter)) |
-            (Expense.description.ilike(search_filter)) |
-            (Expense.paid_by.ilike(search_filter)) |
-            (Expense.receipt_number.ilike(search_filter))
+            Expense.id.in_(SearchIndexService.matching_ids(db, event_id, "expense", search))
         )
 
     expenses = query.order_by(Expense.expense_date.desc()).all()
@@ -70,8 +71,65 @@ async def list_expenses(
     )
 
 
+@router.get("/export/csv")
+def export_expenses_csv(
+    request: Request,
+    db: Session = Depends(get_db),
+    event_id: int = Depends(get_current_event_id),
+    category: Optional[str] = None,
+    search: Optional[str] = "",
+    gzip: bool = False
+):
+    """Exportiert die Ausgaben (mit den Filtern der Liste) als CSV, gestreamt direkt aus dem Cursor"""
+
+    def rows(stream_db: Session):
+        statement = select(
+            Expense.expense_date,
+            Expense.title,
+            Expense.category,
+            Expense.amount,
+            Expense.paid_by,
+            Expense.is_settled,
+            Expense.receipt_number,
+            Expense.description
+        ).where(Expense.event_id == event_id)
+
+        if category:
+            statement = statement.where(Expense.category == category)
+        if search and search.strip():
+            statement = statement.where(
+                Expense.id.in_(SearchIndexService.matching_ids(stream_db, event_id, "expense", search))
+            )
+
+        result = stream_db.execute(
+            statement.order_by(Expense.expense_date.desc(), Expense.id.desc()),
+            execution_options={"stream_results": True, "yield_per": 500}
+        )
+        for row in result:
+            yield [
+                row.expense_date.strftime("%d.%m.%Y") if row.expense_date else "",
+                row.title or "",
+                row.category or "",
+                f"{float(row.amount or 0):.2f}",
+                row.paid_by or "",
+                "Ja" if row.is_settled else "Nein",
+                row.receipt_number or "",
+                row.description or ""
+            ]
+
+    filename = f"Ausgaben_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+
+    return csv_response(
+        filename,
+        ["Datum", "Titel", "Kategorie", "Betrag", "Bezahlt von", "Beglichen", "Belegnummer", "Beschreibung"],
+        rows,
+        compress=gzip,
+        accept_encoding=request.headers.get("accept-encoding")
+    )
+
+
 @router.get("/create", response_class=HTMLResponse)
-async def create_expense_form(
+def create_expense_form(
     request: Request,
     db: Session = Depends(get_db),
     event_id: int = Depends(get_current_event_id)
@@ -105,7 +163,7 @@ async def create_expense_form(
 
 
 @router.post("/create", response_class=HTMLResponse)
-async def create_expense(
+def create_expense(
     request: Request,
     db: Session = Depends(get_db),
     event_id: int = Depends(get_current_event_id),
@@ -147,12 +205,15 @@ async def create_expense(
         )
 
         db.add(expense)
+        BalanceLedgerService.expense_changed(db, event_id, new=BalanceLedgerService.snapshot_expense(expense))
         db.commit()
         db.refresh(expense)
 
         # Beleg-Upload verarbeiten (falls vorhanden)
         if receipt_file and receipt_file.filename:
-            file_path, error = await save_receipt_file(
+            # Upload-Speicherung ist async, Handler läuft im Threadpool
+            file_path, error = from_thread.run(
+                save_receipt_file,
                 receipt_file,
                 event_id,
                 expense.id,
@@ -201,7 +262,7 @@ async def create_expense(
 
 
 @router.get("/{expense_id}/edit", response_class=HTMLResponse)
-async def edit_expense_form(
+def edit_expense_form(
     request: Request,
     expense_id: int,
     db: Session = Depends(get_db),
@@ -245,7 +306,7 @@ async def edit_expense_form(
 
 
 @router.post("/{expense_id}/edit", response_class=HTMLResponse)
-async def update_expense(
+def update_expense(
     request: Request,
     expense_id: int,
     db: Session = Depends(get_db),
@@ -284,6 +345,7 @@ async def update_expense(
         )
 
         # Ausgabe aktualisieren (expense_date ist bereits ein date-Objekt)
+        old_snapshot = BalanceLedgerService.snapshot_expense(expense)
         expense.title = expense_data.title
         expense.description = expense_data.description
         expense.amount = expense_data.amount
@@ -306,7 +368,9 @@ async def update_expense(
                 delete_receipt_file(expense.receipt_file_path)
 
             # Neuen Beleg speichern
-            file_path, error = await save_receipt_file(
+            # Upload-Speicherung ist async, Handler läuft im Threadpool
+            file_path, error = from_thread.run(
+                save_receipt_file,
                 receipt_file,
                 expense.event_id,
                 expense.id,
@@ -320,6 +384,9 @@ async def update_expense(
                 expense.receipt_file_path = file_path
                 logger.info(f"Receipt updated for expense {expense.id}: {file_path}")
 
+        BalanceLedgerService.expense_changed(
+            db, event_id, old=old_snapshot, new=BalanceLedgerService.snapshot_expense(expense)
+        )
         db.commit()
 
         flash(request, f"Ausgabe '{expense.title}' wurde erfolgreich aktualisiert", "success")
@@ -356,7 +423,7 @@ async def update_expense(
 
 
 @router.post("/{expense_id}/toggle-settled")
-async def toggle_settled(expense_id: int, db: Session = Depends(get_db), event_id: int = Depends(get_current_event_id)):
+def toggle_settled(expense_id: int, db: Session = Depends(get_db), event_id: int = Depends(get_current_event_id)):
     """
     Toggelt den Beglichen/Erstattet-Status einer Ausgabe.
     - Wenn paid_by leer: normale Kassenausgabe → Beglichen
@@ -372,7 +439,11 @@ async def toggle_settled(expense_id: int, db: Session = Depends(get_db), event_i
         raise HTTPException(status_code=404, detail="Ausgabe nicht gefunden")
 
     try:
+        old_snapshot = BalanceLedgerService.snapshot_expense(expense)
         expense.is_settled = not expense.is_settled
+        BalanceLedgerService.expense_changed(
+            db, expense.event_id, old=old_snapshot, new=BalanceLedgerService.snapshot_expense(expense)
+        )
 
         # Nur bei vorgestreckten Ausgaben (paid_by ist ausgefüllt) Tasks synchronisieren
         if expense.paid_by:
@@ -408,7 +479,7 @@ async def toggle_settled(expense_id: int, db: Session = Depends(get_db), event_i
 
 
 @router.get("/{expense_id}/receipt/download")
-async def download_expense_receipt(
+def download_expense_receipt(
     expense_id: int,
     db: Session = Depends(get_db),
     event_id: int = Depends(get_current_event_id)
@@ -450,7 +521,7 @@ async def download_expense_receipt(
 
 
 @router.post("/{expense_id}/delete")
-async def delete_expense(
+def delete_expense(
     expense_id: int,
     db: Session = Depends(get_db),
     event_id: int = Depends(get_current_event_id)
@@ -472,7 +543,9 @@ async def delete_expense(
             delete_receipt_file(expense.receipt_file_path)
             logger.info(f"Receipt deleted for expense {expense_id}")
 
+        old_snapshot = BalanceLedgerService.snapshot_expense(expense)
         db.delete(expense)
+        BalanceLedgerService.expense_changed(db, event_id, old=old_snapshot)
         db.commit()
         logger.info(f"Expense deleted: {expense_title} (ID: {expense_id})")
         return RedirectResponse(url="/expenses", status_code=303)
@@ -0,0 +1,486 @@
+"""Export Job Service - Hintergrund-Jobs für aufwändige Exporte (PDF, Excel, ZIP)"""
+import json
+import logging
+import os
+import re
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+from typing import Dict, Any, Optional, Callable, Tuple, Iterator
+
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index, and_, or_, func
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import Base
+from app.utils.datetime_utils import utcnow
+
+logger = logging.getLogger(__name__)
+
+# Maximal gleichzeitig laufende Export-Jobs (weitere warten in der Queue)
+EXPORT_JOB_WORKERS = 2
+
+# Fertige Jobs und ihre Dateien werden nach dieser Zeit entfernt
+EXPORT_JOB_TTL = timedelta(hours=24)
+
+# Fortschritt höchstens so oft in die Datenbank schreiben (Sekunden)
+PROGRESS_WRITE_INTERVAL = 0.5
+
+# Abstand, in dem ein Prozess seine Jobs als lebendig markiert (Sekunden)
+HEARTBEAT_INTERVAL = 30
+
+# Jobs fremder Prozesse ohne Lebenszeichen seit dieser Zeit gelten als abgebrochen
+HEARTBEAT_STALE_AFTER = timedelta(seconds=3 * HEARTBEAT_INTERVAL)
+
+# Blockgröße beim Ausliefern der Dateien
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Job-Status
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+ACTIVE_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+
+_JOB_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{16,64}$")
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+# Signatur einer Job-Funktion: (db, context, **params) -> (Dateiname, Media-Type)
+JobFunction = Callable[..., Tuple[str, str]]
+
+
+class ExportJob(Base):
+    """
+    Export-Job mit Status, Fortschritt und erzeugter Datei
+
+    Die Datei liegt unter export_dir/<id> und wird über /jobs/<id>/download
+    ausgeliefert. params enthält die Export-Parameter (für die Erkennung
+    doppelt angestoßener Exporte). owner ist der Prozess, der den Job
+    ausführt; er aktualisiert heartbeat_at, solange der Job aktiv ist.
+    """
+    __tablename__ = "export_jobs"
+    __table_args__ = (
+        Index("ix_export_jobs_event_status", "event_id", "status"),
+    )
+
+    id = Column(String(64), primary_key=True)
+    event_id = Column(Integer, nullable=False)
+    kind = Column(String(50), nullable=False)
+    title = Column(String(200), nullable=False)
+    params = Column(Text, nullable=True)
+
+    status = Column(String(20), nullable=False, default=JOB_QUEUED)
+    progress = Column(Integer, nullable=False, default=0)
+    message = Column(String(200), nullable=True)
+    error = Column(Text, nullable=True)
+
+    filename = Column(String(255), nullable=True)
+    media_type = Column(String(100), nullable=True)
+    size = Column(Integer, nullable=True)
+
+    owner = Column(String(64), nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+
+    created_at = Column(DateTime, default=utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (JOB_DONE, JOB_FAILED)
+
+    @property
+    def download_url(self) -> str:
+        return f"/jobs/{self.id}/download"
+
+
+class JobContext:
+    """
+    Übergabe an die Job-Funktion: Fortschritt melden und Ergebnisdatei schreiben
+    """
+
+    def __init__(self, service: "ExportJobService", job_id: str):
+        self._service = service
+        self.job_id = job_id
+        self._last_write = 0.0
+        self._last_percent = -1
+
+    @property
+    def artifact_path(self) -> Path:
+        """Temporärer Pfad der Ergebnisdatei (wird nach Erfolg umbenannt)"""
+        return self._service.partial_path(self.job_id)
+
+    def open_artifact(self):
+        """Öffnet die Ergebnisdatei zum Schreiben (binär)"""
+        return open(self.artifact_path, "wb")
+
+    def progress(self, done: int, total: int, message: Optional[str] = None) -> None:
+        """
+        Meldet den Fortschritt
+
+        Args:
+            done: Bereits erledigte Schritte
+            total: Gesamtzahl der Schritte
+            message: Optionaler Statustext
+        """
+        percent = min(99, int(done * 100 / total)) if total else 0
+        now = time.monotonic()
+        if percent == self._last_percent and message is None:
+            return
+        if now - self._last_write < PROGRESS_WRITE_INTERVAL and percent < 99:
+            return
+
+        self._last_write = now
+        self._last_percent = percent
+        fields = {"progress": percent}
+        if message is not None:
+            fields["message"] = message
+        self._service._update(self.job_id, **fields)
+
+
+class ExportJobService:
+    """
+    Hintergrund-Jobs für Exporte
+
+    Die Export-Endpunkte legen einen Job an und leiten auf die Statusseite
+    weiter, statt die Datei im Request zu erzeugen. Ein Thread-Pool mit
+    EXPORT_JOB_WORKERS Threads arbeitet die Jobs ab (weitere warten in der
+    Queue), jeder Job mit eigener Datenbank-Session. Status und Fortschritt
+    stehen in der Tabelle export_jobs, die fertige Datei im Export-Verzeichnis.
+
+    Jeder Job gehört dem Prozess, der ihn angelegt hat (mehrere Worker-
+    Prozesse teilen sich die Tabelle). Ein Heartbeat-Thread markiert die
+    eigenen aktiven Jobs alle HEARTBEAT_INTERVAL Sekunden als lebendig.
+    Aktive Jobs fremder Prozesse ohne Lebenszeichen seit HEARTBEAT_STALE_AFTER
+    (Prozess beendet oder neu gestartet) werden bei submit und get (z.B.
+    durch die Statusseite) als fehlgeschlagen markiert und ihre .part-Dateien
+    entfernt.
+    """
+
+    def __init__(self, export_dir: str, max_workers: int = EXPORT_JOB_WORKERS, ttl: timedelta = EXPORT_JOB_TTL):
+        self.export_dir = Path(export_dir)
+        self.max_workers = max_workers
+        self.ttl = ttl
+        self._executor = None
+        self._lock = threading.Lock()
+        self._heartbeat = None
+        self._owner = f"{os.getpid()}-{secrets.token_hex(8)}"
+        self._active_ids = set()
+        self._last_recovery = 0.0
+
+    # ===== Pfade =====
+
+    def artifact_path(self, job_id: str) -> Path:
+        if not _JOB_ID_PATTERN.match(job_id or ""):
+            raise ValueError("Ungültige Job-ID")
+        return self.export_dir / job_id
+
+    def partial_path(self, job_id: str) -> Path:
+        return self.artifact_path(job_id).with_suffix(".part")
+
+    # ===== Pool =====
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="export-job")
+                self._heartbeat = threading.Thread(target=self._heartbeat_loop, name="export-job-heartbeat", daemon=True)
+                self._heartbeat.start()
+                logger.info(f"Started export job pool with {self.max_workers} workers (owner {self._owner})")
+            return self._executor
+
+    def _heartbeat_loop(self) -> None:
+        """Markiert die eigenen wartenden und laufenden Jobs regelmäßig als lebendig"""
+        while True:
+            time.sleep(HEARTBEAT_INTERVAL)
+            with self._lock:
+                job_ids = list(self._active_ids)
+            if not job_ids:
+                continue
+            try:
+                db_gen, db = self._session()
+                try:
+                    db.query(ExportJob).filter(ExportJob.id.in_(job_ids)).update(
+                        {"heartbeat_at": utcnow()}, synchronize_session=False
+                    )
+                    db.commit()
+                finally:
+                    db_gen.close()
+            except Exception as e:
+                logger.warning(f"Export job heartbeat failed: {e}")
+
+    @staticmethod
+    def _session():
+        """Eigene Session für Worker-Threads (wie im Request über get_db)"""
+        from app.database import get_db
+
+        db_gen = get_db()
+        return db_gen, next(db_gen)
+
+    def _update(self, job_id: str, **fields) -> None:
+        """Schreibt Status-Felder eines Jobs in einer kurzen eigenen Transaktion"""
+        db_gen, db = self._session()
+        try:
+            db.query(ExportJob).filter(ExportJob.id == job_id).update(fields, synchronize_session=False)
+            db.commit()
+        finally:
+            db_gen.close()
+
+    # ===== Jobs =====
+
+    def submit(
+        self,
+        db: Session,
+        event_id: int,
+        kind: str,
+        title: str,
+        func: JobFunction,
+        **params
+    ) -> ExportJob:
+        """
+        Legt einen Export-Job an und reiht ihn in den Pool ein
+
+        Läuft für das Event bereits ein Job gleicher Art mit denselben
+        Parametern, wird dieser zurückgegeben statt einen zweiten zu starten.
+
+        Args:
+            db: Datenbank-Session
+            event_id: ID des Events
+            kind: Art des Exports (z.B. "invoices_zip")
+            title: Anzeigename
+            func: Job-Funktion (db, context, event_id=..., **params) -> (Dateiname, Media-Type)
+            **params: JSON-serialisierbare Parameter für die Job-Funktion
+
+        Returns:
+            ExportJob
+        """
+        self.recover_interrupted(db)
+        self.cleanup_expired(db)
+
+        params_json = json.dumps(params, sort_keys=True, default=str)
+        running = db.query(ExportJob).filter(
+            ExportJob.event_id == event_id,
+            ExportJob.kind == kind,
+            ExportJob.params == params_json,
+            ExportJob.status.in_(ACTIVE_STATUSES)
+        ).first()
+        if running:
+            logger.info(f"Export job {running.id} ({kind}) already active, reusing it")
+            return running
+
+        job = ExportJob(
+            id=secrets.token_urlsafe(16),
+            event_id=event_id,
+            kind=kind,
+            title=title,
+            params=params_json,
+            status=JOB_QUEUED,
+            progress=0,
+            message="Wartet auf Ausführung",
+            owner=self._owner,
+            heartbeat_at=utcnow()
+        )
+        db.add(job)
+        db.commit()
+
+        executor = self._get_executor()
+        with self._lock:
+            self._active_ids.add(job.id)
+        executor.submit(self._run, job.id, event_id, func, params)
+        logger.info(f"Queued export job {job.id} ({kind}) for event {event_id}")
+        return job
+
+    def _run(self, job_id: str, event_id: int, func: JobFunction, params: Dict[str, Any]) -> None:
+        """Führt einen Job im Worker-Thread aus"""
+        try:
+            self._execute(job_id, event_id, func, params)
+        finally:
+            with self._lock:
+                self._active_ids.discard(job_id)
+
+    def _execute(self, job_id: str, event_id: int, func: JobFunction, params: Dict[str, Any]) -> None:
+        """Erzeugt die Datei eines Jobs und schreibt das Ergebnis"""
+        self.export_dir.mkdir(parents=True, exist_ok=True)
+        self._update(job_id, status=JOB_RUNNING, started_at=utcnow(), message="Wird erstellt")
+        started = time.perf_counter()
+
+        context = JobContext(self, job_id)
+        db_gen, db = self._session()
+        try:
+            filename, media_type = func(db, context, event_id=event_id, **params)
+            os.replace(context.artifact_path, self.artifact_path(job_id))
+            size = self.artifact_path(job_id).stat().st_size
+        except Exception as e:
+            logger.exception(f"Export job {job_id} failed: {e}")
+            try:
+                context.artifact_path.unlink()
+            except OSError:
+                pass
+            self._update(job_id, status=JOB_FAILED, error=str(e), message="Fehlgeschlagen", finished_at=utcnow())
+            return
+        finally:
+            db_gen.close()
+
+        self._update(
+            job_id,
+            status=JOB_DONE,
+            progress=100,
+            message="Fertig",
+            filename=filename,
+            media_type=media_type,
+            size=size,
+            finished_at=utcnow()
+        )
+        logger.info(f"Export job {job_id} done in {time.perf_counter() - started:.1f}s: {filename} ({size} bytes)")
+
+    def get(self, db: Session, job_id: str, event_id: int) -> Optional[ExportJob]:
+        """
+        Lädt einen Job des aktuellen Events
+
+        Returns:
+            ExportJob oder None (unbekannt oder anderes Event)
+        """
+        if not _JOB_ID_PATTERN.match(job_id or ""):
+            return None
+        self.recover_interrupted(db)
+        return db.query(ExportJob).filter(ExportJob.id == job_id, ExportJob.event_id == event_id).first()
+
+    def recover_interrupted(self, db: Session) -> int:
+        """
+        Markiert abgebrochene Jobs fremder Prozesse als fehlgeschlagen
+
+        Erfasst werden nur aktive Jobs, die einem anderen Prozess gehören und
+        seit HEARTBEAT_STALE_AFTER kein Lebenszeichen mehr gegeben haben (der
+        Besitzer wurde beendet oder neu gestartet). Jobs lebender Worker-Prozesse
+        und eigene Jobs bleiben unberührt. Die .part-Dateien der erfassten Jobs
+        werden gelöscht. Läuft höchstens alle HEARTBEAT_INTERVAL Sekunden.
+
+        Args:
+            db: Datenbank-Session
+
+        Returns:
+            Anzahl der als fehlgeschlagen markierten Jobs
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._last_recovery and now - self._last_recovery < HEARTBEAT_INTERVAL:
+                return 0
+            self._last_recovery = now
+
+        cutoff = utcnow() - HEARTBEAT_STALE_AFTER
+        stale = and_(
+            ExportJob.status.in_(ACTIVE_STATUSES),
+            or_(ExportJob.owner.is_(None), ExportJob.owner != self._owner),
+            func.coalesce(ExportJob.heartbeat_at, ExportJob.created_at) < cutoff
+        )
+
+        job_ids = [job_id for (job_id,) in db.query(ExportJob.id).filter(stale).all()]
+        if not job_ids:
+            return 0
+
+        # Bedingung je Job wiederholen: ein Heartbeat zwischen Abfrage und Update gewinnt
+        count = 0
+        for job_id in job_ids:
+            updated = db.query(ExportJob).filter(ExportJob.id == job_id, stale).update(
+                {"status": JOB_FAILED, "error": "Durch Neustart abgebrochen", "message": "Fehlgeschlagen",
+                 "finished_at": utcnow()},
+                synchronize_session=False
+            )
+            db.commit()
+            if not updated:
+                continue
+            count += 1
+            try:
+                self.partial_path(job_id).unlink()
+            except (ValueError, OSError):
+                pass
+
+        if count:
+            logger.warning(f"Marked {count} interrupted export jobs of other processes as failed")
+        return count
+
+    def cleanup_expired(self, db: Session) -> int:
+        """
+        Entfernt abgelaufene Jobs und ihre Dateien
+
+        Returns:
+            Anzahl gelöschter Jobs
+        """
+        cutoff = utcnow() - self.ttl
+        expired = db.query(ExportJob).filter(
+            ExportJob.created_at < cutoff,
+            ExportJob.status.notin_(ACTIVE_STATUSES)
+        ).all()
+
+        for job in expired:
+            try:
+                self.artifact_path(job.id).unlink()
+            except (ValueError, OSError):
+                pass
+            db.delete(job)
+
+        if expired:
+            db.commit()
+            logger.info(f"Removed {len(expired)} expired export jobs")
+        return len(expired)
+
+
+def parse_byte_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Wertet einen Range-Header aus (nur ein einzelner Bereich)
+
+    Args:
+        range_header: Wert des Range-Headers, z.B. "bytes=0-1023" oder "bytes=-500"
+        size: Dateigröße
+
+    Returns:
+        Tuple (start, end) inklusive oder None für die vollständige Datei
+
+    Raises:
+        ValueError: Wenn der Bereich nicht erfüllbar ist (416)
+    """
+    if not range_header:
+        return None
+
+    match = _RANGE_PATTERN.match(range_header.strip())
+    if not match:
+        # Mehrere Bereiche oder andere Einheiten: vollständige Datei liefern
+        return None
+
+    start_text, end_text = match.groups()
+    if not start_text and not end_text:
+        return None
+
+    if not start_text:
+        # Suffix-Range: die letzten n Bytes
+        length = int(end_text)
+        if length == 0:
+            raise ValueError("Leerer Bereich")
+        return max(0, size - length), size - 1
+
+    start = int(start_text)
+    end = int(end_text) if end_text else size - 1
+    if start >= size or end < start:
+        raise ValueError("Bereich außerhalb der Datei")
+    return start, min(end, size - 1)
+
+
+def iter_file_range(path: Path, start: int, end: int) -> Iterator[bytes]:
+    """Liest einen Dateibereich (inklusive end) blockweise"""
+    with open(path, "rb") as file_obj:
+        file_obj.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = file_obj.read(min(DOWNLOAD_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+# Prozessweiter Job-Service
+export_jobs = ExportJobService(export_dir=str(settings.base_dir / "exports"))
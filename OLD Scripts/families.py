@@ -22,7 +22,7 @@ router = APIRouter(prefix="/families", tags=["families"])
 
 
 @router.get("/", response_class=HTMLResponse)
-async def list_families(
+def list_families(
     request: Request,
     db: Session = Depends(get_db),
     event_id: int = Depends(get_current_event_id)
@@ -33,7 +33,7 @@ async def list_families(
 
 
 @router.get("/create", response_class=HTMLResponse)
-async def create_family_form(request: Request, db: Session = Depends(get_db)):
+def create_family_form(request: Request, db: Session = Depends(get_db)):
     """Formular zum Erstellen einer neuen Familie"""
     return templates.TemplateResponse(
         "families/create.html",
@@ -45,7 +45,7 @@ async def create_family_form(request: Request, db: Session = Depends(get_db)):
 
 
 @router.post("/create", response_class=HTMLResponse)
-async def create_family(
+def create_family(
     request: Request,
     db: Session = Depends(get_db),
     event_id: int = Depends(get_current_event_id),
@@ -127,7 +127,7 @@ async def create_family(
 
 
 @router.get("/{family_id}", response_class=HTMLResponse)
-async def view_family(
+def view_family(
     request: Request,
     family_id: int,
     db: Session = Depends(get_db),
@@ -193,7 +193,7 @@ async def view_family(
 
 
 @router.get("/{family_id}/edit", response_class=HTMLResponse)
-async def edit_family_form(
+def edit_family_form(
     request: Request,
     family_id: int,
     db: Session = Depends(get_db),
@@ -221,7 +221,7 @@ async def edit_family_form(
 
 
 @router.post("/{family_id}/edit", response_class=HTMLResponse)
-async def update_family(
+def update_family(
     request: Request,
     family_id: int,
     db: Session = Depends(get_db),
@@ -298,7 +298,7 @@ async def update_family(
 
 
 @router.post("/{family_id}/delete")
-async def delete_family(
+def delete_family(
     request: Request,
     family_id: int,
     db: Session = Depends(get_db),
@@ -0,0 +1,412 @@
+"""History PDF Service - Transaktionshistorie als PDF, seitenweise und parallel gerendert"""
+import logging
+import os
+import threading
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from io import BytesIO
+from itertools import chain
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import cm
+from reportlab.platypus import SimpleDocTemplate, Table, LongTable, TableStyle, Paragraph, Spacer, PageBreak
+
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:
+    PdfReader = PdfWriter = None
+
+logger = logging.getLogger(__name__)
+
+# Transaktionen pro Seite (eine Tabellenzeile ist einzeilig, siehe _single_line)
+HISTORY_ROWS_PER_PAGE = 34
+
+# Transaktionen auf der ersten Seite (darüber stehen Titel, Filter und Zusammenfassung)
+HISTORY_FIRST_PAGE_ROWS = 16
+
+# Seiten pro Render-Auftrag an einen Worker-Prozess
+HISTORY_PAGES_PER_CHUNK = 20
+
+# Anzahl Worker-Prozesse für das parallele Rendern (ein Worker pro CPU-Kern)
+HISTORY_RENDER_WORKERS = os.cpu_count() or 1
+
+HISTORY_TABLE_HEADER = ["Datum", "Typ", "Betrag", "Saldo", "Beleg", "Referenz", "Beschreibung"]
+HISTORY_COLUMN_WIDTHS = [2*cm, 3.2*cm, 2.2*cm, 2.2*cm, 1.5*cm, 3.5*cm, 4*cm]
+
+HISTORY_TABLE_STYLE = [
+    # Header
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e40af')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 8),
+    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+
+    # Daten
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 1), (-1, -1), 7),
+    ('ALIGN', (0, 1), (1, -1), 'LEFT'),  # Datum, Typ
+    ('ALIGN', (2, 1), (4, -1), 'RIGHT'),  # Betrag, Saldo, Beleg
+    ('ALIGN', (5, 1), (-1, -1), 'LEFT'),  # Referenz, Beschreibung
+
+    # Gitter
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ('TOPPADDING', (0, 0), (-1, -1), 4),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+    ('LEFTPADDING', (0, 0), (-1, -1), 3),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 3),
+
+    # Alternierende Zeilen-Farben
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#F8F9FA')]),
+]
+
+INCOME_COLOR = colors.HexColor('#00B050')
+EXPENSE_COLOR = colors.HexColor('#C00000')
+
+_render_pool = None
+_render_pool_lock = threading.Lock()
+
+# Eine Seite: Liste von (Tabellenzeile, ist Einnahme)
+HistoryPage = List[Tuple[List[str], bool]]
+
+
+def get_history_render_pool() -> ProcessPoolExecutor:
+    """
+    Liefert den prozessweiten Process-Pool für das Rendern der Transaktionshistorie
+
+    Der Pool wird beim ersten Aufruf erstellt (ein Worker pro CPU-Kern) und
+    danach wiederverwendet.
+
+    Returns:
+        ProcessPoolExecutor
+    """
+    global _render_pool
+
+    with _render_pool_lock:
+        if _render_pool is None:
+            _render_pool = ProcessPoolExecutor(max_workers=HISTORY_RENDER_WORKERS)
+            logger.info(f"Started history PDF render pool with {HISTORY_RENDER_WORKERS} workers")
+        return _render_pool
+
+
+def _single_line(value: Optional[str]) -> str:
+    """Zeilenumbrüche entfernen, damit jede Tabellenzeile genau eine Textzeile hoch ist"""
+    return " ".join((value or "").split())
+
+
+def history_pdf_row(transaction: Dict[str, Any]) -> Tuple[List[str], bool]:
+    """
+    Tabellenzeile einer Transaktion (siehe TransactionQueryService._row_dict)
+
+    Args:
+        transaction: Transaktion als Dictionary
+
+    Returns:
+        Tuple (Zellen, ist Einnahme)
+    """
+    # Beschreibung zusammenstellen
+    desc_parts = []
+    if transaction['reference']:
+        desc_parts.append(transaction['reference'])
+    if transaction['participant_name']:
+        desc_parts.append(f"({transaction['participant_name']})")
+    if transaction['family_name']:
+        desc_parts.append(f"Familie: {transaction['family_name']}")
+    if transaction['description']:
+        desc_parts.append(transaction['description'])
+    description_text = _single_line(" - ".join(desc_parts))
+
+    # Beschreibung auf max. 40 Zeichen kürzen für bessere Lesbarkeit
+    if len(description_text) > 40:
+        description_text = description_text[:37] + "..."
+
+    cells = [
+        transaction['transaction_date'].strftime('%d.%m.%Y'),
+        transaction['type_label'],
+        f"{transaction['amount']:.2f} €",
+        f"{transaction['running_balance']:.2f} €",
+        "Ja" if transaction['receipt_available'] else "-",
+        _single_line(transaction['reference']),
+        description_text
+    ]
+    return cells, transaction['amount'] > 0
+
+
+def count_history_pages(row_count: int) -> int:
+    """Anzahl Seiten für row_count Transaktionen (mindestens eine)"""
+    remaining = max(0, row_count - HISTORY_FIRST_PAGE_ROWS)
+    return 1 + -(-remaining // HISTORY_ROWS_PER_PAGE)
+
+
+def paginate_history_rows(rows: Iterable[Tuple[List[str], bool]]) -> Iterator[HistoryPage]:
+    """
+    Teilt die Zeilen in Seiten auf (erste Seite kürzer, mindestens eine Seite)
+
+    Args:
+        rows: Tabellenzeilen (werden nur einmal durchlaufen)
+
+    Yields:
+        Zeilen einer Seite
+    """
+    page: HistoryPage = []
+    capacity = HISTORY_FIRST_PAGE_ROWS
+    emitted = False
+
+    for row in rows:
+        page.append(row)
+        if len(page) == capacity:
+            yield page
+            emitted = True
+            page = []
+            capacity = HISTORY_ROWS_PER_PAGE
+
+    if page or not emitted:
+        yield page
+
+
+def _header_story(header: Dict[str, Any]) -> list:
+    """Titel, Filter-Informationen und Zusammenfassung der ersten Seite"""
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=18,
+        textColor=colors.HexColor('#1e40af'),
+        spaceAfter=20,
+        alignment=1  # Center
+    )
+    heading_style = ParagraphStyle(
+        'CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=12,
+        textColor=colors.HexColor('#1e40af'),
+        spaceAfter=10,
+    )
+    small_style = ParagraphStyle(
+        'Small',
+        parent=styles['Normal'],
+        fontSize=8,
+    )
+
+    story = [
+        Paragraph("Transaktionshistorie", title_style),
+        Paragraph(f"Event: {header['event_name']}", heading_style),
+        Paragraph(header['info_text'], small_style),
+        Spacer(1, 0.5*cm)
+    ]
+
+    summary_table = Table(header['summary'], colWidths=[10*cm, 5*cm])
+    summary_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#E8F4F8')),
+        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#1e40af')),
+        ('TOPPADDING', (0, 0), (-1, -1), 8),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+        ('TEXTCOLOR', (1, 2), (1, 2), colors.HexColor('#1e40af') if header['net_positive'] else colors.red),
+    ]))
+    story.append(summary_table)
+    story.append(Spacer(1, 0.8*cm))
+    story.append(Paragraph("Transaktionen", heading_style))
+    return story
+
+
+def _page_table(page: HistoryPage) -> LongTable:
+    """Tabelle einer Seite mit Kopfzeile (wird bei einem Überlauf wiederholt)"""
+    table = LongTable(
+        [HISTORY_TABLE_HEADER] + [cells for cells, _ in page],
+        colWidths=HISTORY_COLUMN_WIDTHS,
+        repeatRows=1
+    )
+    style = list(HISTORY_TABLE_STYLE)
+    for idx, (_, is_income) in enumerate(page, start=1):
+        style.append(('TEXTCOLOR', (2, idx), (2, idx), INCOME_COLOR if is_income else EXPENSE_COLOR))
+    table.setStyle(TableStyle(style))
+    return table
+
+
+def render_history_chunk(chunk: Dict[str, Any]) -> Tuple[bytes, int]:
+    """
+    Rendert aufeinanderfolgende Seiten der Historie (läuft in einem Worker-Prozess)
+
+    Jede Seite ist eine eigene Tabelle; ReportLab muss damit nie eine
+    Tabelle über alle Transaktionen umbrechen.
+
+    Args:
+        chunk: Dictionary mit pages (Seiten), first_page (Seitenzahl der ersten
+            Seite), header (Kopfdaten, nur beim ersten Auftrag) und generated_at
+
+    Returns:
+        Tuple (PDF-Bytes, Anzahl gerenderter Seiten)
+    """
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=A4,
+        topMargin=1.5*cm,
+        bottomMargin=2*cm,
+        leftMargin=1.5*cm,
+        rightMargin=1.5*cm
+    )
+
+    story = _header_story(chunk["header"]) if chunk.get("header") else []
+    for index, page in enumerate(chunk["pages"]):
+        if index:
+            story.append(PageBreak())
+        story.append(_page_table(page))
+
+    # Seitenzahlen relativ zur ersten Seite des Auftrags
+    def add_page_number(canvas, doc):
+        """Fügt Seitenzahlen und Footer hinzu"""
+        page_num = chunk["first_page"] + canvas.getPageNumber() - 1
+        text = f"Seite {page_num} - Generiert am {chunk['generated_at']}"
+        canvas.setFont('Helvetica', 8)
+        canvas.setFillColor(colors.grey)
+        canvas.drawRightString(A4[0] - 1.5*cm, 1*cm, text)
+
+    doc.build(story, onFirstPage=add_page_number, onLaterPages=add_page_number)
+    return buffer.getvalue(), doc.page
+
+
+class HistoryPdfRenderer:
+    """
+    PDF der Transaktionshistorie
+
+    Die Transaktionen werden in Seiten fester Zeilenzahl aufgeteilt und
+    jeweils HISTORY_PAGES_PER_CHUNK Seiten als eigenes Dokument in einem
+    Worker-Prozess gerendert; die Teildokumente werden in Reihenfolge zu einem
+    PDF zusammengefügt. Es sind höchstens so viele Aufträge gleichzeitig in
+    Arbeit wie der Pool Worker hat, die Zeilen werden also nicht vollständig
+    im Speicher gehalten.
+
+    Ohne pypdf (zum Zusammenfügen) werden alle Seiten in einem Dokument im
+    aufrufenden Prozess gerendert.
+    """
+
+    @staticmethod
+    def _chunks(rows: Iterable[Tuple[List[str], bool]], header: Dict[str, Any], generated_at: str,
+                pages_per_chunk: int) -> Iterator[Dict[str, Any]]:
+        """Fasst die Seiten zu Render-Aufträgen zusammen"""
+        pages: List[HistoryPage] = []
+        first_page = 1
+
+        for page in paginate_history_rows(rows):
+            pages.append(page)
+            if len(pages) == pages_per_chunk:
+                yield {
+                    "pages": pages,
+                    "first_page": first_page,
+                    "header": header if first_page == 1 else None,
+                    "generated_at": generated_at
+                }
+                first_page += len(pages)
+                pages = []
+
+        if pages:
+            yield {
+                "pages": pages,
+                "first_page": first_page,
+                "header": header if first_page == 1 else None,
+                "generated_at": generated_at
+            }
+
+    @staticmethod
+    def _render_chunks(chunks: Iterator[Dict[str, Any]], pool: Optional[Executor],
+                       workers: int) -> Iterator[Tuple[Dict[str, Any], bytes, int]]:
+        """Rendert die Aufträge (im Pool oder im aufrufenden Prozess) und liefert sie in Reihenfolge"""
+        if pool is None:
+            for chunk in chunks:
+                pdf_bytes, page_count = render_history_chunk(chunk)
+                yield chunk, pdf_bytes, page_count
+            return
+
+        pending = deque()
+
+        def submit_next() -> None:
+            chunk = next(chunks, None)
+            if chunk is not None:
+                pending.append((chunk, pool.submit(render_history_chunk, chunk)))
+
+        for _ in range(workers):
+            submit_next()
+
+        try:
+            while pending:
+                chunk, future = pending.popleft()
+                submit_next()
+                pdf_bytes, page_count = future.result()
+                yield chunk, pdf_bytes, page_count
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+    @staticmethod
+    def render(
+        output: BinaryIO,
+        header: Dict[str, Any],
+        rows: Iterable[Tuple[List[str], bool]],
+        row_count: int,
+        generated_at: str,
+        pool: Optional[Executor] = None,
+        workers: int = HISTORY_RENDER_WORKERS,
+        pages_per_chunk: int = HISTORY_PAGES_PER_CHUNK,
+        progress: Optional[Callable[[int, int], None]] = None
+    ) -> int:
+        """
+        Schreibt das PDF der Transaktionshistorie
+
+        Args:
+            output: Ziel (binär beschreibbar)
+            header: Kopfdaten (event_name, info_text, summary, net_positive)
+            rows: Tabellenzeilen (siehe history_pdf_row), werden nur einmal durchlaufen
+            row_count: Anzahl Zeilen (für Seitenzahl und Fortschritt)
+            generated_at: Zeitstempel für den Footer
+            pool: Process-Pool für das parallele Rendern (None = im aufrufenden Prozess)
+            workers: Maximal gleichzeitig laufende Aufträge im Pool
+            pages_per_chunk: Seiten pro Auftrag
+            progress: Optionaler Callback (fertige Seiten, Seiten gesamt)
+
+        Returns:
+            Anzahl Seiten
+        """
+        total_pages = count_history_pages(row_count)
+
+        if PdfWriter is None:
+            logger.warning("pypdf not installed, rendering transaction history in a single document")
+            pages_per_chunk = total_pages
+            pool = None
+
+        chunks = HistoryPdfRenderer._chunks(rows, header, generated_at, pages_per_chunk)
+        rendered = HistoryPdfRenderer._render_chunks(chunks, pool, workers)
+
+        # Nur ein Teildokument: direkt schreiben
+        first = next(rendered)
+        second = next(rendered, None)
+        if second is None:
+            _, pdf_bytes, page_count = first
+            output.write(pdf_bytes)
+            if progress:
+                progress(page_count, page_count)
+            return page_count
+
+        writer = PdfWriter()
+        done = 0
+        for chunk, pdf_bytes, page_count in chain((first, second), rendered):
+            if page_count != len(chunk["pages"]):
+                logger.warning(
+                    f"History PDF chunk starting at page {chunk['first_page']} "
+                    f"rendered {page_count} pages instead of {len(chunk['pages'])}"
+                )
+            writer.append(PdfReader(BytesIO(pdf_bytes)))
+            done += page_count
+            if progress:
+                progress(done, total_pages)
+
+        writer.write(output)
+        return done
+
@@ -0,0 +1,188 @@
+"""Import Staging Service - Serverseitige Zwischenablage für Import-Vorschauen"""
+import json
+import logging
+import os
+import re
+import secrets
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Any, Optional, Iterable
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_PATTERN = re.compile(r"^[A-Za-z0-9_-]{20,64}$")
+
+
+class ImportStaging:
+    """
+    Spool-Dateien für geparste Import-Daten, adressiert über ein Import-Token
+
+    Die Vorschau legt die validierten Zeilen hier ab und schickt nur das Token
+    an den Browser. Die Bestätigung lädt die Daten wieder vom Server, statt sie
+    als JSON aus dem Formular zu übernehmen. Abgelaufene Dateien werden bei
+    jedem neuen Import entfernt.
+
+    Die Bestätigung beansprucht ein Token per Umbenennen der Spool-Datei
+    (<token>.json -> <token>.claimed, atomar), damit Doppelklicks, zweite Tabs
+    oder Wiederholungen denselben Import nicht mehrfach ausführen. Nach Erfolg
+    bleibt eine .done-Markierung bis zum Ablauf liegen, nach einem Fehler wird
+    das Token wieder freigegeben.
+    """
+
+    def __init__(self, staging_dir: str, ttl_seconds: int = 2 * 60 * 60):
+        self.staging_dir = Path(staging_dir)
+        self.ttl_seconds = ttl_seconds
+
+    def _path(self, token: str, suffix: str = ".json") -> Path:
+        if not _TOKEN_PATTERN.match(token or ""):
+            raise ValueError("Ungültiges Import-Token")
+        return self.staging_dir / f"{token}{suffix}"
+
+    def stage(self, event_id: int, data: Dict[str, Any]) -> str:
+        """
+        Legt Import-Daten ab
+
+        Args:
+            event_id: ID des Events (wird beim Laden geprüft)
+            data: Import-Daten (participants, families, errors)
+
+        Returns:
+            Import-Token
+        """
+        self.cleanup_expired()
+        self.staging_dir.mkdir(parents=True, exist_ok=True)
+
+        token = secrets.token_urlsafe(24)
+        fd, tmp_path = tempfile.mkstemp(dir=str(self.staging_dir), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as tmp_file:
+            json.dump({"event_id": event_id, "created_at": time.time(), "data": data}, tmp_file, default=str)
+        os.replace(tmp_path, self._path(token))
+
+        logger.info(f"Staged import {token} for event {event_id}: {len(data.get('participants', []))} rows")
+        return token
+
+    def claim(self, token: str, event_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Beansprucht abgelegte Import-Daten für genau eine Bestätigung
+
+        Args:
+            token: Import-Token
+            event_id: ID des aktuellen Events
+
+        Returns:
+            Import-Daten oder None (unbekannt, abgelaufen oder anderes Event)
+
+        Raises:
+            ValueError: Wenn der Import bereits läuft oder abgeschlossen ist
+        """
+        try:
+            path = self._path(token)
+            claimed_path = self._path(token, ".claimed")
+        except ValueError:
+            return None
+
+        try:
+            os.rename(path, claimed_path)
+        except OSError:
+            if self._path(token, ".done").exists():
+                raise ValueError("Dieser Import wurde bereits durchgeführt")
+            if claimed_path.exists():
+                raise ValueError("Dieser Import wird bereits ausgeführt")
+            return None
+
+        try:
+            with open(claimed_path, "r", encoding="utf-8") as staged_file:
+                staged = json.load(staged_file)
+        except (ValueError, OSError):
+            self.discard(token)
+            return None
+
+        if staged.get("event_id") != event_id:
+            logger.warning(f"Import token {token} does not belong to event {event_id}")
+            self.release(token)
+            return None
+        if time.time() - staged.get("created_at", 0) > self.ttl_seconds:
+            self.discard(token)
+            return None
+        return staged["data"]
+
+    def release(self, token: str) -> None:
+        """Gibt ein beanspruchtes Token wieder frei (Import fehlgeschlagen, nichts festgeschrieben)"""
+        try:
+            os.replace(self._path(token, ".claimed"), self._path(token))
+        except (ValueError, OSError):
+            pass
+
+    def complete(self, token: str) -> None:
+        """Markiert einen beanspruchten Import als durchgeführt (Daten werden verworfen)"""
+        try:
+            claimed_path = self._path(token, ".claimed")
+            done_path = self._path(token, ".done")
+            done_path.touch()
+            claimed_path.unlink()
+        except (ValueError, OSError):
+            pass
+
+    def discard(self, token: str) -> None:
+        """Löscht abgelegte oder beanspruchte Import-Daten"""
+        for suffix in (".json", ".claimed"):
+            try:
+                self._path(token, suffix).unlink()
+            except (ValueError, OSError):
+                pass
+
+    def cleanup_expired(self) -> int:
+        """
+        Entfernt abgelaufene Spool-Dateien
+
+        Returns:
+            Anzahl gelöschter Dateien
+        """
+        if not self.staging_dir.exists():
+            return 0
+
+        removed = 0
+        cutoff = time.time() - self.ttl_seconds
+        for path in self.staging_dir.iterdir():
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except OSError:
+                continue
+
+        if removed:
+            logger.info(f"Removed {removed} expired import staging files")
+        return removed
+
+    @staticmethod
+    def exclude_rows(data: Dict[str, Any], excluded_rows: Iterable[int]) -> Dict[str, Any]:
+        """
+        Entfernt vom Benutzer abgewählte Zeilen aus den Import-Daten
+
+        Args:
+            data: Import-Daten (participants, families)
+            excluded_rows: Zeilennummern, die nicht importiert werden sollen
+
+        Returns:
+            Gefilterte Import-Daten
+        """
+        excluded = set(excluded_rows)
+        if not excluded:
+            return data
+
+        return {
+            **data,
+            "participants": [p for p in data.get("participants", []) if p.get("row") not in excluded],
+            "families": {
+                family_number: [m for m in members if m.get("row") not in excluded]
+                for family_number, members in data.get("families", {}).items()
+            }
+        }
+
+
+# Prozessweite Staging-Ablage
+import_staging = ImportStaging(staging_dir=str(settings.base_dir / "import_staging"))
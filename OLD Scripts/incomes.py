@@ -1,6 +1,7 @@
 """Router für Einnahmen (Zuschüsse, Spenden, etc.)"""
 import logging
 from pathlib import Path
+from anyio import from_thread
 from fastapi import APIRouter, Request, Depends, Form, HTTPException, UploadFile, File
 from fastapi.responses import HTMLResponse, RedirectResponse, FileResponse
 from sqlalchemy.orm import Session, joinedload
@@ -13,6 +14,7 @@ from app.models.role import Role
 from app.dependencies import get_current_event_id
 from app.utils.flash import flash
 from app.utils.file_upload import save_receipt_file, delete_receipt_file
+from app.services.balance_ledger import BalanceLedgerService
 from app.templates_config import templates
 
 logger = logging.getLogger(__name__)
@@ -21,7 +23,7 @@ router = APIRouter(prefix="/incomes", tags=["incomes"])
 
 
 @router.get("/", response_class=HTMLResponse)
-async def list_incomes(
+def list_incomes(
     request: Request,
     db: Session = Depends(get_db),
     event_id: int = Depends(get_current_event_id)
@@ -64,7 +66,7 @@ async def list_incomes(
 
 
 @router.get("/create", response_class=HTMLResponse)
-async def new_income_form(
+def new_income_form(
     request: Request,
     db: Session = Depends(get_db),
     event_id: int = Depends(get_current_event_id)
@@ -83,7 +85,7 @@ async def new_income_form(
 
 
 @router.post("/create", response_class=HTMLResponse)
-async def create_income(
+def create_income(
     request: Request,
     name: str = Form(...),
     amount: float = Form(...),
@@ -115,12 +117,15 @@ async def create_income(
     )
 
     db.add(income)
+    BalanceLedgerService.income_changed(db, event_id, new_amount=amount)
     db.commit()
     db.refresh(income)
 
     # Beleg-Upload verarbeiten (falls vorhanden)
     if receipt_file and receipt_file.filename:
-        file_path, error = await save_receipt_file(
+        # Upload-Speicherung ist async, Handler läuft im Threadpool
+        file_path, error = from_thread.run(
+            save_receipt_file,
             receipt_file,
             event_id,
             income.id,
@@ -140,7 +145,7 @@ async def create_income(
 
 
 @router.get("/{income_id}/edit", response_class=HTMLResponse)
-async def edit_income_form(
+def edit_income_form(
     request: Request,
     income_id: int,
     db: Session = Depends(get_db),
@@ -164,7 +169,7 @@ async def edit_income_form(
 
 
 @router.post("/{income_id}/edit", response_class=HTMLResponse)
-async def update_income(
+def update_income(
     request: Request,
     income_id: int,
     name: str = Form(...),
@@ -192,6 +197,8 @@ async def update_income(
             flash(request, "Ungültige Rolle ausgewählt", "error")
             return RedirectResponse(url=f"/incomes/{income_id}/edit", status_code=303)
 
+    old_amount = income.amount
+
     income.name = name
     income.amount = amount
     income.date = date
@@ -211,7 +218,9 @@ async def update_income(
             delete_receipt_file(income.receipt_file_path)
 
         # Neuen Beleg speichern
-        file_path, error = await save_receipt_file(
+        # Upload-Speicherung ist async, Handler läuft im Threadpool
+        file_path, error = from_thread.run(
+            save_receipt_file,
             receipt_file,
             event_id,
             income.id,
@@ -225,6 +234,7 @@ async def update_income(
             income.receipt_file_path = file_path
             logger.info(f"Receipt updated for income {income.id}: {file_path}")
 
+    BalanceLedgerService.income_changed(db, event_id, old_amount=old_amount, new_amount=amount)
     db.commit()
 
     flash(request, f"Einnahme '{name}' erfolgreich aktualisiert", "success")
@@ -232,7 +242,7 @@ async def update_income(
 
 
 @router.get("/{income_id}/receipt/download")
-async def download_income_receipt(income_id: int, db: Session = Depends(get_db), event_id: int = Depends(get_current_event_id)):
+def download_income_receipt(income_id: int, db: Session = Depends(get_db), event_id: int = Depends(get_current_event_id)):
     """Lädt den Beleg einer Einnahme herunter"""
     income = db.query(Income).filter(Income.id == income_id, Income.event_id == event_id).first()
 
@@ -267,7 +277,7 @@ async def download_income_receipt(income_id: int, db: Session = Depends(get_db),
 
 
 @router.post("/{income_id}/delete", response_class=HTMLResponse)
-async def delete_income(
+def delete_income(
     request: Request,
     income_id: int,
     db: Session = Depends(get_db),
@@ -286,6 +296,7 @@ async def delete_income(
         logger.info(f"Receipt deleted for income {income_id}")
 
     db.delete(income)
+    BalanceLedgerService.income_changed(db, event_id, old_amount=income.amount)
     db.commit()
 
     flash(request, f"Einnahme '{name}' erfolgreich gelöscht", "success")
@@ -0,0 +1,195 @@
+"""Invoice Cache Service - Inhaltsadressierter Festplatten-Cache für gerenderte Rechnungen"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from datetime import date
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Bei Änderungen am Rechnungslayout erhöhen, damit alte PDFs nicht mehr verwendet werden
+INVOICE_LAYOUT_VERSION = 1
+
+
+class InvoiceCache:
+    """
+    Festplatten-Cache für Rechnungs-PDFs mit LRU-Verdrängung
+
+    Der Schlüssel ist ein SHA-256-Hash über alle Eingaben, die das Dokument
+    beeinflussen (Snapshot mit Teilnehmer-/Familiendaten, Zahlungen und
+    Preisaufschlüsselung, Einstellungen, Regelwerk-Version, Rechnungsdatum).
+    Ändert sich eine Eingabe, entsteht ein neuer Schlüssel - eine explizite
+    Invalidierung ist nicht nötig. Die Zugriffszeit (mtime) der Dateien dient
+    als LRU-Reihenfolge.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 200 * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._size_bytes = None
+
+    @staticmethod
+    def build_key(
+        kind: str,
+        data: Dict[str, Any],
+        settings: Dict[str, Any],
+        ruleset_version: Optional[str],
+        invoice_date: Optional[date] = None
+    ) -> str:
+        """
+        Berechnet den Cache-Schlüssel für eine Rechnung
+
+        Args:
+            kind: "participant" oder "family"
+            data: Rechnungs-Snapshot
+            settings: Einstellungs-Snapshot
+            ruleset_version: Fingerprint des aktiven Regelwerks
+            invoice_date: Rechnungsdatum (Standard: heute, Granularität Tag)
+
+        Returns:
+            Hex-String (SHA-256)
+        """
+        payload = json.dumps(
+            {
+                "layout": INVOICE_LAYOUT_VERSION,
+                "kind": kind,
+                "data": data,
+                "settings": settings,
+                "ruleset": ruleset_version,
+                "date": (invoice_date or date.today()).isoformat()
+            },
+            sort_keys=True,
+            default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.pdf"
+
+    def _ensure_size(self) -> None:
+        """Ermittelt die aktuelle Cache-Größe einmalig beim ersten Zugriff"""
+        if self._size_bytes is None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self._size_bytes = sum(path.stat().st_size for path in self.cache_dir.glob("*/*.pdf"))
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Liefert ein gecachtes PDF
+
+        Args:
+            key: Cache-Schlüssel
+
+        Returns:
+            PDF als bytes oder None
+        """
+        path = self._path(key)
+        try:
+            content = path.read_bytes()
+            # Zugriffszeit aktualisieren (LRU)
+            os.utime(path, None)
+        except FileNotFoundError:
+            with self._lock:
+                self._misses += 1
+            return None
+        except OSError as e:
+            logger.warning(f"Invoice cache read failed for {key}: {e}")
+            with self._lock:
+                self._misses += 1
+            return None
+
+        with self._lock:
+            self._hits += 1
+        return content
+
+    def put(self, key: str, content: bytes) -> None:
+        """
+        Speichert ein PDF im Cache (atomar) und verdrängt bei Bedarf alte Einträge
+
+        Args:
+            key: Cache-Schlüssel
+            content: PDF als bytes
+        """
+        path = self._path(key)
+        try:
+            with self._lock:
+                self._ensure_size()
+            path.parent.mkdir(parents=True, exist_ok=True)
+
+            # Atomar schreiben: temporäre Datei + rename
+            fd, tmp_path = tempfile.mkstemp(dir=str(path.parent), suffix=".tmp")
+            with os.fdopen(fd, "wb") as tmp_file:
+                tmp_file.write(content)
+            existed = path.exists()
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Invoice cache write failed for {key}: {e}")
+            return
+
+        with self._lock:
+            if not existed:
+                self._size_bytes += len(content)
+            if self._size_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        """Löscht die am längsten nicht verwendeten Einträge bis 90% von max_bytes (Lock wird gehalten)"""
+        target = int(self.max_bytes * 0.9)
+        entries = []
+        for path in self.cache_dir.glob("*/*.pdf"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        entries.sort()
+        size = sum(entry_size for _, entry_size, _ in entries)
+        for _, entry_size, path in entries:
+            if size <= target:
+                break
+            try:
+                path.unlink()
+                size -= entry_size
+                self._evictions += 1
+            except OSError:
+                continue
+
+        self._size_bytes = size
+        logger.debug(f"Invoice cache evicted down to {size} bytes")
+
+    def clear(self) -> None:
+        """Leert den Cache vollständig"""
+        with self._lock:
+            for path in self.cache_dir.glob("*/*.pdf"):
+                try:
+                    path.unlink()
+                except OSError:
+                    continue
+            self._size_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Zähler für das Monitoring
+
+        Returns:
+            Dictionary mit hits, misses, hit_rate, evictions, size_bytes, max_bytes
+        """
+        with self._lock:
+            self._ensure_size()
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+                "size_bytes": self._size_bytes,
+                "max_bytes": self.max_bytes
+            }
@@ -1,27 +1,529 @@
 """Invoice (Rechnung) Generator Service"""
 import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from io import BytesIO
 from datetime import datetime, date
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import cm
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
 from reportlab.pdfgen import canvas
-from sqlalchemy.orm import Session
-from app.services.qrcode_service import QRCodeService
+from sqlalchemy.orm import Session, selectinload
+from app.config import settings as app_settings
+from app.services.qrcode_cache import qr_code_cache
+from app.services.invoice_cache import InvoiceCache
 
 logger = logging.getLogger(__name__)
 
+# Felder der Einstellungen, die für die Rechnungserstellung benötigt werden
+INVOICE_SETTING_FIELDS = (
+    "organization_name",
+    "organization_address",
+    "invoice_subject_prefix",
+    "invoice_footer_text",
+    "bank_account_holder",
+    "bank_iban",
+    "bank_bic"
+)
+
+# Anzahl Worker-Prozesse für das parallele Rendern (ein Worker pro CPU-Kern)
+INVOICE_RENDER_WORKERS = os.cpu_count() or 1
+
+_render_pool = None
+_render_pool_lock = threading.Lock()
+
+# Festplatten-Cache für gerenderte Rechnungen (inhaltsadressiert, LRU)
+invoice_cache = InvoiceCache(cache_dir=str(app_settings.base_dir / "cache" / "invoices"))
+
+
+def get_invoice_render_pool() -> ProcessPoolExecutor:
+    """
+    Liefert den prozessweiten Process-Pool für das Rendern von Rechnungen
+
+    Der Pool wird beim ersten Aufruf erstellt (ein Worker pro CPU-Kern) und
+    danach wiederverwendet.
+
+    Returns:
+        ProcessPoolExecutor
+    """
+    global _render_pool
+
+    with _render_pool_lock:
+        if _render_pool is None:
+            _render_pool = ProcessPoolExecutor(max_workers=INVOICE_RENDER_WORKERS)
+            logger.info(f"Started invoice render pool with {INVOICE_RENDER_WORKERS} workers")
+        return _render_pool
+
+
+def _build_qr_image(settings: Dict[str, Any], outstanding: float, payment_reference: str):
+    """Erstellt das SEPA-QR-Code-Bild für einen offenen Betrag (oder None)"""
+    if outstanding <= 0:
+        return None
+
+    try:
+        qr_code_bytes = qr_code_cache.generate_sepa_qr_code(
+            recipient_name=settings["bank_account_holder"],
+            iban=settings["bank_iban"],
+            amount=outstanding,
+            purpose=payment_reference,
+            bic=settings["bank_bic"]
+        )
+        return Image(BytesIO(qr_code_bytes), width=3.5*cm, height=3.5*cm)
+    except Exception as e:
+        print(f"Warnung: QR-Code konnte nicht generiert werden: {e}")
+        return None
+
+
+def render_participant_invoice(data: Dict[str, Any], settings: Dict[str, Any]) -> bytes:
+    """
+    Rendert eine Einzelrechnung aus einem Daten-Snapshot (ohne Datenbankzugriff)
+
+    Args:
+        data: Teilnehmer-Snapshot (siehe InvoiceGenerator.build_participant_snapshot)
+        settings: Einstellungs-Snapshot (siehe InvoiceGenerator.build_settings_snapshot)
+
+    Returns:
+        PDF als bytes
+    """
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=2*cm)
+    story = []
+
+    # Styles
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=colors.HexColor('#1e40af'),
+        spaceAfter=30,
+    )
+    heading_style = styles['Heading2']
+    normal_style = styles['Normal']
+
+    # Absender/Organisation
+    story.append(Paragraph(settings["organization_name"], title_style))
+    if settings["organization_address"]:
+        # Adresse aufbereiten (Zeilenumbrüche durch • ersetzen für kompakte Anzeige)
+        address_compact = settings["organization_address"].replace('\n', ' • ')
+        story.append(Paragraph(address_compact, normal_style))
+    story.append(Spacer(1, 0.5*cm))
+
+    # Rechnungsnummer und Datum
+    invoice_number = f"R-{data['id']:06d}-{datetime.now().year}"
+    invoice_date = datetime.now().strftime("%d.%m.%Y")
+
+    # QR-Code für SEPA-Zahlung vorbereiten (falls offen)
+    total_paid = data["total_paid"]
+    outstanding = data["outstanding"]
+
+    # Verwendungszweck: Präfix + Teilnehmername
+    subject_prefix = settings["invoice_subject_prefix"] or "Teilnahmegebühr"
+    payment_reference = f"{subject_prefix} {data['full_name']}"
+
+    qr_image = _build_qr_image(settings, outstanding, payment_reference)
+
+    # Info-Tabelle links, QR-Code rechts
+    if qr_image:
+        # Info und QR-Code in einer Tabelle nebeneinander
+        info_data = [
+            ["Rechnungsnummer:", invoice_number, qr_image],
+            ["Rechnungsdatum:", invoice_date, ""],
+            ["Teilnehmer-ID:", str(data["id"]), ""]
+        ]
+        info_table = Table(info_data, colWidths=[5*cm, 6*cm, 4*cm])
+        info_table.setStyle(TableStyle([
+            ('ALIGN', (0, 0), (1, -1), 'LEFT'),
+            ('ALIGN', (2, 0), (2, 0), 'RIGHT'),
+            ('VALIGN', (2, 0), (2, 0), 'MIDDLE'),
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (1, -1), 5),
+            ('SPAN', (2, 0), (2, 2)),  # QR-Code über alle 3 Zeilen spannen
+        ]))
+    else:
+        info_data = [
+            ["Rechnungsnummer:", invoice_number],
+            ["Rechnungsdatum:", invoice_date],
+            ["Teilnehmer-ID:", str(data["id"])]
+        ]
+        info_table = Table(info_data, colWidths=[5*cm, 6*cm])
+        info_table.setStyle(TableStyle([
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
+        ]))
+
+    story.append(info_table)
+    story.append(Spacer(1, 1*cm))
+
+    # Empfänger
+    story.append(Paragraph("Rechnung für:", heading_style))
+    recipient_text = f"{data['full_name']}<br/>"
+    if data["address"]:
+        recipient_text += data["address"].replace('\n', '<br/>')
+    story.append(Paragraph(recipient_text, normal_style))
+    story.append(Spacer(1, 1*cm))
+
+    # Betreff (für Rechnung - nicht für Überweisung)
+    subject_prefix_display = settings["invoice_subject_prefix"] or "Teilnahme an"
+    story.append(Paragraph(f"{subject_prefix_display}: {data['event_name']}", heading_style))
+    story.append(Spacer(1, 0.5*cm))
+
+    # Preis-Aufschlüsselung (bereits im Snapshot berechnet)
+    breakdown = data["breakdown"]
+
+    # Positions-Tabelle (ohne Menge und Einzelpreis für kompaktere Darstellung)
+    positions_data = [
+        ["Pos.", "Beschreibung", "Gesamtpreis"]
+    ]
+
+    # Position: Teilnahmegebühr
+    description = f"<b>Teilnahmegebühr {data['event_name']}</b>\n"
+    description += f"Zeitraum: {data['event_start_date'].strftime('%d.%m.%Y')} - {data['event_end_date'].strftime('%d.%m.%Y')}\n"
+    description += f"Teilnehmer: {data['full_name']} ({data['age_at_event']} Jahre)\n"
+    if data["role_display_name"]:
+        description += f"Rolle: {data['role_display_name']}\n"
+
+    # Rabatt-Details hinzufügen
+    if breakdown['has_discounts']:
+        description += "\n<b>Preisberechnung:</b>\n"
+        if breakdown['manual_price_override'] is None:
+            # Normale Berechnung
+            description += f"• Basispreis (Altersgruppe): {breakdown['base_price']:.2f} €\n"
+            if breakdown['role_discount_percent'] > 0:
+                role_name = data["role_display_name"] or "Rolle"
+                description += f"• Rollenrabatt ({role_name}): -{breakdown['role_discount_percent']:.0f}% (-{breakdown['role_discount_amount']:.2f} €)\n"
+                description += f"  → Nach Rollenrabatt: {breakdown['price_after_role_discount']:.2f} €\n"
+            if breakdown['family_discount_percent'] > 0:
+                description += f"• Kinderzuschuss durch MGB: -{breakdown['family_discount_percent']:.0f}% (-{breakdown['family_discount_amount']:.2f} €)\n"
+                description += f"  → Nach Kinderzuschuss: {breakdown['price_after_family_discount']:.2f} €\n"
+            if breakdown['manual_discount_percent'] > 0:
+                description += f"• Zusätzlicher Rabatt: -{breakdown['manual_discount_percent']:.0f}% (-{breakdown['manual_discount_amount']:.2f} €)\n"
+                if data["discount_reason"]:
+                    description += f"  Grund: {data['discount_reason']}\n"
+        else:
+            # Manuelle Preisüberschreibung
+            description += f"• Manuell gesetzter Preis: {breakdown['manual_price_override']:.2f} €\n"
+            if data["discount_reason"]:
+                description += f"  Grund: {data['discount_reason']}\n"
+
+    final_price = data["final_price"]
+    positions_data.append([
+        "1",
+        Paragraph(description, normal_style),  # Wrap in Paragraph to render HTML tags
+        f"{final_price:.2f} €"
+    ])
+
+    # Positions-Tabelle erstellen
+    pos_table = Table(positions_data, colWidths=[1.5*cm, 13*cm, 3*cm])
+    pos_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e40af')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('ALIGN', (2, 0), (-1, -1), 'RIGHT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+        ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ]))
+    story.append(pos_table)
+    story.append(Spacer(1, 0.5*cm))
+
+    # Summen-Tabelle
+    sum_data = [
+        ["", "Zwischensumme:", f"{final_price:.2f} €"],
+        ["", "Bereits bezahlt:", f"{total_paid:.2f} €"],
+        ["", "Offener Betrag:", f"{outstanding:.2f} €"],
+    ]
+    sum_table = Table(sum_data, colWidths=[1.5*cm, 13*cm, 3*cm])
+    sum_table.setStyle(TableStyle([
+        ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
+        ('FONTNAME', (1, -1), (-1, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (1, -1), (-1, -1), 12),
+        ('LINEABOVE', (1, -1), (-1, -1), 2, colors.HexColor('#1e40af')),
+        ('TEXTCOLOR', (2, -1), (-1, -1), colors.HexColor('#1e40af')),
+    ]))
+    story.append(sum_table)
+    story.append(Spacer(1, 1.5*cm))
+
+    _append_payment_information(story, settings, outstanding, payment_reference, qr_image, heading_style, normal_style)
+
+    # PDF generieren
+    doc.build(story)
+    buffer.seek(0)
+    return buffer.getvalue()
+
+
+def render_family_invoice(data: Dict[str, Any], settings: Dict[str, Any]) -> bytes:
+    """
+    Rendert eine Sammelrechnung aus einem Daten-Snapshot (ohne Datenbankzugriff)
+
+    Args:
+        data: Familien-Snapshot (siehe InvoiceGenerator.build_family_snapshot)
+        settings: Einstellungs-Snapshot (siehe InvoiceGenerator.build_settings_snapshot)
+
+    Returns:
+        PDF als bytes
+    """
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=2*cm)
+    story = []
+
+    # Styles
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=colors.HexColor('#059669'),
+        spaceAfter=30,
+    )
+    heading_style = styles['Heading2']
+    normal_style = styles['Normal']
+
+    # Absender/Organisation
+    story.append(Paragraph(settings["organization_name"], title_style))
+    if settings["organization_address"]:
+        # Adresse aufbereiten (Zeilenumbrüche durch • ersetzen für kompakte Anzeige)
+        address_compact = settings["organization_address"].replace('\n', ' • ')
+        story.append(Paragraph(address_compact, normal_style))
+    story.append(Spacer(1, 0.5*cm))
+
+    # Rechnungsnummer und Datum
+    invoice_number = f"SR-{data['id']:06d}-{datetime.now().year}"
+    invoice_date = datetime.now().strftime("%d.%m.%Y")
+
+    # Gesamtbetrag und ausstehender Betrag (bereits im Snapshot berechnet)
+    total_amount = data["total_amount"]
+    total_paid = data["total_paid"]
+    outstanding = data["outstanding"]
+
+    # Verwendungszweck: Präfix + Familienname
+    subject_prefix = settings["invoice_subject_prefix"] or "Teilnahmegebühr"
+    payment_reference = f"{subject_prefix} Familie {data['name']}"
+
+    # QR-Code für SEPA-Zahlung generieren (falls offen)
+    qr_image = _build_qr_image(settings, outstanding, payment_reference)
+
+    # Info-Tabelle links, QR-Code rechts
+    if qr_image:
+        # Info und QR-Code in einer Tabelle nebeneinander
+        info_data = [
+            ["Rechnungsnummer:", invoice_number, qr_image],
+            ["Rechnungsdatum:", invoice_date, ""],
+            ["Familien-ID:", str(data["id"]), ""],
+            ["Art:", "Sammelrechnung", ""]
+        ]
+        info_table = Table(info_data, colWidths=[5*cm, 6*cm, 4*cm])
+        info_table.setStyle(TableStyle([
+            ('ALIGN', (0, 0), (1, -1), 'LEFT'),
+            ('ALIGN', (2, 0), (2, 0), 'RIGHT'),
+            ('VALIGN', (2, 0), (2, 0), 'MIDDLE'),
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (1, -1), 5),
+            ('SPAN', (2, 0), (2, 3)),  # QR-Code über alle 4 Zeilen spannen
+        ]))
+    else:
+        info_data = [
+            ["Rechnungsnummer:", invoice_number],
+            ["Rechnungsdatum:", invoice_date],
+            ["Familien-ID:", str(data["id"])],
+            ["Art:", "Sammelrechnung"]
+        ]
+        info_table = Table(info_data, colWidths=[5*cm, 6*cm])
+        info_table.setStyle(TableStyle([
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
+        ]))
+
+    story.append(info_table)
+    story.append(Spacer(1, 1*cm))
+
+    # Empfänger
+    story.append(Paragraph("Sammelrechnung für Familie:", heading_style))
+    recipient_text = f"<b>{data['name']}</b><br/>"
+    if data["contact_person"]:
+        recipient_text += f"Ansprechpartner: {data['contact_person']}<br/>"
+    if data["address"]:
+        recipient_text += data["address"].replace('\n', '<br/>')
+    story.append(Paragraph(recipient_text, normal_style))
+    story.append(Spacer(1, 1*cm))
+
+    # Positions-Tabelle (ohne Menge und Einzelpreis für kompaktere Darstellung)
+    positions_data = [
+        ["Pos.", "Beschreibung", "Gesamtpreis"]
+    ]
+
+    for member in data["members"]:
+        breakdown = member["breakdown"]
+
+        description = f"<b>{member['full_name']}</b>\n"
+        description += f"{member['event_name']}\n"
+        description += f"Zeitraum: {member['event_start_date'].strftime('%d.%m.%Y')} - {member['event_end_date'].strftime('%d.%m.%Y')}\n"
+        role_info = f", Rolle: {member['role_display_name']}" if member["role_display_name"] else ""
+        description += f"Alter: {member['age_at_event']} Jahre{role_info}\n"
+
+        # Rabatt-Details hinzufügen
+        if breakdown['has_discounts']:
+            description += "\n<b>Preisberechnung:</b>\n"
+            if breakdown['manual_price_override'] is None:
+                # Normale Berechnung
+                description += f"• Basispreis: {breakdown['base_price']:.2f} €\n"
+                if breakdown['role_discount_percent'] > 0:
+                    description += f"• Rollenrabatt: -{breakdown['role_discount_percent']:.0f}% (-{breakdown['role_discount_amount']:.2f} €) → {breakdown['price_after_role_discount']:.2f} €\n"
+                if breakdown['family_discount_percent'] > 0:
+                    description += f"• Kinderzuschuss durch MGB: -{breakdown['family_discount_percent']:.0f}% (-{breakdown['family_discount_amount']:.2f} €) → {breakdown['price_after_family_discount']:.2f} €\n"
+                if breakdown['manual_discount_percent'] > 0:
+                    description += f"• Zusätzl. Rabatt: -{breakdown['manual_discount_percent']:.0f}%"
+                    if member["discount_reason"]:
+                        description += f" ({member['discount_reason']})"
+                    description += "\n"
+            else:
+                # Manuelle Preisüberschreibung
+                description += f"• Manueller Preis: {breakdown['manual_price_override']:.2f} €\n"
+                if member["discount_reason"]:
+                    description += f"  Grund: {member['discount_reason']}\n"
+
+        price = member["final_price"]
+
+        positions_data.append([
+            str(member["position"]),
+            Paragraph(description, normal_style),  # Wrap in Paragraph to render HTML tags
+            f"{price:.2f} €"
+        ])
+
+    # Positions-Tabelle erstellen
+    pos_table = Table(positions_data, colWidths=[1.5*cm, 13*cm, 3*cm])
+    pos_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#059669')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('ALIGN', (2, 0), (-1, -1), 'RIGHT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+        ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ]))
+    story.append(pos_table)
+    story.append(Spacer(1, 0.5*cm))
+
+    # Summen-Tabelle
+    # (total_amount, total_paid und outstanding wurden bereits oben berechnet)
+    sum_data = [
+        ["", "Gesamtsumme:", f"{total_amount:.2f} €"],
+        ["", "Bereits bezahlt:", f"{total_paid:.2f} €"],
+        ["", "Offener Betrag:", f"{outstanding:.2f} €"],
+    ]
+    sum_table = Table(sum_data, colWidths=[1.5*cm, 13*cm, 3*cm])
+    sum_table.setStyle(TableStyle([
+        ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
+        ('FONTNAME', (1, -1), (-1, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (1, -1), (-1, -1), 12),
+        ('LINEABOVE', (1, -1), (-1, -1), 2, colors.HexColor('#059669')),
+        ('TEXTCOLOR', (2, -1), (-1, -1), colors.HexColor('#059669')),
+    ]))
+    story.append(sum_table)
+    story.append(Spacer(1, 1*cm))
+
+    # Hinweis auf Familienrabatt
+    if data["participant_count"] >= 2:
+        story.append(Paragraph("Hinweis:", heading_style))
+        discount_text = f"Die Preise enthalten bereits Familienrabatte für {data['participant_count']} Teilnehmer."
+        story.append(Paragraph(discount_text, normal_style))
+        story.append(Spacer(1, 0.5*cm))
+
+    _append_payment_information(story, settings, outstanding, payment_reference, qr_image, heading_style, normal_style)
+
+    # PDF generieren
+    doc.build(story)
+    buffer.seek(0)
+    return buffer.getvalue()
+
+
+def _append_payment_information(
+    story: List,
+    settings: Dict[str, Any],
+    outstanding: float,
+    payment_reference: str,
+    qr_image,
+    heading_style,
+    normal_style
+) -> None:
+    """Fügt Zahlungsinformationen bzw. den Bezahlt-Status an das Dokument an"""
+    footer_text = settings["invoice_footer_text"] or "Vielen Dank für Ihre Zahlung!"
+    if outstanding > 0:
+        story.append(Paragraph("Zahlungsinformationen:", heading_style))
+        payment_text = f"""
+        Bitte überweisen Sie den offenen Betrag unter Angabe der Rechnungsnummer auf folgendes Konto:<br/>
+        <br/>
+        <b>Kontoinhaber:</b> {settings["bank_account_holder"]}<br/>
+        <b>IBAN:</b> {settings["bank_iban"]}<br/>
+        """
+        if settings["bank_bic"]:
+            payment_text += f"<b>BIC:</b> {settings['bank_bic']}<br/>"
+        payment_text += f"""<b>Verwendungszweck:</b> {payment_reference}<br/>
+        <br/>
+        {footer_text}
+        """
+        story.append(Paragraph(payment_text, normal_style))
+        if qr_image:
+            story.append(Spacer(1, 0.3*cm))
+            story.append(Paragraph(
+                f"<i>Tipp: Scannen Sie den QR-Code oben rechts mit Ihrer Banking-App um die Überweisung von {outstanding:.2f} € direkt auszuführen.</i>",
+                normal_style
+            ))
+    else:
+        story.append(Paragraph("Status: Vollständig bezahlt", heading_style))
+        story.append(Paragraph(footer_text, normal_style))
+
+
+def render_invoice_job(job: Dict[str, Any]) -> Tuple[str, Optional[bytes], Optional[str]]:
+    """
+    Rendert eine Rechnung aus einem Bulk-Job (läuft in einem Worker-Prozess)
+
+    Args:
+        job: Dictionary mit kind ("family"/"participant"), filename, data, settings
+
+    Returns:
+        Tuple (Dateiname, PDF-Bytes oder None, Fehlermeldung oder None)
+    """
+    try:
+        if job["kind"] == "family":
+            pdf_bytes = render_family_invoice(job["data"], job["settings"])
+        else:
+            pdf_bytes = render_participant_invoice(job["data"], job["settings"])
+        return job["filename"], pdf_bytes, None
+    except Exception as e:
+        return job["filename"], None, f"{job['kind']} {job['data']['id']}: {e}"
+
 
 class InvoiceGenerator:
-    """Service für die Generierung von PDF-Rechnungen"""
+    """
+    Service für die Generierung von PDF-Rechnungen
+
+    Trennt das Laden der Daten (Snapshot aus der Datenbank) vom Rendern mit
+    ReportLab. Die Render-Funktionen arbeiten nur mit einfachen Daten und
+    können daher auch in Worker-Prozessen laufen.
+    """
 
     def __init__(self, db: Session):
         self.pagesize = A4
         self.width, self.height = self.pagesize
         self.db = db
+        self._settings_snapshots = {}
 
     def _get_settings(self, event_id: int):
         """
@@ -44,27 +546,48 @@ class InvoiceGenerator:
 
         return setting
 
-    def _calculate_price_breakdown(self, participant) -> Dict[str, Any]:
+    def build_settings_snapshot(self, event_id: int) -> Dict[str, Any]:
+        """
+        Liefert die für Rechnungen benötigten Einstellungen als einfaches Dictionary
+
+        Das Ergebnis wird pro Generator-Instanz zwischengespeichert, damit bei
+        Sammel-Exporten nur eine Query pro Event anfällt.
+
+        Args:
+            event_id: ID des Events
+
+        Returns:
+            Dictionary mit den Feldern aus INVOICE_SETTING_FIELDS
+        """
+        if event_id not in self._settings_snapshots:
+            setting = self._get_settings(event_id)
+            self._settings_snapshots[event_id] = {
+                field: getattr(setting, field) for field in INVOICE_SETTING_FIELDS
+            }
+        return self._settings_snapshots[event_id]
+
+    def _calculate_price_breakdown(self, participant, family_position: Optional[int] = None) -> Dict[str, Any]:
         """
         Berechnet die detaillierte Preis-Aufschlüsselung für einen Teilnehmer
         Verwendet PriceCalculator um Code-Duplikation zu vermeiden
 
         Args:
             participant: Participant-Objekt
+            family_position: Bereits bekannte Position in der Familie (spart die Geschwister-Query)
 
         Returns:
             Dictionary mit Preis-Details
         """
-        from app.models import Ruleset, Participant
+        from app.models import Participant
         from app.services.price_calculator import PriceCalculator
+        from app.services.ruleset_cache import RulesetCache
 
-        # Aktives Regelwerk finden - zuerst nach event_id, dann nach Datum
-        ruleset = self.db.query(Ruleset).filter(
-            Ruleset.event_id == participant.event_id,
-            Ruleset.is_active == True,
-            Ruleset.valid_from <= participant.event.start_date,
-            Ruleset.valid_until >= participant.event.start_date
-        ).first()
+        # Aktives Regelwerk finden - nach event_id, gültig am Event-Start (aus dem Cache)
+        ruleset = RulesetCache.get_active(
+            self.db,
+            participant.event_id,
+            valid_on=participant.event.start_date
+        )
 
         if not ruleset:
             # Kein Regelwerk vorhanden - Minimales Breakdown zurückgeben
@@ -86,23 +609,20 @@ class InvoiceGenerator:
             }
 
         # Ruleset-Daten vorbereiten
-        ruleset_data = {
-            'age_groups': ruleset.age_groups or [],
-            'role_discounts': ruleset.role_discounts or {},
-            'family_discount': ruleset.family_discount or {}
-        }
+        ruleset_data = ruleset.as_ruleset_data()
 
         logger.info(f"Verwende Ruleset '{ruleset.name}' für Teilnehmer {participant.full_name} (Alter: {participant.age_at_event})")
         logger.debug(f"Age groups: {ruleset_data['age_groups']}")
 
         # Position in Familie ermitteln
-        family_position = 1
-        if participant.family_id:
-            siblings = self.db.query(Participant).filter(
-                Participant.family_id == participant.family_id,
-                Participant.is_active == True
-            ).order_by(Participant.birth_date).all()
-            family_position = next((i + 1 for i, p in enumerate(siblings) if p.id == participant.id), 1)
+        if family_position is None:
+            family_position = 1
+            if participant.family_id:
+                siblings = self.db.query(Participant).filter(
+                    Participant.family_id == participant.family_id,
+                    Participant.is_active == True
+                ).order_by(Participant.birth_date).all()
+                family_position = next((i + 1 for i, p in enumerate(siblings) if p.id == participant.id), 1)
 
         # PriceCalculator verwenden für konsistente Berechnung
         breakdown = PriceCalculator.calculate_participant_price_with_breakdown(
@@ -118,232 +638,125 @@ class InvoiceGenerator:
 
         return breakdown
 
-    def generate_participant_invoice(self, participant) -> bytes:
+    def _participant_data(self, participant, family_position: Optional[int] = None) -> Dict[str, Any]:
+        """Gemeinsame Teilnehmerdaten für Einzel- und Sammelrechnungen"""
+        return {
+            "id": participant.id,
+            "full_name": participant.full_name,
+            "age_at_event": participant.age_at_event,
+            "role_display_name": participant.role.display_name if participant.role else None,
+            "discount_reason": participant.discount_reason,
+            "final_price": float(participant.final_price),
+            "event_name": participant.event.name,
+            "event_start_date": participant.event.start_date,
+            "event_end_date": participant.event.end_date,
+            "breakdown": self._calculate_price_breakdown(participant, family_position)
+        }
+
+    def build_participant_snapshot(self, participant) -> Dict[str, Any]:
         """
-        Generiert eine Einzelrechnung für einen Teilnehmer
+        Erstellt einen Daten-Snapshot für eine Einzelrechnung (ohne ORM-Objekte)
 
         Args:
             participant: Participant-Objekt mit allen Daten
 
         Returns:
-            PDF als bytes
+            Dictionary mit Teilnehmer-, Event-, Zahlungs- und Preisdaten
         """
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=self.pagesize, topMargin=2*cm)
-        story = []
-
-        # Styles
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            textColor=colors.HexColor('#1e40af'),
-            spaceAfter=30,
-        )
-        heading_style = styles['Heading2']
-        normal_style = styles['Normal']
-
-        # Einstellungen laden
-        settings = self._get_settings(participant.event_id)
-
-        # Absender/Organisation
-        story.append(Paragraph(settings.organization_name, title_style))
-        if settings.organization_address:
-            # Adresse aufbereiten (Zeilenumbrüche durch • ersetzen für kompakte Anzeige)
-            address_compact = settings.organization_address.replace('\n', ' • ')
-            story.append(Paragraph(address_compact, normal_style))
-        story.append(Spacer(1, 0.5*cm))
-
-        # Rechnungsnummer und Datum
-        invoice_number = f"R-{participant.id:06d}-{datetime.now().year}"
-        invoice_date = datetime.now().strftime("%d.%m.%Y")
+        data = self._participant_data(participant)
 
-        # QR-Code für SEPA-Zahlung vorbereiten (falls offen)
         # Konvertiere zu float um Decimal/float Typ-Konflikte zu vermeiden
         total_paid = float(sum((payment.amount for payment in participant.payments), 0))
-        outstanding = float(participant.final_price) - total_paid
-        qr_image = None
+        data.update({
+            "address": participant.address,
+            "total_paid": total_paid,
+            "outstanding": data["final_price"] - total_paid
+        })
+        return data
+
+    def build_family_snapshot(self, family) -> Dict[str, Any]:
+        """
+        Erstellt einen Daten-Snapshot für eine Sammelrechnung (ohne ORM-Objekte)
 
-        # Verwendungszweck: Präfix + Teilnehmername
-        subject_prefix = settings.invoice_subject_prefix or "Teilnahmegebühr"
-        payment_reference = f"{subject_prefix} {participant.full_name}"
+        Args:
+            family: Family-Objekt mit allen Teilnehmern
 
-        if outstanding > 0:
-            try:
-                qr_code_bytes = QRCodeService.generate_sepa_qr_code(
-                    recipient_name=settings.bank_account_holder,
-                    iban=settings.bank_iban,
-                    amount=outstanding,
-                    purpose=payment_reference,
-                    bic=settings.bank_bic
-                )
-                qr_image = Image(BytesIO(qr_code_bytes), width=3.5*cm, height=3.5*cm)
-            except Exception as e:
-                print(f"Warnung: QR-Code konnte nicht generiert werden: {e}")
+        Returns:
+            Dictionary mit Familien-, Mitglieder-, Zahlungs- und Preisdaten
+        """
+        # Gesamtbetrag und ausstehenden Betrag berechnen
+        # Konvertiere zu float um Decimal/float Typ-Konflikte zu vermeiden
+        total_amount = float(sum((p.final_price for p in family.participants if p.is_active), 0))
 
-        # Info-Tabelle links, QR-Code rechts
-        if qr_image:
-            # Info und QR-Code in einer Tabelle nebeneinander
-            info_data = [
-                ["Rechnungsnummer:", invoice_number, qr_image],
-                ["Rechnungsdatum:", invoice_date, ""],
-                ["Teilnehmer-ID:", str(participant.id), ""]
-            ]
-            info_table = Table(info_data, colWidths=[5*cm, 6*cm, 4*cm])
-            info_table.setStyle(TableStyle([
-                ('ALIGN', (0, 0), (1, -1), 'LEFT'),
-                ('ALIGN', (2, 0), (2, 0), 'RIGHT'),
-                ('VALIGN', (2, 0), (2, 0), 'MIDDLE'),
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (1, -1), 10),
-                ('BOTTOMPADDING', (0, 0), (1, -1), 5),
-                ('SPAN', (2, 0), (2, 2)),  # QR-Code über alle 3 Zeilen spannen
-            ]))
-        else:
-            info_data = [
-                ["Rechnungsnummer:", invoice_number],
-                ["Rechnungsdatum:", invoice_date],
-                ["Teilnehmer-ID:", str(participant.id)]
-            ]
-            info_table = Table(info_data, colWidths=[5*cm, 6*cm])
-            info_table.setStyle(TableStyle([
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
-            ]))
-
-        story.append(info_table)
-        story.append(Spacer(1, 1*cm))
-
-        # Empfänger
-        story.append(Paragraph("Rechnung für:", heading_style))
-        recipient_text = f"{participant.full_name}<br/>"
-        if participant.address:
-            recipient_text += participant.address.replace('\n', '<br/>')
-        story.append(Paragraph(recipient_text, normal_style))
-        story.append(Spacer(1, 1*cm))
-
-        # Betreff (für Rechnung - nicht für Überweisung)
-        subject_prefix_display = settings.invoice_subject_prefix or "Teilnahme an"
-        story.append(Paragraph(f"{subject_prefix_display}: {participant.event.name}", heading_style))
-        story.append(Spacer(1, 0.5*cm))
+        # Zahlungen: Sowohl direkte Familienzahlungen als auch Zahlungen an einzelne Mitglieder
+        family_payments = float(sum((payment.amount for payment in family.payments), 0))
+        member_payments = float(sum(
+            (payment.amount
+             for participant in family.participants
+             for payment in participant.payments), 0
+        ))
+        total_paid = family_payments + member_payments
 
-        # Preis-Aufschlüsselung berechnen
-        breakdown = self._calculate_price_breakdown(participant)
+        # Geschwisterposition (nach Geburtsdatum) einmal für alle Mitglieder bestimmen
+        active_members = sorted((p for p in family.participants if p.is_active), key=lambda p: p.birth_date)
+        family_positions = {member.id: position for position, member in enumerate(active_members, 1)}
 
-        # Positions-Tabelle (ohne Menge und Einzelpreis für kompaktere Darstellung)
-        positions_data = [
-            ["Pos.", "Beschreibung", "Gesamtpreis"]
-        ]
+        members = []
+        for idx, participant in enumerate(family.participants, 1):
+            if not participant.is_active:
+                continue
+            member = self._participant_data(participant, family_positions[participant.id])
+            member["position"] = idx
+            members.append(member)
+
+        return {
+            "id": family.id,
+            "name": family.name,
+            "contact_person": family.contact_person,
+            "address": family.address,
+            "participant_count": len(family.participants),
+            "total_amount": total_amount,
+            "total_paid": total_paid,
+            "outstanding": total_amount - total_paid,
+            "members": members
+        }
 
-        # Position: Teilnahmegebühr
-        description = f"<b>Teilnahmegebühr {participant.event.name}</b>\n"
-        description += f"Zeitraum: {participant.event.start_date.strftime('%d.%m.%Y')} - {participant.event.end_date.strftime('%d.%m.%Y')}\n"
-        description += f"Teilnehmer: {participant.full_name} ({participant.age_at_event} Jahre)\n"
-        if participant.role:
-            description += f"Rolle: {participant.role.display_name}\n"
+    def _cache_key(self, kind: str, event_id: int, data: Dict[str, Any], settings: Dict[str, Any]) -> str:
+        """Cache-Schlüssel aus Snapshot, Einstellungen, Regelwerk-Version und heutigem Datum"""
+        from app.services.ruleset_cache import RulesetCache
 
-        # Rabatt-Details hinzufügen
-        if breakdown['has_discounts']:
-            description += "\n<b>Preisberechnung:</b>\n"
-            if breakdown['manual_price_override'] is None:
-                # Normale Berechnung
-                description += f"• Basispreis (Altersgruppe): {breakdown['base_price']:.2f} €\n"
-                if breakdown['role_discount_percent'] > 0:
-                    role_name = participant.role.display_name if participant.role else "Rolle"
-                    description += f"• Rollenrabatt ({role_name}): -{breakdown['role_discount_percent']:.0f}% (-{breakdown['role_discount_amount']:.2f} €)\n"
-                    description += f"  → Nach Rollenrabatt: {breakdown['price_after_role_discount']:.2f} €\n"
-                if breakdown['family_discount_percent'] > 0:
-                    description += f"• Kinderzuschuss durch MGB: -{breakdown['family_discount_percent']:.0f}% (-{breakdown['family_discount_amount']:.2f} €)\n"
-                    description += f"  → Nach Kinderzuschuss: {breakdown['price_after_family_discount']:.2f} €\n"
-                if breakdown['manual_discount_percent'] > 0:
-                    description += f"• Zusätzlicher Rabatt: -{breakdown['manual_discount_percent']:.0f}% (-{breakdown['manual_discount_amount']:.2f} €)\n"
-                    if participant.discount_reason:
-                        description += f"  Grund: {participant.discount_reason}\n"
-            else:
-                # Manuelle Preisüberschreibung
-                description += f"• Manuell gesetzter Preis: {breakdown['manual_price_override']:.2f} €\n"
-                if participant.discount_reason:
-                    description += f"  Grund: {participant.discount_reason}\n"
+        ruleset = RulesetCache.get_active(self.db, event_id)
+        return InvoiceCache.build_key(kind, data, settings, ruleset.fingerprint if ruleset else None)
 
-        final_price = participant.final_price
-        positions_data.append([
-            "1",
-            Paragraph(description, normal_style),  # Wrap in Paragraph to render HTML tags
-            f"{final_price:.2f} €"
-        ])
+    def _render_cached(self, kind: str, event_id: int, data: Dict[str, Any]) -> bytes:
+        """Liefert die Rechnung aus dem Cache oder rendert und speichert sie"""
+        settings = self.build_settings_snapshot(event_id)
+        key = self._cache_key(kind, event_id, data, settings)
 
-        # Positions-Tabelle erstellen
-        pos_table = Table(positions_data, colWidths=[1.5*cm, 13*cm, 3*cm])
-        pos_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e40af')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('ALIGN', (2, 0), (-1, -1), 'RIGHT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ]))
-        story.append(pos_table)
-        story.append(Spacer(1, 0.5*cm))
+        pdf_bytes = invoice_cache.get(key)
+        if pdf_bytes is None:
+            job = {"kind": kind, "filename": "", "data": data, "settings": settings}
+            _, pdf_bytes, error = render_invoice_job(job)
+            if error:
+                raise RuntimeError(f"Error generating invoice for {error}")
+            invoice_cache.put(key, pdf_bytes)
+        return pdf_bytes
 
-        # Summen-Tabelle
-        sum_data = [
-            ["", "Zwischensumme:", f"{final_price:.2f} €"],
-            ["", "Bereits bezahlt:", f"{total_paid:.2f} €"],
-            ["", "Offener Betrag:", f"{outstanding:.2f} €"],
-        ]
-        sum_table = Table(sum_data, colWidths=[1.5*cm, 13*cm, 3*cm])
-        sum_table.setStyle(TableStyle([
-            ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
-            ('FONTNAME', (1, -1), (-1, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (1, -1), (-1, -1), 12),
-            ('LINEABOVE', (1, -1), (-1, -1), 2, colors.HexColor('#1e40af')),
-            ('TEXTCOLOR', (2, -1), (-1, -1), colors.HexColor('#1e40af')),
-        ]))
-        story.append(sum_table)
-        story.append(Spacer(1, 1.5*cm))
-
-        # Zahlungsinformationen
-        footer_text = settings.invoice_footer_text or "Vielen Dank für Ihre Zahlung!"
-        if outstanding > 0:
-            story.append(Paragraph("Zahlungsinformationen:", heading_style))
-            payment_text = f"""
-            Bitte überweisen Sie den offenen Betrag unter Angabe der Rechnungsnummer auf folgendes Konto:<br/>
-            <br/>
-            <b>Kontoinhaber:</b> {settings.bank_account_holder}<br/>
-            <b>IBAN:</b> {settings.bank_iban}<br/>
-            """
-            if settings.bank_bic:
-                payment_text += f"<b>BIC:</b> {settings.bank_bic}<br/>"
-            payment_text += f"""<b>Verwendungszweck:</b> {payment_reference}<br/>
-            <br/>
-            {footer_text}
-            """
-            story.append(Paragraph(payment_text, normal_style))
-            if qr_image:
-                story.append(Spacer(1, 0.3*cm))
-                story.append(Paragraph(
-                    f"<i>Tipp: Scannen Sie den QR-Code oben rechts mit Ihrer Banking-App um die Überweisung von {outstanding:.2f} € direkt auszuführen.</i>",
-                    normal_style
-                ))
-        else:
-            story.append(Paragraph("Status: Vollständig bezahlt", heading_style))
-            story.append(Paragraph(footer_text, normal_style))
+    def generate_participant_invoice(self, participant) -> bytes:
+        """
+        Generiert eine Einzelrechnung für einen Teilnehmer (aus dem Cache, falls unverändert)
 
-        # PDF generieren
-        doc.build(story)
-        buffer.seek(0)
-        return buffer.getvalue()
+        Args:
+            participant: Participant-Objekt mit allen Daten
+
+        Returns:
+            PDF als bytes
+        """
+        return self._render_cached("participant", participant.event_id, self.build_participant_snapshot(participant))
 
     def generate_family_invoice(self, family) -> bytes:
         """
-        Generiert eine Sammelrechnung für eine Familie
+        Generiert eine Sammelrechnung für eine Familie (aus dem Cache, falls unverändert)
 
         Args:
             family: Family-Objekt mit allen Teilnehmern
@@ -351,235 +764,72 @@ class InvoiceGenerator:
         Returns:
             PDF als bytes
         """
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=self.pagesize, topMargin=2*cm)
-        story = []
-
-        # Styles
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            textColor=colors.HexColor('#059669'),
-            spaceAfter=30,
-        )
-        heading_style = styles['Heading2']
-        normal_style = styles['Normal']
-
-        # Einstellungen laden
-        settings = self._get_settings(family.event_id)
-
-        # Absender/Organisation
-        story.append(Paragraph(settings.organization_name, title_style))
-        if settings.organization_address:
-            # Adresse aufbereiten (Zeilenumbrüche durch • ersetzen für kompakte Anzeige)
-            address_compact = settings.organization_address.replace('\n', ' • ')
-            story.append(Paragraph(address_compact, normal_style))
-        story.append(Spacer(1, 0.5*cm))
-
-        # Rechnungsnummer und Datum
-        invoice_number = f"SR-{family.id:06d}-{datetime.now().year}"
-        invoice_date = datetime.now().strftime("%d.%m.%Y")
+        return self._render_cached("family", family.event_id, self.build_family_snapshot(family))
 
-        # Gesamtbetrag und ausstehenden Betrag berechnen
-        # Konvertiere zu float um Decimal/float Typ-Konflikte zu vermeiden
-        total_amount = float(sum((p.final_price for p in family.participants if p.is_active), 0))
-
-        # Zahlungen: Sowohl direkte Familienzahlungen als auch Zahlungen an einzelne Mitglieder
-        family_payments = float(sum((payment.amount for payment in family.payments), 0))
-        member_payments = float(sum(
-            (payment.amount
-             for participant in family.participants
-             for payment in participant.payments), 0
-        ))
-        total_paid = family_payments + member_payments
-        outstanding = total_amount - total_paid
+    def build_bulk_invoice_jobs(self, event_id: int) -> List[Dict[str, Any]]:
+        """
+        Lädt alle Daten für den Sammel-Export und erstellt die Render-Jobs
 
-        qr_image = None
+        Reihenfolge: erst Familien (nur mit Teilnehmern), dann Einzelpersonen ohne Familie.
+        Die Jobs enthalten nur einfache Daten und können an Worker-Prozesse übergeben werden.
+        cache_key ist der Schlüssel für den Rechnungs-Cache (invoice_cache).
 
-        # Verwendungszweck: Präfix + Familienname
-        subject_prefix = settings.invoice_subject_prefix or "Teilnahmegebühr"
-        payment_reference = f"{subject_prefix} Familie {family.name}"
+        Args:
+            event_id: ID des Events
 
-        # QR-Code für SEPA-Zahlung generieren (falls offen)
-        if outstanding > 0:
+        Returns:
+            Liste von Jobs für render_invoice_job
+        """
+        from app.models import Participant, Family
+
+        settings = self.build_settings_snapshot(event_id)
+        jobs = []
+
+        # 1. Alle Familienrechnungen
+        families = self.db.query(Family).options(
+            selectinload(Family.payments),
+            selectinload(Family.participants).selectinload(Participant.payments),
+            selectinload(Family.participants).selectinload(Participant.role),
+            selectinload(Family.participants).selectinload(Participant.event)
+        ).filter(Family.event_id == event_id).order_by(Family.name).all()
+
+        for family in families:
+            # Nur Familien mit Teilnehmern
+            if len(family.participants) > 0:
+                try:
+                    data = self.build_family_snapshot(family)
+                    jobs.append({
+                        "kind": "family",
+                        "filename": f"Familien/Sammelrechnung_{family.name.replace(' ', '_').replace('/', '_')}.pdf",
+                        "data": data,
+                        "settings": settings,
+                        "cache_key": self._cache_key("family", event_id, data, settings)
+                    })
+                except Exception as e:
+                    logger.error(f"Error preparing invoice for family {family.id}: {e}")
+
+        # 2. Alle Einzelpersonen OHNE Familie
+        participants_without_family = self.db.query(Participant).options(
+            selectinload(Participant.payments),
+            selectinload(Participant.role),
+            selectinload(Participant.event)
+        ).filter(
+            Participant.event_id == event_id,
+            Participant.family_id == None,
+            Participant.is_active == True
+        ).order_by(Participant.last_name, Participant.first_name).all()
+
+        for participant in participants_without_family:
             try:
-                qr_code_bytes = QRCodeService.generate_sepa_qr_code(
-                    recipient_name=settings.bank_account_holder,
-                    iban=settings.bank_iban,
-                    amount=outstanding,
-                    purpose=payment_reference,
-                    bic=settings.bank_bic
-                )
-                qr_image = Image(BytesIO(qr_code_bytes), width=3.5*cm, height=3.5*cm)
+                data = self.build_participant_snapshot(participant)
+                jobs.append({
+                    "kind": "participant",
+                    "filename": f"Einzelpersonen/Rechnung_{participant.last_name}_{participant.first_name}.pdf",
+                    "data": data,
+                    "settings": settings,
+                    "cache_key": self._cache_key("participant", event_id, data, settings)
+                })
             except Exception as e:
-                print(f"Warnung: QR-Code konnte nicht generiert werden: {e}")
-
-        # Info-Tabelle links, QR-Code rechts
-        if qr_image:
-            # Info und QR-Code in einer Tabelle nebeneinander
-            info_data = [
-                ["Rechnungsnummer:", invoice_number, qr_image],
-                ["Rechnungsdatum:", invoice_date, ""],
-                ["Familien-ID:", str(family.id), ""],
-                ["Art:", "Sammelrechnung", ""]
-            ]
-            info_table = Table(info_data, colWidths=[5*cm, 6*cm, 4*cm])
-            info_table.setStyle(TableStyle([
-                ('ALIGN', (0, 0), (1, -1), 'LEFT'),
-                ('ALIGN', (2, 0), (2, 0), 'RIGHT'),
-                ('VALIGN', (2, 0), (2, 0), 'MIDDLE'),
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (1, -1), 10),
-                ('BOTTOMPADDING', (0, 0), (1, -1), 5),
-                ('SPAN', (2, 0), (2, 3)),  # QR-Code über alle 4 Zeilen spannen
-            ]))
-        else:
-            info_data = [
-                ["Rechnungsnummer:", invoice_number],
-                ["Rechnungsdatum:", invoice_date],
-                ["Familien-ID:", str(family.id)],
-                ["Art:", "Sammelrechnung"]
-            ]
-            info_table = Table(info_data, colWidths=[5*cm, 6*cm])
-            info_table.setStyle(TableStyle([
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
-            ]))
-
-        story.append(info_table)
-        story.append(Spacer(1, 1*cm))
-
-        # Empfänger
-        story.append(Paragraph("Sammelrechnung für Familie:", heading_style))
-        recipient_text = f"<b>{family.name}</b><br/>"
-        if family.contact_person:
-            recipient_text += f"Ansprechpartner: {family.contact_person}<br/>"
-        if family.address:
-            recipient_text += family.address.replace('\n', '<br/>')
-        story.append(Paragraph(recipient_text, normal_style))
-        story.append(Spacer(1, 1*cm))
-
-        # Positions-Tabelle (ohne Menge und Einzelpreis für kompaktere Darstellung)
-        positions_data = [
-            ["Pos.", "Beschreibung", "Gesamtpreis"]
-        ]
-
-        for idx, participant in enumerate(family.participants, 1):
-            if not participant.is_active:
-                continue
-
-            # Preis-Aufschlüsselung berechnen
-            breakdown = self._calculate_price_breakdown(participant)
-
-            description = f"<b>{participant.full_name}</b>\n"
-            description += f"{participant.event.name}\n"
-            description += f"Zeitraum: {participant.event.start_date.strftime('%d.%m.%Y')} - {participant.event.end_date.strftime('%d.%m.%Y')}\n"
-            role_info = f", Rolle: {participant.role.display_name}" if participant.role else ""
-            description += f"Alter: {participant.age_at_event} Jahre{role_info}\n"
-
-            # Rabatt-Details hinzufügen
-            if breakdown['has_discounts']:
-                description += "\n<b>Preisberechnung:</b>\n"
-                if breakdown['manual_price_override'] is None:
-                    # Normale Berechnung
-                    description += f"• Basispreis: {breakdown['base_price']:.2f} €\n"
-                    if breakdown['role_discount_percent'] > 0:
-                        description += f"• Rollenrabatt: -{breakdown['role_discount_percent']:.0f}% (-{breakdown['role_discount_amount']:.2f} €) → {breakdown['price_after_role_discount']:.2f} €\n"
-                    if breakdown['family_discount_percent'] > 0:
-                        description += f"• Kinderzuschuss durch MGB: -{breakdown['family_discount_percent']:.0f}% (-{breakdown['family_discount_amount']:.2f} €) → {breakdown['price_after_family_discount']:.2f} €\n"
-                    if breakdown['manual_discount_percent'] > 0:
-                        description += f"• Zusätzl. Rabatt: -{breakdown['manual_discount_percent']:.0f}%"
-                        if participant.discount_reason:
-                            description += f" ({participant.discount_reason})"
-                        description += "\n"
-                else:
-                    # Manuelle Preisüberschreibung
-                    description += f"• Manueller Preis: {breakdown['manual_price_override']:.2f} €\n"
-                    if participant.discount_reason:
-                        description += f"  Grund: {participant.discount_reason}\n"
-
-            price = participant.final_price
-
-            positions_data.append([
-                str(idx),
-                Paragraph(description, normal_style),  # Wrap in Paragraph to render HTML tags
-                f"{price:.2f} €"
-            ])
-
-        # Positions-Tabelle erstellen
-        pos_table = Table(positions_data, colWidths=[1.5*cm, 13*cm, 3*cm])
-        pos_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#059669')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('ALIGN', (2, 0), (-1, -1), 'RIGHT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ]))
-        story.append(pos_table)
-        story.append(Spacer(1, 0.5*cm))
-
-        # Summen-Tabelle
-        # (total_amount, total_paid und outstanding wurden bereits oben berechnet)
-        sum_data = [
-            ["", "Gesamtsumme:", f"{total_amount:.2f} €"],
-            ["", "Bereits bezahlt:", f"{total_paid:.2f} €"],
-            ["", "Offener Betrag:", f"{outstanding:.2f} €"],
-        ]
-        sum_table = Table(sum_data, colWidths=[1.5*cm, 13*cm, 3*cm])
-        sum_table.setStyle(TableStyle([
-            ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
-            ('FONTNAME', (1, -1), (-1, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (1, -1), (-1, -1), 12),
-            ('LINEABOVE', (1, -1), (-1, -1), 2, colors.HexColor('#059669')),
-            ('TEXTCOLOR', (2, -1), (-1, -1), colors.HexColor('#059669')),
-        ]))
-        story.append(sum_table)
-        story.append(Spacer(1, 1*cm))
-
-        # Hinweis auf Familienrabatt
-        if len(family.participants) >= 2:
-            story.append(Paragraph("Hinweis:", heading_style))
-            discount_text = f"Die Preise enthalten bereits Familienrabatte für {len(family.participants)} Teilnehmer."
-            story.append(Paragraph(discount_text, normal_style))
-            story.append(Spacer(1, 0.5*cm))
-
-        # Zahlungsinformationen
-        footer_text = settings.invoice_footer_text or "Vielen Dank für Ihre Zahlung!"
-        if outstanding > 0:
-            story.append(Paragraph("Zahlungsinformationen:", heading_style))
-            payment_text = f"""
-            Bitte überweisen Sie den offenen Betrag unter Angabe der Rechnungsnummer auf folgendes Konto:<br/>
-            <br/>
-            <b>Kontoinhaber:</b> {settings.bank_account_holder}<br/>
-            <b>IBAN:</b> {settings.bank_iban}<br/>
-            """
-            if settings.bank_bic:
-                payment_text += f"<b>BIC:</b> {settings.bank_bic}<br/>"
-            payment_text += f"""<b>Verwendungszweck:</b> {payment_reference}<br/>
-            <br/>
-            {footer_text}
-            """
-            story.append(Paragraph(payment_text, normal_style))
-            if qr_image:
-                story.append(Spacer(1, 0.3*cm))
-                story.append(Paragraph(
-                    f"<i>Tipp: Scannen Sie den QR-Code oben rechts mit Ihrer Banking-App um die Überweisung von {outstanding:.2f} € direkt auszuführen.</i>",
-                    normal_style
-                ))
-        else:
-            story.append(Paragraph("Status: Vollständig bezahlt", heading_style))
-            story.append(Paragraph(footer_text, normal_style))
+                logger.error(f"Error preparing invoice for participant {participant.id}: {e}")
 
-        # PDF generieren
-        doc.build(story)
-        buffer.seek(0)
-        return buffer.getvalue()
\ No newline at end of file
+        return jobs
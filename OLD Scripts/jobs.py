@@ -0,0 +1,105 @@
+"""Export-Jobs Router - Fortschritt und Download von Hintergrund-Exporten"""
+import logging
+from fastapi import APIRouter, Request, Depends, HTTPException
+from fastapi.responses import HTMLResponse, StreamingResponse, Response, JSONResponse
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.dependencies import get_current_event_id
+from app.services.export_jobs import (
+    export_jobs, parse_byte_range, iter_file_range, JOB_DONE
+)
+from app.templates_config import templates
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+def _load_job(db: Session, job_id: str, event_id: int):
+    job = export_jobs.get(db, job_id, event_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Export nicht gefunden")
+    return job
+
+
+@router.get("/{job_id}", response_class=HTMLResponse)
+def export_job_status(
+    request: Request,
+    job_id: str,
+    db: Session = Depends(get_db),
+    event_id: int = Depends(get_current_event_id)
+):
+    """
+    Statusseite eines Export-Jobs
+
+    HTMX-Requests erhalten nur das Fortschritts-Fragment, das sich selbst
+    pollt, bis der Job fertig oder fehlgeschlagen ist.
+    """
+    job = _load_job(db, job_id, event_id)
+
+    template = "jobs/_progress.html" if request.headers.get("HX-Request") else "jobs/detail.html"
+    return templates.TemplateResponse(template, {"request": request, "job": job})
+
+
+@router.get("/{job_id}/status")
+def export_job_status_json(
+    job_id: str,
+    db: Session = Depends(get_db),
+    event_id: int = Depends(get_current_event_id)
+):
+    """Status eines Export-Jobs als JSON (für Polling ohne HTMX)"""
+    job = _load_job(db, job_id, event_id)
+    return JSONResponse({
+        "id": job.id,
+        "title": job.title,
+        "status": job.status,
+        "progress": job.progress,
+        "message": job.message,
+        "error": job.error,
+        "download_url": job.download_url if job.status == JOB_DONE else None
+    })
+
+
+@router.get("/{job_id}/download")
+def download_export_job(
+    request: Request,
+    job_id: str,
+    db: Session = Depends(get_db),
+    event_id: int = Depends(get_current_event_id)
+):
+    """Download der erzeugten Datei (mit Unterstützung für HTTP-Range-Requests)"""
+    job = _load_job(db, job_id, event_id)
+    if job.status != JOB_DONE:
+        raise HTTPException(status_code=409, detail="Export ist noch nicht fertig")
+
+    path = export_jobs.artifact_path(job.id)
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="Exportdatei nicht mehr vorhanden")
+
+    size = path.stat().st_size
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f'attachment; filename="{job.filename}"'
+    }
+
+    try:
+        byte_range = parse_byte_range(request.headers.get("range"), size)
+    except ValueError:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+
+    if byte_range is None:
+        start, end, status_code = 0, size - 1, 200
+    else:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    headers["Content-Length"] = str(end - start + 1)
+
+    return StreamingResponse(
+        iter_file_range(path, start, end),
+        status_code=status_code,
+        media_type=job.media_type,
+        headers=headers
+    )
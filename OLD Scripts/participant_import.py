@@ -0,0 +1,320 @@
+"""Participant Import Service - Mengenbasierter Import von Teilnehmern und Familien"""
+import csv
+import io
+import logging
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Any, List, Optional, Callable, Tuple, Iterator, BinaryIO
+from openpyxl import load_workbook
+from sqlalchemy.orm import Session
+
+from app.services.ruleset_cache import RulesetCache
+from app.services.balance_ledger import BalanceLedgerService
+
+logger = logging.getLogger(__name__)
+
+# Anzahl Teilnehmer pro executemany-Block (begrenzt Speicher und Statement-Größe)
+IMPORT_CHUNK_SIZE = 500
+
+# Fallback-Formate, falls kein ISO-Datum vorliegt
+_DATE_FORMATS = ("%d.%m.%Y", "%d/%m/%Y", "%d-%m-%Y", "%Y-%m-%d %H:%M:%S")
+
+
+def parse_birth_date(value: Any) -> Optional[date]:
+    """
+    Parst ein Geburtsdatum aus Excel/CSV/JSON
+
+    Schneller Pfad für date/datetime-Objekte und ISO-Strings (so serialisiert
+    die Vorschau die bereits geparsten Daten), danach die deutschen Formate.
+
+    Args:
+        value: date, datetime oder String
+
+    Returns:
+        date oder None, wenn das Format nicht erkannt wird
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+
+    text = str(value).strip()
+
+    # ISO (auch "1991-07-01 00:00:00")
+    if len(text) >= 10 and text[4] == "-" and text[7] == "-":
+        try:
+            return date.fromisoformat(text[:10])
+        except ValueError:
+            pass
+
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def iter_csv_rows(file_obj: BinaryIO) -> Iterator[Tuple[int, List[str]]]:
+    """
+    Liest eine CSV-Datei zeilenweise (inkrementelle UTF-8-Dekodierung, BOM-Support)
+
+    Trennzeichen ist Semikolon; ergibt die Kopfzeile damit keine Spalten, wird
+    Komma verwendet. Die Kopfzeile selbst wird nicht geliefert.
+
+    Args:
+        file_obj: Binärer Datei-Stream (z.B. UploadFile.file)
+
+    Yields:
+        Tuple (Zeilennummer ab 2, Werte)
+    """
+    text_stream = io.TextIOWrapper(file_obj, encoding="utf-8-sig", newline="")
+    try:
+        header_line = text_stream.readline()
+        if not header_line:
+            return
+
+        delimiter = ";"
+        header = next(csv.reader([header_line], delimiter=delimiter), [])
+        if len(header) <= 1:
+            delimiter = ","
+
+        reader = csv.reader(text_stream, delimiter=delimiter)
+        for row_num, row in enumerate(reader, start=2):
+            yield row_num, row
+    finally:
+        # Den darunterliegenden Stream nicht mit schließen
+        text_stream.detach()
+
+
+def iter_excel_rows(file_obj: BinaryIO) -> Iterator[Tuple[int, Tuple[Any, ...]]]:
+    """
+    Liest das aktive Arbeitsblatt einer Excel-Datei zeilenweise (openpyxl read_only)
+
+    Die Kopfzeile wird nicht geliefert.
+
+    Args:
+        file_obj: Binärer, seekbarer Datei-Stream (z.B. UploadFile.file)
+
+    Yields:
+        Tuple (Zeilennummer ab 2, Werte)
+    """
+    wb = load_workbook(file_obj, read_only=True, data_only=True)
+    try:
+        ws = wb.active
+        for row_num, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
+            yield row_num, row
+    finally:
+        wb.close()
+
+
+def iter_import_rows(file_obj: BinaryIO, filename: str) -> Iterator[Tuple[int, Any]]:
+    """
+    Streaming-Reader für Import-Dateien (CSV oder Excel, anhand der Dateiendung)
+
+    Args:
+        file_obj: Binärer Datei-Stream
+        filename: Dateiname der Upload-Datei
+
+    Yields:
+        Tuple (Zeilennummer, Werte) für alle Datenzeilen
+    """
+    if filename.endswith(".csv"):
+        return iter_csv_rows(file_obj)
+    return iter_excel_rows(file_obj)
+
+
+class ParticipantImportService:
+    """
+    Import-Engine für bestätigte Teilnehmer-Importe
+
+    - Validiert und normalisiert alle Zeilen in einem Durchlauf
+    - Legt Familien und Teilnehmer per bulk_insert_mappings (executemany) an
+    - Berechnet die vollständigen Preise (inkl. Familienrabatt) mit dem
+      kompilierten Regelwerk, statt anschließend jeden Teilnehmer einzeln
+      über den PriceCalculator neu zu berechnen
+    - Fügt in Blöcken ein und meldet den Fortschritt, committet aber erst am
+      Ende: Ein Fehler rollt den gesamten Import zurück (alles oder nichts),
+      eine Wiederholung erzeugt damit keine doppelten Familien/Teilnehmer
+    """
+
+    @staticmethod
+    def _age_at(reference_date: date, birth_date: date) -> int:
+        age = reference_date.year - birth_date.year
+        if (reference_date.month, reference_date.day) < (birth_date.month, birth_date.day):
+            age -= 1
+        return age
+
+    @staticmethod
+    def prepare_rows(data: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Filtert fehlerhafte Zeilen und parst die Geburtsdaten (ein Durchlauf)
+
+        Args:
+            data: Import-Daten aus der Vorschau (participants, families)
+
+        Returns:
+            Tuple (gültige Zeilen mit birth_date als date, Anzahl übersprungener Zeilen)
+        """
+        rows = []
+        skipped = 0
+
+        for participant_data in data.get("participants", []):
+            if participant_data.get("has_error"):
+                skipped += 1
+                continue
+
+            birth_date = parse_birth_date(participant_data.get("birth_date_obj")) \
+                or parse_birth_date(participant_data.get("birth_date"))
+
+            if not birth_date:
+                logger.error(f"Could not parse birth_date for {participant_data.get('first_name')} {participant_data.get('last_name')}: {participant_data.get('birth_date')}")
+                skipped += 1
+                continue
+
+            rows.append({**participant_data, "birth_date": birth_date})
+
+        return rows, skipped
+
+    @staticmethod
+    def _family_mappings(event_id: int, families: Dict[str, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Erstellt die Insert-Mappings für alle Familien (Name vom ersten Mitglied laut Zeilennummer)"""
+        mappings = []
+        for family_number, members in families.items():
+            if not members:
+                continue
+
+            # Ersten Teilnehmer der Familie nehmen (sortiert nach Zeilennummer), damit der erste
+            # in der Excel/CSV auch als erster verwendet wird
+            first_member = min(members, key=lambda m: m.get("row", 0))
+            mappings.append({
+                "family_number": family_number,
+                "name": f"Familie {first_member['last_name']} {first_member['first_name']}",
+                "event_id": event_id,
+                "contact_person": f"{first_member['first_name']} {first_member['last_name']}",
+                "email": first_member.get("email"),
+                "phone": first_member.get("phone"),
+                "address": first_member.get("address")
+            })
+        return mappings
+
+    @staticmethod
+    def run(
+        db: Session,
+        event_id: int,
+        data: Dict[str, Any],
+        chunk_size: int = IMPORT_CHUNK_SIZE,
+        progress: Optional[Callable[[int, int], None]] = None
+    ) -> Dict[str, int]:
+        """
+        Führt den Import in einer Transaktion durch
+
+        Args:
+            db: Datenbank-Session
+            event_id: ID des Events
+            data: Import-Daten aus der Vorschau (participants, families)
+            chunk_size: Anzahl Teilnehmer pro Block
+            progress: Optionaler Callback (eingefügt, gesamt) nach jedem Block
+
+        Returns:
+            Dictionary mit imported, skipped, families
+
+        Raises:
+            ValueError: Wenn das Event nicht existiert
+            Exception: Fehler beim Einfügen (die Session ist dann zurückgerollt,
+                nichts wurde importiert)
+        """
+        from app.models import Event, Family, Participant
+
+        event = db.query(Event).filter(Event.id == event_id).first()
+        if not event:
+            raise ValueError("Event nicht gefunden")
+
+        # Aktives Ruleset des Events (kompiliert, aus dem Cache)
+        ruleset = RulesetCache.get_active(db, event_id, valid_on=event.start_date)
+        if not ruleset:
+            logger.warning("No active ruleset found for import, prices will be 0.0")
+
+        rows, skipped = ParticipantImportService.prepare_rows(data)
+        total = len(rows)
+        logger.info(f"Starting participant import: {total} valid rows, {skipped} skipped")
+
+        try:
+            # 1. Familien in einem Batch anlegen (IDs per return_defaults)
+            family_mappings = ParticipantImportService._family_mappings(event_id, data.get("families", {}))
+            family_map = {}
+            if family_mappings:
+                insert_rows = [
+                    {key: value for key, value in mapping.items() if key != "family_number"}
+                    for mapping in family_mappings
+                ]
+                db.bulk_insert_mappings(Family, insert_rows, return_defaults=True)
+                family_map = {
+                    mapping["family_number"]: insert_row["id"]
+                    for mapping, insert_row in zip(family_mappings, insert_rows)
+                }
+
+            # 2. Familienposition (nach Geburtsdatum) und Alter für alle Zeilen bestimmen
+            members_by_family = defaultdict(list)
+            for index, row in enumerate(rows):
+                family_id = family_map.get(row.get("family_number")) if row.get("family_number") else None
+                row["family_id"] = family_id
+                if family_id:
+                    members_by_family[family_id].append(index)
+
+            positions = [1] * total
+            for indexes in members_by_family.values():
+                indexes.sort(key=lambda i: rows[i]["birth_date"])
+                for position, index in enumerate(indexes, start=1):
+                    positions[index] = position
+
+            ages = [ParticipantImportService._age_at(event.start_date, row["birth_date"]) for row in rows]
+
+            # 3. Vollständige Preise in einem Durchlauf (beim Import keine Rollen)
+            if ruleset:
+                prices = ruleset.bulk_prices(ages, [None] * total, positions)
+            else:
+                prices = [0.0] * total
+
+            # 4. Teilnehmer blockweise einfügen (flush, Commit erst am Ende)
+            imported = 0
+            for start in range(0, total, chunk_size):
+                chunk = rows[start:start + chunk_size]
+                db.bulk_insert_mappings(Participant, [
+                    {
+                        "event_id": event_id,
+                        "first_name": row["first_name"],
+                        "last_name": row["last_name"],
+                        "birth_date": row["birth_date"],
+                        "gender": row.get("gender"),
+                        "email": row.get("email"),
+                        "phone": row.get("phone"),
+                        "address": row.get("address"),
+                        "role_id": None,
+                        "family_id": row["family_id"],
+                        "calculated_price": price,
+                        "is_active": True
+                    }
+                    for row, price in zip(chunk, prices[start:start + chunk_size])
+                ])
+                db.flush()
+
+                imported += len(chunk)
+                logger.info(f"Import progress: {imported}/{total} participants")
+                if progress:
+                    progress(imported, total)
+
+            # 5. Balance-Ledger nach Massenänderung vollständig neu aufbauen
+            BalanceLedgerService.rebuild(db, event_id)
+
+            # Familien, Teilnehmer und Ledger in einer Transaktion festschreiben
+            db.commit()
+        except Exception:
+            db.rollback()
+            logger.exception(f"Participant import for event {event_id} failed, rolled back")
+            raise
+
+        logger.info(f"✓ Import completed: {imported} imported, {skipped} skipped, {len(family_map)} families")
+        return {"imported": imported, "skipped": skipped, "families": len(family_map)}
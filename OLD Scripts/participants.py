@@ -1,24 +1,37 @@
 """Participants (Teilnehmer) Router"""
 import logging
+import base64
 import json
 import csv
-from io import BytesIO, StringIO
+from io import StringIO
+from collections import defaultdict
 from fastapi import APIRouter, Request, Depends, Form, HTTPException, UploadFile, File
 from fastapi.responses import HTMLResponse, RedirectResponse, Response
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import or_, and_, select, case
+from sqlalchemy.orm import Session, joinedload, selectinload
 from sqlalchemy.exc import IntegrityError, DataError
 from datetime import date, datetime
 from typing import Optional, List, Dict, Any
 from pydantic import ValidationError
-from openpyxl import Workbook, load_workbook
-from openpyxl.styles import Font, PatternFill, Alignment
-from openpyxl.worksheet.worksheet import Worksheet
 
 from app.database import get_db, transaction
-from app.models import Participant, Role, Event, Family, Ruleset, Setting, Task
+from app.models import Participant, Role, Event, Family, Setting, Task
 from app.services.price_calculator import PriceCalculator
-from app.services.qrcode_service import QRCodeService
-from app.services.excel_service import ExcelService
+from app.services.qrcode_cache import QRCodeCache, qr_code_cache
+from app.services.excel_stream import StreamingWorkbook, XLSX_MEDIA_TYPE
+from app.services.csv_stream import csv_response
+from app.services.dashboard_aggregates import final_price_expression
+from app.services.subsidy_calculator import age_at
+from app.services.export_jobs import export_jobs, JobContext
+from app.services.payment_allocation import PaymentAllocation, PaymentAllocationService
+from app.services.balance_ledger import (
+    BalanceLedger, BalanceLedgerService, SCOPE_PARTICIPANT, SCOPE_FAMILY,
+    PAYMENT_STATUS_PAID, PAYMENT_STATUS_OUTSTANDING
+)
+from app.services.ruleset_cache import RulesetCache
+from app.services.participant_import import ParticipantImportService, parse_birth_date, iter_import_rows
+from app.services.import_staging import ImportStaging, import_staging
+from app.services.search_index import SearchIndexService
 from app.dependencies import get_current_event_id
 from app.utils.error_handler import handle_db_exception
 from app.utils.flash import flash
@@ -86,11 +99,8 @@ def _check_and_update_role_count_task(
     if not role:
         return
 
-    # Hole das aktive Ruleset für dieses Event
-    ruleset = db.query(Ruleset).filter(
-        Ruleset.event_id == event_id,
-        Ruleset.is_active == True
-    ).first()
+    # Hole das aktive Ruleset für dieses Event (kompiliert, aus dem Cache)
+    ruleset = RulesetCache.get_active(db, event_id)
 
     if not ruleset or not ruleset.role_discounts:
         return  # Kein Ruleset oder keine Rollenrabatte konfiguriert
@@ -152,8 +162,50 @@ def _check_and_update_role_count_task(
     # Änderungen werden durch den äußeren db.commit() gespeichert
 
 
+# Seitengröße für Teilnehmer- und Familienliste (Keyset-Pagination)
+LIST_PAGE_SIZE = 50
+
+
+def _encode_cursor(*values) -> str:
+    """Kodiert die Sortierwerte der letzten Zeile als Cursor für die nächste Seite"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: Optional[str]) -> Optional[list]:
+    """Dekodiert einen Cursor (None bei leerem oder ungültigem Cursor)"""
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, TypeError):
+        return None
+    return values if isinstance(values, list) and len(values) == 2 else None
+
+
+def _ledger_join(scope: str, reference_column, event_id: int):
+    """Join-Bedingung auf den Balance-Ledger-Eintrag eines Teilnehmers/einer Familie"""
+    return and_(
+        BalanceLedger.event_id == event_id,
+        BalanceLedger.scope == scope,
+        BalanceLedger.reference_id == reference_column
+    )
+
+
+def _payment_status_filter(query, payment_status: Optional[str]):
+    """Wendet den Zahlungsstatus-Filter (paid/outstanding) auf die persistierte Spalte an"""
+    if payment_status == PAYMENT_STATUS_PAID:
+        # Ohne Ledger-Eintrag (z.B. neue, leere Familie) ist nichts offen
+        return query.filter(or_(
+            BalanceLedger.payment_status == PAYMENT_STATUS_PAID,
+            BalanceLedger.payment_status.is_(None)
+        ))
+    if payment_status == PAYMENT_STATUS_OUTSTANDING:
+        return query.filter(BalanceLedger.payment_status == PAYMENT_STATUS_OUTSTANDING)
+    return query
+
+
 @router.get("/", response_class=HTMLResponse)
-async def list_participants(
+def list_participants(
     request: Request,
     db: Session = Depends(get_db),
     event_id: int = Depends(get_current_event_id),
@@ -162,18 +214,26 @@ async def list_participants(
     payment_status: Optional[str] = "",
     family_search: Optional[str] = "",
     family_role_id: Optional[str] = "",
-    family_payment_status: Optional[str] = ""
+    family_payment_status: Optional[str] = "",
+    cursor: Optional[str] = ""
 ):
-    """Liste aller Teilnehmer mit Such- und Filterfunktionen"""
-    query = db.query(Participant).filter(Participant.event_id == event_id)
+    """
+    Liste der Teilnehmer mit Such- und Filterfunktionen (Keyset-Pagination nach Nachname, ID)
 
-    # Suchfilter
+    Der Familien-Tab wird separat über /participants/families-tab geladen.
+    HTMX-Anfragen mit Cursor ("Mehr laden") erhalten nur die weiteren Zeilen.
+    """
+    # Zahlungsstatus aus dem Balance-Ledger - Filter und Pagination laufen in SQL
+    BalanceLedgerService.get_event_balance(db, event_id)
+
+    query = db.query(Participant, BalanceLedger.total_paid, BalanceLedger.outstanding)\
+        .outerjoin(BalanceLedger, _ledger_join(SCOPE_PARTICIPANT, Participant.id, event_id))\
+        .filter(Participant.event_id == event_id)
+
+    # Suchfilter (FTS5-Index: Vor-/Nachname, E-Mail)
     if search and search.strip():
-        search_filter = f"%{search}%"
         query = query.filter(
-            (Participant.first_name.ilike(search_filter)) |
-            (Participant.last_name.ilike(search_filter)) |
-            (Participant.email.ilike(search_filter))
+            Participant.id.in_(SearchIndexService.matching_ids(db, event_id, "participant", search))
         )
 
     # Rollenfilter (nur wenn nicht leer)
@@ -183,150 +243,148 @@ async def list_participants(
         except ValueError:
             pass  # Ungültige ID ignorieren
 
-    # Eager Loading für related objects um N+1 Queries zu vermeiden
-    participants = query.options(
+    # Zahlungsstatus-Filter
+    query = _payment_status_filter(query, payment_status)
+
+    # Keyset: alle Zeilen nach (last_name, id) der letzten angezeigten Zeile
+    after = _decode_cursor(cursor)
+    if after:
+        query = query.filter(or_(
+            Participant.last_name > after[0],
+            and_(Participant.last_name == after[0], Participant.id > after[1])
+        ))
+
+    # Eager Loading für related objects um N+1 Queries zu vermeiden (nur für die aktuelle Seite)
+    rows = query.options(
         joinedload(Participant.role),
         joinedload(Participant.family),
         joinedload(Participant.event),
-        joinedload(Participant.payments)
-    ).order_by(Participant.last_name).all()
-
-    # Berechne Zahlungsinformationen für jeden Teilnehmer
-    participant_data = []
-    for participant in participants:
-        # Direkte Zahlungen des Teilnehmers
-        direct_payments = float(sum((payment.amount for payment in participant.payments), 0))
-
-        # Anteilige Familienzahlungen berechnen
-        family_payment_share = 0.0
-        if participant.family_id:
-            # Lade Familie mit Zahlungen und Teilnehmern
-            family = db.query(Family).filter(Family.id == participant.family_id).options(
-                joinedload(Family.payments),
-                joinedload(Family.participants).joinedload(Participant.payments)
-            ).first()
+        selectinload(Participant.payments)
+    ).order_by(Participant.last_name, Participant.id).limit(LIST_PAGE_SIZE + 1).all()
+
+    next_cursor = None
+    if len(rows) > LIST_PAGE_SIZE:
+        rows = rows[:LIST_PAGE_SIZE]
+        last = rows[-1][0]
+        next_cursor = _encode_cursor(last.last_name, last.id)
 
-            if family:
-                # Gesamtzahlungen der Familie
-                family_total_payments = float(sum((payment.amount for payment in family.payments), 0))
-
-                # Berechne für jedes Familienmitglied die direkten Zahlungen und offenen Beträge
-                family_members_outstanding = []
-                total_outstanding = 0.0
-
-                for member in family.participants:
-                    member_direct_payments = float(sum((payment.amount for payment in member.payments), 0))
-                    member_outstanding = max(0.0, float(member.final_price) - member_direct_payments)
-                    family_members_outstanding.append({
-                        'participant_id': member.id,
-                        'outstanding': member_outstanding
-                    })
-                    total_outstanding += member_outstanding
-
-                # Verteile die Familienzahlung proportional auf die offenen Beträge
-                if total_outstanding > 0:
-                    # Finde den aktuellen Teilnehmer in der Liste
-                    for member_data in family_members_outstanding:
-                        if member_data['participant_id'] == participant.id:
-                            # Anteilige Verteilung basierend auf offenen Beträgen
-                            family_payment_share = (member_data['outstanding'] / total_outstanding) * family_total_payments
-                            break
-                elif family_total_payments > 0:
-                    # Wenn alle Beträge bezahlt sind, aber noch Familienzahlungen da sind,
-                    # verteile proportional nach Sollpreis
-                    family_total_price = float(sum((p.final_price for p in family.participants), 0))
-                    if family_total_price > 0:
-                        family_payment_share = (float(participant.final_price) / family_total_price) * family_total_payments
-
-        # Gesamtzahlung = direkte Zahlungen + anteilige Familienzahlungen
-        total_paid = direct_payments + family_payment_share
-        outstanding = float(participant.final_price) - total_paid
-
-        # Zahlungsstatus-Filter anwenden
-        if payment_status == "paid" and outstanding > 0.01:
-            continue  # Überspringe nicht vollständig bezahlte
-        elif payment_status == "outstanding" and outstanding <= 0.01:
-            continue  # Überspringe vollständig bezahlte
-
-        participant_data.append({
+    participant_data = [
+        {
             "participant": participant,
-            "total_paid": total_paid,
-            "outstanding": outstanding
-        })
+            "total_paid": float(total_paid or 0),
+            "outstanding": float(outstanding or 0)
+        }
+        for participant, total_paid, outstanding in rows
+    ]
+
+    context = {
+        "request": request,
+        "participant_data": participant_data,
+        "next_cursor": next_cursor,
+        "search": search,
+        "selected_role_id": role_id,
+        "payment_status": payment_status
+    }
+
+    # Nachladen weiterer Seiten per HTMX
+    if cursor and request.headers.get("HX-Request"):
+        return templates.TemplateResponse("participants/_participant_rows.html", context)
 
     # Für Filter-Dropdown (auch nach event_id gefiltert)
     roles = db.query(Role).filter(Role.is_active == True, Role.event_id == event_id).all()
     families = db.query(Family).filter(Family.event_id == event_id).order_by(Family.name).all()
 
-    # Für Familien-Tab: Familiendaten mit Statistiken berechnen
-    families_with_participants = db.query(Family)\
-        .filter(Family.event_id == event_id)\
-        .options(
-            joinedload(Family.participants),
-            joinedload(Family.payments)
-        )\
-        .order_by(Family.name)\
-        .all()
+    return templates.TemplateResponse(
+        "participants/list.html",
+        {
+            **context,
+            "title": "Teilnehmer & Familien",
+            "roles": roles,
+            "families": families,
+            "family_search": family_search,
+            "family_role_id": family_role_id,
+            "family_payment_status": family_payment_status
+        }
+    )
+
+
+@router.get("/families-tab", response_class=HTMLResponse)
+def families_tab(
+    request: Request,
+    db: Session = Depends(get_db),
+    event_id: int = Depends(get_current_event_id),
+    family_search: Optional[str] = "",
+    family_role_id: Optional[str] = "",
+    family_payment_status: Optional[str] = "",
+    cursor: Optional[str] = ""
+):
+    """
+    HTMX-Endpunkt für den Familien-Tab (Keyset-Pagination nach Name, ID)
+
+    Berechnet die Statistiken nur für die Familien der angeforderten Seite.
+    """
+    BalanceLedgerService.get_event_balance(db, event_id)
+
+    query = db.query(Family, BalanceLedger.total_paid, BalanceLedger.outstanding)\
+        .outerjoin(BalanceLedger, _ledger_join(SCOPE_FAMILY, Family.id, event_id))\
+        .filter(Family.event_id == event_id)
+
+    # Suchfilter für Familien (FTS5-Index: Name, Ansprechpartner)
+    if family_search and family_search.strip():
+        query = query.filter(
+            Family.id.in_(SearchIndexService.matching_ids(db, event_id, "family", family_search))
+        )
 
-    family_data = []
-    for family in families_with_participants:
-        # Suchfilter für Familien
-        if family_search and family_search.strip():
-            search_filter = family_search.strip().lower()
-            family_name = (family.name or "").lower()
-            contact_person = (family.contact_person or "").lower()
-            if search_filter not in family_name and search_filter not in contact_person:
-                continue  # Überspringe Familien, die nicht zur Suche passen
-
-        # Rollenfilter für Familien - prüfe ob ein Teilnehmer der Familie diese Rolle hat
-        if family_role_id and family_role_id.strip():
-            try:
-                role_id_int = int(family_role_id)
-                has_role = any(p.role_id == role_id_int for p in family.participants)
-                if not has_role:
-                    continue  # Überspringe Familien ohne Teilnehmer mit dieser Rolle
-            except ValueError:
-                pass
-
-        # Konvertiere zu float um Decimal/float Typ-Konflikte zu vermeiden
-        total_price = float(sum((p.final_price for p in family.participants), 0))
-
-        # Zahlungen: Sowohl direkte Familienzahlungen als auch Zahlungen an einzelne Mitglieder
-        family_payments = float(sum((payment.amount for payment in family.payments), 0))
-        member_payments = float(sum(
-            (payment.amount
-            for participant in family.participants
-            for payment in participant.payments), 0
+    # Rollenfilter für Familien - Familien mit mindestens einem Teilnehmer dieser Rolle
+    if family_role_id and family_role_id.strip():
+        try:
+            query = query.filter(Family.id.in_(
+                db.query(Participant.family_id).filter(
+                    Participant.event_id == event_id,
+                    Participant.role_id == int(family_role_id)
+                )
+            ))
+        except ValueError:
+            pass
+
+    # Zahlungsstatus-Filter für Familien
+    query = _payment_status_filter(query, family_payment_status)
+
+    after = _decode_cursor(cursor)
+    if after:
+        query = query.filter(or_(
+            Family.name > after[0],
+            and_(Family.name == after[0], Family.id > after[1])
         ))
-        total_paid = family_payments + member_payments
-        outstanding = total_price - total_paid
 
-        # Zahlungsstatus-Filter für Familien
-        if family_payment_status == "paid" and outstanding > 0.01:
-            continue  # Überspringe nicht vollständig bezahlte Familien
-        elif family_payment_status == "outstanding" and outstanding <= 0.01:
-            continue  # Überspringe vollständig bezahlte Familien
+    rows = query.options(selectinload(Family.participants))\
+        .order_by(Family.name, Family.id)\
+        .limit(LIST_PAGE_SIZE + 1)\
+        .all()
+
+    next_cursor = None
+    if len(rows) > LIST_PAGE_SIZE:
+        rows = rows[:LIST_PAGE_SIZE]
+        last = rows[-1][0]
+        next_cursor = _encode_cursor(last.name, last.id)
 
-        family_data.append({
+    family_data = [
+        {
             "family": family,
             "participant_count": len(family.participants),
-            "total_price": total_price,
-            "total_paid": total_paid,
-            "outstanding": outstanding
-        })
+            "total_price": float(total_paid or 0) + float(outstanding or 0),
+            "total_paid": float(total_paid or 0),
+            "outstanding": float(outstanding or 0)
+        }
+        for family, total_paid, outstanding in rows
+    ]
 
     return templates.TemplateResponse(
-        "participants/list.html",
+        "participants/_families_tab.html",
         {
             "request": request,
-            "title": "Teilnehmer & Familien",
-            "participant_data": participant_data,
-            "roles": roles,
-            "families": families,
             "family_data": family_data,
-            "search": search,
-            "selected_role_id": role_id,
-            "payment_status": payment_status,
+            "next_cursor": next_cursor,
             "family_search": family_search,
             "family_role_id": family_role_id,
             "family_payment_status": family_payment_status
@@ -335,7 +393,7 @@ async def list_participants(
 
 
 @router.get("/create", response_class=HTMLResponse)
-async def create_participant_form(
+def create_participant_form(
     request: Request,
     db: Session = Depends(get_db),
     event_id: int = Depends(get_current_event_id)
@@ -358,7 +416,7 @@ async def create_participant_form(
 
 
 @router.post("/create", response_class=HTMLResponse)
-async def create_participant(
+def create_participant(
     request: Request,
     db: Session = Depends(get_db),
     event_id: int = Depends(get_current_event_id),
@@ -474,6 +532,7 @@ async def create_participant(
         with transaction(db):
             db.add(participant)
             db.flush()  # Generiert ID ohne zu committen
+            BalanceLedgerService.participant_changed(db, event_id, participant)
         # Auto-commit erfolgt hier
 
         # Prüfe Rollenüberschreitung und aktualisiere Task
@@ -510,7 +569,7 @@ async def create_participant(
 
 
 @router.post("/calculate-price", response_class=HTMLResponse)
-async def calculate_price_preview(
+def calculate_price_preview(
     request: Request,
     db: Session = Depends(get_db),
     event_id: int = Depends(get_current_event_id),
@@ -568,7 +627,7 @@ async def calculate_price_preview(
 
 
 @router.post("/suggest-role", response_class=HTMLResponse)
-async def suggest_role(
+def suggest_role(
     request: Request,
     db: Session = Depends(get_db),
     event_id: int = Depends(get_current_event_id),
@@ -591,24 +650,17 @@ async def suggest_role(
         if (event.start_date.month, event.start_date.day) < (birth_date_obj.month, birth_date_obj.day):
             age -= 1
 
-        # Aktives Regelwerk finden
-        ruleset = db.query(Ruleset).filter(
-            Ruleset.is_active == True,
-            Ruleset.valid_from <= event.start_date,
-            Ruleset.valid_until >= event.start_date
-        ).first()
+        # Aktives Regelwerk des Events finden (kompiliert, aus dem Cache)
+        ruleset = RulesetCache.get_active(db, event_id, valid_on=event.start_date)
 
         if not ruleset or not ruleset.age_groups:
             return HTMLResponse(content="")
 
         # Passende Altersgruppe finden
         suggested_role_name = None
-        for age_group in ruleset.age_groups:
-            min_age = age_group.get("min_age", 0)
-            max_age = age_group.get("max_age", 999)
-            if min_age <= age <= max_age:
-                suggested_role_name = age_group.get("role", "").lower()
-                break
+        age_group = ruleset.get_age_group(age)
+        if age_group:
+            suggested_role_name = age_group.get("role", "").lower()
 
         if not suggested_role_name:
             return HTMLResponse(content="")
@@ -652,7 +704,7 @@ async def suggest_role(
 
 
 @router.get("/import", response_class=HTMLResponse)
-async def import_participants_form(
+def import_participants_form(
     request: Request,
     db: Session = Depends(get_db)
 ):
@@ -667,7 +719,7 @@ async def import_participants_form(
 
 
 @router.get("/import/template")
-async def download_import_template(
+def download_import_template(
     db: Session = Depends(get_db),
     event_id: int = Depends(get_current_event_id),
     format: str = "xlsx"
@@ -707,24 +759,20 @@ async def download_import_template(
             }
         )
 
-    # Excel-Format (Standard) mit ExcelService
-    wb, ws = ExcelService.create_workbook("Teilnehmer")
+    # Excel-Format (Standard) als Write-only Workbook
+    workbook = StreamingWorkbook()
 
     # Spaltenbreiten
     column_widths = {1: 15, 2: 15, 3: 25, 4: 12, 5: 25, 6: 15, 7: 30, 8: 12}
-
-    # Header-Formatierung mit ExcelService
-    ExcelService.apply_header_row(ws, headers, column_widths)
+    ws = workbook.create_sheet("Teilnehmer", column_widths)
+    workbook.append_header(ws, headers)
 
     # Beispieldaten hinzufügen (bereits definiert oben)
-
-    for row_num, row_data in enumerate(example_data, 2):
-        for col_num, value in enumerate(row_data, 1):
-            ws.cell(row=row_num, column=col_num, value=value)
+    for row_data in example_data:
+        ws.append(row_data)
 
     # Hinweise in separatem Sheet
-    ws_info = wb.create_sheet("Hinweise")
-    ws_info.column_dimensions['A'].width = 80
+    ws_info = workbook.create_sheet("Hinweise", {1: 80})
 
     info_text = [
         "Hinweise zum Excel-Import:",
@@ -753,44 +801,11 @@ async def download_import_template(
         "Anna Schmidt (Familie 2 oder leer)  <- Andere/Keine Familie"
     ]
 
-    for row_num, text in enumerate(info_text, 1):
-        cell = ws_info.cell(row=row_num, column=1, value=text)
-        if "PFLICHTFELDER" in text or "OPTIONALE" in text or "FAMILIEN" in text:
-            cell.font = Font(bold=True, size=12)
-
-    # Excel in BytesIO speichern
-    excel_buffer = BytesIO()
-    wb.save(excel_buffer)
-    excel_buffer.seek(0)
-
-    return Response(
-        content=excel_buffer.getvalue(),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={
-            "Content-Disposition": "attachment; filename=Teilnehmer_Import_Vorlage.xlsx"
-        }
-    )
+    for text in info_text:
+        is_heading = "PFLICHTFELDER" in text or "OPTIONALE" in text or "FAMILIEN" in text
+        workbook.append(ws_info, [text], {1: "heading"} if is_heading else None)
 
-
-def _parse_csv_data(csv_content: str) -> List[List[str]]:
-    """
-    Hilfsfunktion zum Parsen von CSV-Inhalten.
-
-    Args:
-        csv_content: CSV-Inhalt als String
-
-    Returns:
-        Liste von Zeilen, jede Zeile ist eine Liste von Werten
-    """
-    csv_reader = csv.reader(StringIO(csv_content), delimiter=';')
-    rows = list(csv_reader)
-
-    # Fallback: Versuche Komma als Delimiter wenn Semikolon keine Spalten ergibt
-    if rows and len(rows[0]) <= 1:
-        csv_reader = csv.reader(StringIO(csv_content), delimiter=',')
-        rows = list(csv_reader)
-
-    return rows
+    return workbook.response("Teilnehmer_Import_Vorlage.xlsx")
 
 
 def _process_import_row(
@@ -847,45 +862,17 @@ def _process_import_row(
         row_errors.append("Nachname fehlt")
         has_error = True
 
-    # Geburtsdatum parsen - unterstützt mehrere Formate
+    # Geburtsdatum parsen - unterstützt date/datetime-Objekte (Excel) und mehrere String-Formate
     birth_date = None
     birth_date_str = ""  # Für Fehlerausgabe
-    
+
     if birth_date_raw:
-        try:
-            # Fall 1: Excel gibt bereits ein date/datetime-Objekt zurück
-            if isinstance(birth_date_raw, date):
-                birth_date = birth_date_raw
-                birth_date_str = birth_date.strftime("%d.%m.%Y")
-            elif isinstance(birth_date_raw, datetime):
-                birth_date = birth_date_raw.date()
-                birth_date_str = birth_date.strftime("%d.%m.%Y")
-            else:
-                # Fall 2: String parsen - versuche verschiedene Formate
-                birth_date_str = str(birth_date_raw).strip()
-                
-                # Unterstützte Formate
-                date_formats = [
-                    "%Y-%m-%d %H:%M:%S",  # Excel: 1991-07-01 00:00:00
-                    "%Y-%m-%d",           # ISO: 1991-07-01
-                    "%d.%m.%Y",           # Deutsch: 01.07.1991
-                    "%d/%m/%Y",           # Alternative: 01/07/1991
-                    "%d-%m-%Y",           # Alternative: 01-07-1991
-                ]
-                
-                for fmt in date_formats:
-                    try:
-                        birth_date = datetime.strptime(birth_date_str, fmt).date()
-                        break
-                    except ValueError:
-                        continue
-
-                if not birth_date:
-                    row_errors.append(f"Ungültiges Datumsformat: {birth_date_str}")
-                    has_error = True
-                    
-        except Exception as e:
-            row_errors.append(f"Fehler beim Datum: {str(e)}")
+        birth_date = parse_birth_date(birth_date_raw)
+        if birth_date:
+            birth_date_str = birth_date.strftime("%d.%m.%Y")
+        else:
+            birth_date_str = str(birth_date_raw).strip()
+            row_errors.append(f"Ungültiges Datumsformat: {birth_date_str}")
             has_error = True
     else:
         row_errors.append("Geburtsdatum fehlt")
@@ -921,8 +908,31 @@ def _process_import_row(
         families_dict[family_number].append(participant_data)
 
 
+def _read_import_file(file_obj, filename: str):
+    """
+    Liest und validiert eine Import-Datei zeilenweise (Streaming)
+
+    Args:
+        file_obj: Binärer Datei-Stream der Upload-Datei
+        filename: Dateiname (bestimmt CSV oder Excel)
+
+    Returns:
+        Tuple (participants_data, errors, families_dict, Anzahl gelesener Datenzeilen)
+    """
+    participants_data = []
+    errors = []
+    families_dict = {}  # family_number -> [participants]
+    row_count = 0
+
+    for row_num, row in iter_import_rows(file_obj, filename):
+        row_count += 1
+        _process_import_row(row, row_num, participants_data, errors, families_dict)
+
+    return participants_data, errors, families_dict, row_count
+
+
 @router.post("/import", response_class=HTMLResponse)
-async def upload_import_file(
+def upload_import_file(
     request: Request,
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
@@ -938,38 +948,13 @@ async def upload_import_file(
             flash(request, "Bitte laden Sie eine Excel-Datei (.xlsx, .xls) oder CSV-Datei (.csv) hoch", "error")
             return RedirectResponse(url="/participants/import", status_code=303)
 
-        # Datei lesen
-        contents = await file.read()
-
-        # Daten parsen
-        participants_data = []
-        errors = []
-        families_dict = {}  # family_number -> [participants]
-
-        # CSV-Datei
-        if is_csv:
-            csv_content = contents.decode('utf-8-sig')  # UTF-8 mit BOM Support
-            rows = _parse_csv_data(csv_content)
+        # Datei zeilenweise lesen und direkt validieren (CSV inkrementell dekodiert,
+        # Excel im read_only-Modus)
+        participants_data, errors, families_dict, row_count = _read_import_file(file.file, file.filename)
 
-            if not rows or len(rows) < 2:
-                flash(request, "CSV-Datei ist leer oder enthält keine Daten", "error")
-                return RedirectResponse(url="/participants/import", status_code=303)
-
-            # Header ist Zeile 0, Daten ab Zeile 1
-            for row_num, row in enumerate(rows[1:], start=2):
-                _process_import_row(row, row_num, participants_data, errors, families_dict)
-
-        # Excel-Datei
-        else:
-            wb = load_workbook(BytesIO(contents), data_only=True)
-            ws = wb.active
-
-            # Header prüfen (erste Zeile)
-            header_row = [cell.value for cell in ws[1]]
-
-            # Ab Zeile 2 lesen (Zeile 1 ist Header)
-            for row_num, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
-                _process_import_row(row, row_num, participants_data, errors, families_dict)
+        if is_csv and row_count == 0:
+            flash(request, "CSV-Datei ist leer oder enthält keine Daten", "error")
+            return RedirectResponse(url="/participants/import", status_code=303)
 
         if not participants_data:
             flash(request, "Keine Teilnehmer in der Datei gefunden", "error")
@@ -982,8 +967,8 @@ async def upload_import_file(
             "errors": errors
         }
 
-        # Als JSON für das Formular
-        import_data_json = json.dumps(import_data, default=str)
+        # Serverseitig ablegen - das Formular schickt nur noch das Token zurück
+        import_token = import_staging.stage(event_id, import_data)
 
         return templates.TemplateResponse(
             "participants/import_preview.html",
@@ -991,7 +976,7 @@ async def upload_import_file(
                 "request": request,
                 "title": "Import-Vorschau",
                 "import_data": import_data,
-                "import_data_json": import_data_json
+                "import_token": import_token
             }
         )
 
@@ -1002,466 +987,316 @@ async def upload_import_file(
 
 
 @router.post("/import/confirm", response_class=HTMLResponse)
-async def confirm_import(
+def confirm_import(
     request: Request,
-    import_data: str = Form(...),
+    import_token: str = Form(...),
+    excluded_rows: List[int] = Form([]),
     db: Session = Depends(get_db),
     event_id: int = Depends(get_current_event_id)
 ):
-    """Führt den eigentlichen Import durch"""
-    try:
-        # Import-Daten deserialisieren
-        data = json.loads(import_data)
-
-        imported_count = 0
-        skipped_count = 0
-        family_map = {}  # family_number -> family_id
+    """
+    Führt den eigentlichen Import durch (mengenbasiert, eine Transaktion)
 
-        # Event laden
-        event = db.query(Event).filter(Event.id == event_id).first()
-        if not event:
-            flash(request, "Event nicht gefunden", "error")
+    Die Daten kommen aus der serverseitigen Ablage der Vorschau (import_token);
+    excluded_rows enthält die Zeilennummern, die der Benutzer abgewählt hat.
+    Das Token wird vor dem Import beansprucht, eine zweite Bestätigung
+    (Doppelklick, zweiter Tab) wird abgewiesen.
+    """
+    try:
+        data = import_staging.claim(import_token, event_id)
+        if data is None:
+            flash(request, "Import-Daten nicht gefunden oder abgelaufen - bitte Datei erneut hochladen", "error")
             return RedirectResponse(url="/participants/import", status_code=303)
 
-        # Aktives Ruleset laden für Preisberechnung
-        ruleset = db.query(Ruleset).filter(
-            Ruleset.is_active == True,
-            Ruleset.valid_from <= event.start_date,
-            Ruleset.valid_until >= event.start_date
-        ).first()
-
-        # Zuerst: Familien erstellen
-        for family_number, members in data.get("families", {}).items():
-            if not members:
-                continue
-
-            # Ersten Teilnehmer der Familie nehmen für Familiennamen (sortiert nach Zeilennummer)
-            # Damit ist sichergestellt, dass der erste in der Excel/CSV auch als erster verwendet wird
-            sorted_members = sorted(members, key=lambda m: m.get('row', 0))
-            first_member = sorted_members[0]
-            family_name = f"Familie {first_member['last_name']} {first_member['first_name']}"
-
-            # Familie erstellen
-            new_family = Family(
-                name=family_name,
-                event_id=event_id,
-                contact_person=f"{first_member['first_name']} {first_member['last_name']}",
-                email=first_member.get('email'),
-                phone=first_member.get('phone'),
-                address=first_member.get('address')
-            )
+        data = ImportStaging.exclude_rows(data, excluded_rows)
 
-            db.add(new_family)
-            db.flush()  # Familie speichern um ID zu bekommen
-
-            family_map[family_number] = new_family.id
-
-        # Dann: Teilnehmer importieren
-        logger.info(f"Starting participant import: {len(data.get('participants', []))} participants to process")
-        
-        for participant_data in data.get("participants", []):
-            # Debug-Logging
-            logger.debug(f"Processing: {participant_data.get('first_name')} {participant_data.get('last_name')} - has_error: {participant_data.get('has_error')}")
-            
-            # Fehlerhafte überspringen
-            if participant_data.get("has_error"):
-                logger.warning(f"Skipping {participant_data.get('first_name')} {participant_data.get('last_name')} due to validation errors")
-                skipped_count += 1
-                continue
-        
-            try:
-                # Geburtsdatum parsen
-                birth_date_str = participant_data["birth_date"]
-                birth_date = None
-                
-                # Versuche erst mit birth_date_obj (wenn bereits geparst)
-                if participant_data.get("birth_date_obj"):
-                    birth_date_obj = participant_data["birth_date_obj"]
-                    
-                    # Kann String oder date-Objekt sein (durch JSON-Serialisierung)
-                    if isinstance(birth_date_obj, date):
-                        birth_date = birth_date_obj
-                        logger.debug(f"Using pre-parsed birth_date_obj (date): {birth_date}")
-                    elif isinstance(birth_date_obj, datetime):
-                        birth_date = birth_date_obj.date()
-                        logger.debug(f"Using pre-parsed birth_date_obj (datetime): {birth_date}")
-                    elif isinstance(birth_date_obj, str):
-                        # JSON hat es zu String gemacht - zurück parsen
-                        for fmt in ["%Y-%m-%d %H:%M:%S", "%Y-%m-%d", "%d.%m.%Y", "%d/%m/%Y"]:
-                            try:
-                                parsed = datetime.strptime(birth_date_obj, fmt)
-                                birth_date = parsed.date() if isinstance(parsed, datetime) else parsed
-                                logger.debug(f"Parsed birth_date_obj string with format {fmt}: {birth_date}")
-                                break
-                            except ValueError:
-                                continue
-                
-                # Falls birth_date_obj nicht funktioniert hat, versuche birth_date String
-                if not birth_date and birth_date_str:
-                    for fmt in ["%d.%m.%Y", "%Y-%m-%d", "%d/%m/%Y", "%Y-%m-%d %H:%M:%S"]:
-                        try:
-                            parsed = datetime.strptime(birth_date_str, fmt)
-                            birth_date = parsed.date() if isinstance(parsed, datetime) else parsed
-                            logger.debug(f"Parsed birth_date string with format {fmt}: {birth_date}")
-                            break
-                        except ValueError:
-                            continue
-                
-                if not birth_date:
-                    logger.error(f"Could not parse birth_date for {participant_data.get('first_name')} {participant_data.get('last_name')}: {birth_date_str}")
-                    skipped_count += 1
-                    continue
-                
-                # Sicherstellen dass birth_date ein date-Objekt ist
-                if isinstance(birth_date, datetime):
-                    birth_date = birth_date.date()
-                
-                logger.debug(f"Final birth_date (type: {type(birth_date).__name__}): {birth_date}")
-        
-                # Rolle basierend auf Alter ermitteln
-                age = event.start_date.year - birth_date.year
-                if (event.start_date.month, event.start_date.day) < (birth_date.month, birth_date.day):
-                    age -= 1
-        
-                logger.debug(f"Calculated age: {age} for {participant_data.get('first_name')} {participant_data.get('last_name')}")
-        
-                # KEINE automatische Rollenzuweisung beim Import
-                # Teilnehmer bekommen nur eine Rolle, wenn sie explizit eine benötigen
-                role_id = None
-                logger.debug(f"Import: No automatic role assignment for {participant_data.get('first_name')} {participant_data.get('last_name')}")
-
-                # Familie zuordnen
-                family_id = None
-                family_number = participant_data.get("family_number")
-                if family_number and family_number in family_map:
-                    family_id = family_map[family_number]
-                    logger.debug(f"Assigned to family_id: {family_id}")
-
-                # Preis berechnen: Nur Basispreis basierend auf Alter (aus age_groups)
-                # Familienrabatte werden später vom PriceCalculator berechnet
-                final_price = 0.0
-                if ruleset and ruleset.age_groups:
-                    # Finde passende Altersgruppe
-                    for age_group in ruleset.age_groups:
-                        min_age = age_group.get("min_age", 0)
-                        max_age = age_group.get("max_age", 999)
-                        if min_age <= age <= max_age:
-                            # YAML verwendet "price", nicht "base_price"
-                            base_price = age_group.get("price", 0.0)
-                            final_price = base_price
-                            logger.debug(f"Calculated base price from age group: {final_price}€ (age: {age})")
-                            break
-                else:
-                    logger.warning(f"No ruleset or age_groups found, price will be 0.0")
-
-                logger.debug(f"Final calculated price (before family/role discounts): {final_price}€")
-        
-                # Teilnehmer erstellen
-                new_participant = Participant(
-                    event_id=event_id,
-                    first_name=participant_data["first_name"],
-                    last_name=participant_data["last_name"],
-                    birth_date=birth_date,
-                    gender=participant_data.get("gender"),
-                    email=participant_data.get("email"),
-                    phone=participant_data.get("phone"),
-                    address=participant_data.get("address"),
-                    role_id=role_id,
-                    family_id=family_id,
-                    calculated_price=final_price,
-                    is_active=True
-                )
-        
-                db.add(new_participant)
-                imported_count += 1
-                logger.info(f"✓ Added participant: {new_participant.first_name} {new_participant.last_name}")
-        
-            except Exception as e:
-                logger.exception(f"✗ Error importing participant {participant_data.get('first_name')} {participant_data.get('last_name')}: {e}")
-                skipped_count += 1
-                continue
-        
-        # Commit aller Änderungen
-        logger.info(f"Committing changes: {imported_count} participants to import")
-        db.commit()
-        logger.info(f"✓ Import completed: {imported_count} imported, {skipped_count} skipped")
-
-        # Preise für alle importierten Teilnehmer neu berechnen (für Familienrabatte)
-        logger.info("Recalculating prices with family and role discounts...")
-        all_participants = db.query(Participant).filter(
-            Participant.event_id == event_id,
-            Participant.is_active == True
-        ).all()
-
-        recalculated_count = 0
-        for participant in all_participants:
-            try:
-                # Preis mit PriceCalculator neu berechnen (inkl. Familienrabatte)
-                new_price = PriceCalculator.calculate_price_from_db(
-                    db=db,
-                    event_id=event_id,
-                    role_id=participant.role_id,
-                    birth_date=participant.birth_date,
-                    family_id=participant.family_id
-                )
-                participant.calculated_price = new_price
-                recalculated_count += 1
-            except Exception as e:
-                logger.warning(f"Could not recalculate price for {participant.full_name}: {e}")
-
-        db.commit()
-        logger.info(f"✓ Recalculated prices for {recalculated_count} participants")
+        try:
+            result = ParticipantImportService.run(db, event_id, data)
+        except Exception:
+            # Der Import ist zurückgerollt - Token für einen neuen Versuch freigeben
+            import_staging.release(import_token)
+            raise
+        import_staging.complete(import_token)
 
         # Erfolgs-Nachricht
-        message = f"{imported_count} Teilnehmer erfolgreich importiert"
-        if skipped_count > 0:
-            message += f" ({skipped_count} übersprungen)"
+        message = f"{result['imported']} Teilnehmer erfolgreich importiert"
+        if result["skipped"] > 0:
+            message += f" ({result['skipped']} übersprungen)"
 
         flash(request, message, "success")
         return RedirectResponse(url="/participants", status_code=303)
 
-    except json.JSONDecodeError as e:
-        logger.exception(f"Invalid JSON in import data: {e}")
-        flash(request, "Ungültige Import-Daten", "error")
+    except ValueError as e:
+        flash(request, str(e), "error")
         return RedirectResponse(url="/participants/import", status_code=303)
 
     except Exception as e:
         db.rollback()
         logger.exception(f"Error during import: {e}")
-        flash(request, f"Fehler beim Import: {str(e)}", "error")
+        flash(request, f"Fehler beim Import - es wurden keine Teilnehmer importiert: {str(e)}", "error")
         return RedirectResponse(url="/participants/import", status_code=303)
 
 
 @router.get("/export")
-async def export_participants_excel(
+def export_participants_excel(
     db: Session = Depends(get_db),
     event_id: int = Depends(get_current_event_id)
 ):
-    """Exportiert alle Teilnehmer als Excel-Datei, gruppiert nach Familien"""
-    try:
-        # Event laden
-        event = db.query(Event).filter(Event.id == event_id).first()
-        if not event:
-            raise HTTPException(status_code=404, detail="Event nicht gefunden")
-
-        # Alle aktiven Teilnehmer laden mit Eager Loading
-        all_participants = db.query(Participant).options(
-            joinedload(Participant.role),
-            joinedload(Participant.family),
-            joinedload(Participant.payments)
-        ).filter(
+    """Startet den Excel-Export aller Teilnehmer (gruppiert nach Familien) als Hintergrund-Job"""
+    job = export_jobs.submit(db, event_id, "participants_excel", "Teilnehmerliste (Excel)", _participants_excel_job)
+    return RedirectResponse(url=f"/jobs/{job.id}", status_code=303)
+
+
+@router.get("/export/csv")
+def export_participants_csv(
+    request: Request,
+    db: Session = Depends(get_db),
+    event_id: int = Depends(get_current_event_id),
+    gzip: bool = False
+):
+    """
+    Exportiert alle aktiven Teilnehmer als CSV (gestreamt direkt aus dem Cursor)
+
+    Reihenfolge wie im Excel-Export: Familien nach Name (Mitglieder nach
+    Geburtsdatum), danach Einzelpersonen nach Name. Bezahlt/Offen stammen aus
+    dem Balance-Ledger und enthalten die anteiligen Familienzahlungen.
+    """
+    event = db.query(Event).filter(Event.id == event_id).first()
+    if not event:
+        raise HTTPException(status_code=404, detail="Event nicht gefunden")
+
+    # Ledger bei Bedarf aufbauen (Zahlungsverteilung inkl. Familienzahlungen)
+    BalanceLedgerService.get_event_balance(db, event_id)
+    start_date = event.start_date
+
+    def rows(stream_db: Session):
+        is_individual = Participant.family_id.is_(None)
+        statement = select(
+            Participant.last_name,
+            Participant.first_name,
+            Participant.birth_date,
+            Participant.gender,
+            Participant.email,
+            Participant.phone,
+            Participant.address,
+            Role.display_name.label("role_name"),
+            Family.name.label("family_name"),
+            final_price_expression().label("final_price"),
+            BalanceLedger.total_paid,
+            BalanceLedger.outstanding
+        ).outerjoin(
+            Role, Role.id == Participant.role_id
+        ).outerjoin(
+            Family, Family.id == Participant.family_id
+        ).outerjoin(
+            BalanceLedger, _ledger_join(SCOPE_PARTICIPANT, Participant.id, event_id)
+        ).where(
             Participant.event_id == event_id,
             Participant.is_active == True
-        ).order_by(Participant.last_name, Participant.first_name).all()
-
-        # Workbook erstellen mit ExcelService
-        wb, ws = ExcelService.create_workbook("Teilnehmerliste")
+        ).order_by(
+            is_individual,
+            Family.name,
+            Family.id,
+            case((is_individual, Participant.last_name)),
+            case((is_individual, Participant.first_name)),
+            Participant.birth_date,
+            Participant.id
+        )
 
-        # Header-Zeile
-        headers = [
+        result = stream_db.execute(statement, execution_options={"stream_results": True, "yield_per": 500})
+        for row in result:
+            yield [
+                row.last_name,
+                row.first_name,
+                row.birth_date.strftime("%d.%m.%Y") if row.birth_date else "",
+                age_at(start_date, row.birth_date) if row.birth_date and start_date else "",
+                row.gender or "",
+                row.role_name or "",
+                row.family_name or "",
+                row.email or "",
+                row.phone or "",
+                f"{float(row.final_price or 0):.2f}",
+                f"{float(row.total_paid or 0):.2f}",
+                f"{float(row.outstanding or 0):.2f}",
+                row.address or ""
+            ]
+
+    filename = f"Teilnehmerliste_{event.name.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}.csv"
+
+    return csv_response(
+        filename,
+        [
             "Nachname", "Vorname", "Geburtsdatum", "Alter", "Geschlecht",
-            "Rolle", "Familie", "E-Mail", "Telefon", "Preis (€)",
-            "Bezahlt (€)", "Offen (€)", "Adresse"
-        ]
-
-        # Spaltenbreiten
-        column_widths = {
-            1: 15, 2: 15, 3: 15, 4: 8, 5: 12,
-            6: 15, 7: 20, 8: 25, 9: 15, 10: 12,
-            11: 12, 12: 12, 13: 30
-        }
+            "Rolle", "Familie", "E-Mail", "Telefon", "Preis",
+            "Bezahlt (inkl. Familienanteil)", "Offen", "Adresse"
+        ],
+        rows,
+        compress=gzip,
+        accept_encoding=request.headers.get("accept-encoding")
+    )
 
-        # Header-Formatierung mit ExcelService
-        ExcelService.apply_header_row(ws, headers, column_widths)
 
-        # Familien gruppieren
-        families = db.query(Family).filter(Family.event_id == event_id).order_by(Family.name).all()
+def _participants_excel_job(db: Session, context: JobContext, event_id: int):
+    """
+    Export-Job: alle aktiven Teilnehmer als Excel-Datei, gruppiert nach Familien
 
-        row_num = 2
-        family_fill = PatternFill(start_color="E7E6E6", end_color="E7E6E6", fill_type="solid")
+    Returns:
+        Tuple (Dateiname, Media-Type)
 
-        # Zuerst: Familien mit ihren Mitgliedern
-        for family in families:
-            family_participants = [p for p in all_participants if p.family_id == family.id]
+    Raises:
+        ValueError: Wenn das Event nicht existiert
+    """
+    # Event laden
+    event = db.query(Event).filter(Event.id == event_id).first()
+    if not event:
+        raise ValueError("Event nicht gefunden")
 
-            if not family_participants:
-                continue
+    # Alle aktiven Teilnehmer laden mit Eager Loading
+    all_participants = db.query(Participant).options(
+        joinedload(Participant.role),
+        joinedload(Participant.family),
+        joinedload(Participant.payments)
+    ).filter(
+        Participant.event_id == event_id,
+        Participant.is_active == True
+    ).order_by(Participant.last_name, Participant.first_name).all()
 
-            # Familie-Header-Zeile
-            ws.cell(row=row_num, column=1, value=f"Familie {family.name}").font = Font(bold=True, size=11)
-            for col in range(1, len(headers) + 1):
-                ws.cell(row=row_num, column=col).fill = family_fill
-            row_num += 1
+    # Header-Zeile
+    headers = [
+        "Nachname", "Vorname", "Geburtsdatum", "Alter", "Geschlecht",
+        "Rolle", "Familie", "E-Mail", "Telefon", "Preis (€)",
+        "Bezahlt (€)", "Offen (€)", "Adresse"
+    ]
 
-            # Familienmitglieder
-            for participant in sorted(family_participants, key=lambda p: p.birth_date):
-                _write_participant_row(ws, row_num, participant, event, db)
-                row_num += 1
+    # Spaltenbreiten
+    column_widths = {
+        1: 15, 2: 15, 3: 15, 4: 8, 5: 12,
+        6: 15, 7: 20, 8: 25, 9: 15, 10: 12,
+        11: 12, 12: 12, 13: 30
+    }
 
-        # Dann: Einzelpersonen ohne Familie
-        individual_participants = [p for p in all_participants if p.family_id is None]
+    # Write-only Workbook (Zeilen werden direkt serialisiert, Styles als Named Styles)
+    workbook = StreamingWorkbook()
+    ws = workbook.create_sheet("Teilnehmerliste", column_widths)
+    workbook.append_header(ws, headers)
 
-        if individual_participants:
-            # Leerzeile
-            row_num += 1
+    # Familien gruppieren
+    families = db.query(Family).filter(Family.event_id == event_id).order_by(Family.name).all()
+    participants_by_family = defaultdict(list)
+    for participant in all_participants:
+        participants_by_family[participant.family_id].append(participant)
 
-            # Einzelpersonen-Header
-            ws.cell(row=row_num, column=1, value="Einzelpersonen").font = Font(bold=True, size=11)
-            for col in range(1, len(headers) + 1):
-                ws.cell(row=row_num, column=col).fill = family_fill
-            row_num += 1
+    # Zahlungsverteilung (inkl. anteiliger Familienzahlungen) einmalig berechnen
+    allocation = PaymentAllocationService.for_event(db, event_id)
 
-            for participant in individual_participants:
-                _write_participant_row(ws, row_num, participant, event, db)
-                row_num += 1
+    # Zuerst: Familien mit ihren Mitgliedern
+    total = len(all_participants)
+    written = 0
+    for family in families:
+        family_participants = participants_by_family.get(family.id)
 
-        # Summarium am Ende
-        row_num += 1
-        summary_fill = PatternFill(start_color="D9E1F2", end_color="D9E1F2", fill_type="solid")
-        summary_font = Font(bold=True)
+        if not family_participants:
+            continue
 
-        ws.cell(row=row_num, column=1, value="GESAMT").font = summary_font
-        ws.cell(row=row_num, column=1).fill = summary_fill
+        # Familie-Header-Zeile
+        workbook.append_styled(ws, [f"Familie {family.name}"], "group", len(headers))
 
-        # Gesamtanzahl
-        ws.cell(row=row_num, column=7, value=f"{len(all_participants)} Teilnehmer").font = summary_font
-        ws.cell(row=row_num, column=7).fill = summary_fill
+        # Familienmitglieder
+        for participant in sorted(family_participants, key=lambda p: p.birth_date):
+            _write_participant_row(workbook, ws, participant, event, allocation)
 
-        # Gesamtpreise
-        # Konvertiere zu float um Decimal/float Typ-Konflikte zu vermeiden
-        total_price = float(sum((p.final_price for p in all_participants), 0))
-        total_paid = float(sum((sum((pay.amount for pay in p.payments), 0) for p in all_participants), 0))
-        total_outstanding = total_price - total_paid
+        written += len(family_participants)
+        context.progress(written, total)
 
-        ws.cell(row=row_num, column=10, value=total_price).font = summary_font
-        ws.cell(row=row_num, column=10).fill = summary_fill
-        ws.cell(row=row_num, column=10).number_format = '#,##0.00'
+    # Dann: Einzelpersonen ohne Familie
+    individual_participants = participants_by_family.get(None, [])
 
-        ws.cell(row=row_num, column=11, value=total_paid).font = summary_font
-        ws.cell(row=row_num, column=11).fill = summary_fill
-        ws.cell(row=row_num, column=11).number_format = '#,##0.00'
+    if individual_participants:
+        # Leerzeile
+        ws.append([])
 
-        ws.cell(row=row_num, column=12, value=total_outstanding).font = summary_font
-        ws.cell(row=row_num, column=12).fill = summary_fill
-        ws.cell(row=row_num, column=12).number_format = '#,##0.00'
+        # Einzelpersonen-Header
+        workbook.append_styled(ws, ["Einzelpersonen"], "group", len(headers))
 
-        # Excel in BytesIO speichern
-        excel_buffer = BytesIO()
-        wb.save(excel_buffer)
-        excel_buffer.seek(0)
+        for participant in individual_participants:
+            _write_participant_row(workbook, ws, participant, event, allocation)
 
-        # Dateiname mit Event-Name und Datum
-        filename = f"Teilnehmerliste_{event.name.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}.xlsx"
+    # Summarium am Ende
+    ws.append([])
 
-        return Response(
-            content=excel_buffer.getvalue(),
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={
-                "Content-Disposition": f'attachment; filename="{filename}"'
-            }
-        )
+    # Gesamtpreise
+    # Konvertiere zu float um Decimal/float Typ-Konflikte zu vermeiden
+    total_price = float(sum((p.final_price for p in all_participants), 0))
+    total_paid = float(sum((sum((pay.amount for pay in p.payments), 0) for p in all_participants), 0))
+    total_outstanding = total_price - total_paid
+
+    workbook.append(
+        ws,
+        ["GESAMT", None, None, None, None, None, f"{len(all_participants)} Teilnehmer",
+         None, None, total_price, total_paid, total_outstanding],
+        {1: "summary", 7: "summary", 10: "summary_money", 11: "summary_money", 12: "summary_money"}
+    )
 
-    except Exception as e:
-        logger.exception(f"Error exporting participants: {e}")
-        raise HTTPException(status_code=500, detail=f"Fehler beim Export: {str(e)}")
+    # Dateiname mit Event-Name und Datum
+    filename = f"Teilnehmerliste_{event.name.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}.xlsx"
+
+    with context.open_artifact() as artifact:
+        workbook.write_to(artifact)
+
+    return filename, XLSX_MEDIA_TYPE
 
 
-def _write_participant_row(ws: Worksheet, row_num: int, participant: Participant, event: Event, db: Session) -> None:
+def _write_participant_row(
+    workbook: StreamingWorkbook,
+    ws,
+    participant: Participant,
+    event: Event,
+    allocation: PaymentAllocation
+) -> None:
     """
-    Hilfsfunktion zum Schreiben einer Teilnehmer-Zeile in ein Excel-Worksheet.
+    Hilfsfunktion zum Schreiben einer Teilnehmer-Zeile in ein Write-only Worksheet.
 
     Args:
+        workbook: StreamingWorkbook (für die Named Styles)
         ws: Worksheet-Objekt
-        row_num: Zeilennummer
         participant: Teilnehmer-Objekt
         event: Event-Objekt
-        db: Datenbank-Session für Familienzahlungs-Berechnung
+        allocation: Vorberechnete Zahlungsverteilung des Events
     """
     # Alter berechnen
     age = event.start_date.year - participant.birth_date.year
     if (event.start_date.month, event.start_date.day) < (participant.birth_date.month, participant.birth_date.day):
         age -= 1
 
-    # Zahlungen berechnen
-    # Konvertiere zu float um Decimal/float Typ-Konflikte zu vermeiden
-    direct_payments = float(sum((payment.amount for payment in participant.payments), 0))
-
-    # Anteilige Familienzahlungen berechnen
-    family_payment_share = 0.0
-    if participant.family_id:
-        # Lade Familie mit Zahlungen und Teilnehmern
-        family = db.query(Family).filter(Family.id == participant.family_id).options(
-            joinedload(Family.payments),
-            joinedload(Family.participants).joinedload(Participant.payments)
-        ).first()
-
-        if family:
-            # Gesamtzahlungen der Familie
-            family_total_payments = float(sum((payment.amount for payment in family.payments), 0))
-
-            # Berechne für jedes Familienmitglied die direkten Zahlungen und offenen Beträge
-            family_members_outstanding = []
-            total_outstanding = 0.0
-
-            for member in family.participants:
-                member_direct_payments = float(sum((payment.amount for payment in member.payments), 0))
-                member_outstanding = max(0.0, float(member.final_price) - member_direct_payments)
-                family_members_outstanding.append({
-                    'participant_id': member.id,
-                    'outstanding': member_outstanding
-                })
-                total_outstanding += member_outstanding
-
-            # Verteile die Familienzahlung proportional auf die offenen Beträge
-            if total_outstanding > 0:
-                # Finde den aktuellen Teilnehmer in der Liste
-                for member_data in family_members_outstanding:
-                    if member_data['participant_id'] == participant.id:
-                        # Anteilige Verteilung basierend auf offenen Beträgen
-                        family_payment_share = (member_data['outstanding'] / total_outstanding) * family_total_payments
-                        break
-            elif family_total_payments > 0:
-                # Wenn alle Beträge bezahlt sind, aber noch Familienzahlungen da sind,
-                # verteile proportional nach Sollpreis
-                family_total_price = float(sum((p.final_price for p in family.participants), 0))
-                if family_total_price > 0:
-                    family_payment_share = (float(participant.final_price) / family_total_price) * family_total_payments
-
-    total_paid = direct_payments + family_payment_share
-    outstanding = float(participant.final_price) - total_paid
-
-    # Daten in Zellen schreiben
-    ws.cell(row=row_num, column=1, value=participant.last_name)
-    ws.cell(row=row_num, column=2, value=participant.first_name)
-    ws.cell(row=row_num, column=3, value=participant.birth_date.strftime("%d.%m.%Y"))
-    ws.cell(row=row_num, column=4, value=age)
-    ws.cell(row=row_num, column=5, value=participant.gender or "")
-    ws.cell(row=row_num, column=6, value=participant.role.display_name if participant.role else "")
-    ws.cell(row=row_num, column=7, value=participant.family.name if participant.family else "")
-    ws.cell(row=row_num, column=8, value=participant.email or "")
-    ws.cell(row=row_num, column=9, value=participant.phone or "")
-
-    # Preise mit Formatierung
-    price_cell = ws.cell(row=row_num, column=10, value=participant.final_price)
-    price_cell.number_format = '#,##0.00'
-
-    paid_cell = ws.cell(row=row_num, column=11, value=total_paid)
-    paid_cell.number_format = '#,##0.00'
-
-    outstanding_cell = ws.cell(row=row_num, column=12, value=outstanding)
-    outstanding_cell.number_format = '#,##0.00'
-
-    # Offener Betrag rot markieren wenn > 0
-    if outstanding > 0:
-        outstanding_cell.font = Font(color="FF0000", bold=True)
-
-    ws.cell(row=row_num, column=13, value=participant.address or "")
+    # Zahlungen inkl. anteiliger Familienzahlungen
+    balance = allocation.get_participant(participant.id)
+    total_paid = balance["total_paid"]
+    outstanding = balance["outstanding"]
+
+    workbook.append(ws, [
+        participant.last_name,
+        participant.first_name,
+        participant.birth_date.strftime("%d.%m.%Y"),
+        age,
+        participant.gender or "",
+        participant.role.display_name if participant.role else "",
+        participant.family.name if participant.family else "",
+        participant.email or "",
+        participant.phone or "",
+        participant.final_price,
+        total_paid,
+        outstanding,
+        participant.address or ""
+    ], {
+        10: "money",
+        11: "money",
+        # Offener Betrag rot markieren wenn > 0
+        12: "money_alert" if outstanding > 0 else "money"
+    })
 
 
-# ===== PARAMETRISIERTE ROUTES (müssen NACH den spezifischen Routes kommen) =====
-
 @router.get("/{participant_id}", response_class=HTMLResponse)
-async def view_participant(
+def view_participant(
     request: Request,
     participant_id: int,
     db: Session = Depends(get_db),
@@ -1481,53 +1316,10 @@ async def view_participant(
     if not participant:
         return RedirectResponse(url="/participants", status_code=303)
 
-    # Zahlungen des Teilnehmers
-    # Konvertiere zu float um Decimal/float Typ-Konflikte zu vermeiden
-    direct_payments = float(sum((payment.amount for payment in participant.payments), 0))
-
-    # Anteilige Familienzahlungen berechnen
-    family_payment_share = 0.0
-    if participant.family_id:
-        # Lade Familie mit Zahlungen und Teilnehmern
-        family = db.query(Family).filter(Family.id == participant.family_id).options(
-            joinedload(Family.payments),
-            joinedload(Family.participants).joinedload(Participant.payments)
-        ).first()
-
-        if family:
-            # Gesamtzahlungen der Familie
-            family_total_payments = float(sum((payment.amount for payment in family.payments), 0))
-
-            # Berechne für jedes Familienmitglied die direkten Zahlungen und offenen Beträge
-            family_members_outstanding = []
-            total_outstanding = 0.0
-
-            for member in family.participants:
-                member_direct_payments = float(sum((payment.amount for payment in member.payments), 0))
-                member_outstanding = max(0.0, float(member.final_price) - member_direct_payments)
-                family_members_outstanding.append({
-                    'participant_id': member.id,
-                    'outstanding': member_outstanding
-                })
-                total_outstanding += member_outstanding
-
-            # Verteile die Familienzahlung proportional auf die offenen Beträge
-            if total_outstanding > 0:
-                # Finde den aktuellen Teilnehmer in der Liste
-                for member_data in family_members_outstanding:
-                    if member_data['participant_id'] == participant.id:
-                        # Anteilige Verteilung basierend auf offenen Beträgen
-                        family_payment_share = (member_data['outstanding'] / total_outstanding) * family_total_payments
-                        break
-            elif family_total_payments > 0:
-                # Wenn alle Beträge bezahlt sind, aber noch Familienzahlungen da sind,
-                # verteile proportional nach Sollpreis
-                family_total_price = float(sum((p.final_price for p in family.participants), 0))
-                if family_total_price > 0:
-                    family_payment_share = (float(participant.final_price) / family_total_price) * family_total_payments
-
-    total_paid = direct_payments + family_payment_share
-    outstanding = float(participant.final_price) - total_paid
+    # Zahlungen des Teilnehmers inkl. anteiliger Familienzahlungen
+    balance = PaymentAllocationService.for_participant(db, participant)
+    total_paid = balance["total_paid"]
+    outstanding = balance["outstanding"]
 
     return templates.TemplateResponse(
         "participants/detail.html",
@@ -1542,7 +1334,7 @@ async def view_participant(
 
 
 @router.get("/{participant_id}/edit", response_class=HTMLResponse)
-async def edit_participant_form(
+def edit_participant_form(
     request: Request,
     participant_id: int,
     db: Session = Depends(get_db),
@@ -1579,7 +1371,7 @@ async def edit_participant_form(
 
 
 @router.post("/{participant_id}/edit", response_class=HTMLResponse)
-async def update_participant(
+def update_participant(
     request: Request,
     participant_id: int,
     db: Session = Depends(get_db),
@@ -1651,6 +1443,9 @@ async def update_participant(
             family_id=participant_data.family_id
         )
 
+        # Momentaufnahme für das Balance-Ledger (vor der Änderung)
+        old_snapshot = BalanceLedgerService.snapshot_participant(participant)
+
         # Teilnehmer aktualisieren (birth_date ist bereits ein date-Objekt)
         participant.first_name = participant_data.first_name
         participant.last_name = participant_data.last_name
@@ -1675,6 +1470,7 @@ async def update_participant(
         participant.family_id = participant_data.family_id
         participant.calculated_price = calculated_price
 
+        BalanceLedgerService.participant_changed(db, event_id, participant, old=old_snapshot)
         db.commit()
 
         # Prüfe Rollenüberschreitung für beide Rollen (alte und neue), falls geändert
@@ -1720,7 +1516,7 @@ async def update_participant(
 
 
 @router.post("/{participant_id}/delete")
-async def delete_participant(
+def delete_participant(
     request: Request,
     participant_id: int,
     db: Session = Depends(get_db),
@@ -1741,8 +1537,10 @@ async def delete_participant(
         participant_role_id = participant.role_id  # Speichere für Rollenüberschreitungs-Prüfung
 
         # Soft-Delete: Statt db.delete() markieren wir als gelöscht
+        old_snapshot = BalanceLedgerService.snapshot_participant(participant)
         participant.is_active = False
         participant.deleted_at = utcnow()
+        BalanceLedgerService.participant_changed(db, event_id, participant, old=old_snapshot)
         db.commit()
 
         # Prüfe Rollenüberschreitung (möglicherweise wurde sie durch Löschen behoben)
@@ -1760,12 +1558,18 @@ async def delete_participant(
         return RedirectResponse(url="/participants", status_code=303)
 
 @router.get("/{participant_id}/payment-qr", response_class=Response)
-async def generate_payment_qr_code(
+def generate_payment_qr_code(
     participant_id: int,
+    request: Request,
     db: Session = Depends(get_db),
     event_id: int = Depends(get_current_event_id)
 ):
-    """Generiert einen QR-Code für die Zahlung (SEPA EPC QR-Code)"""
+    """
+    Generiert einen QR-Code für die Zahlung (SEPA EPC QR-Code)
+
+    Der ETag ist der Hash des EPC-Payloads. Stimmt er mit If-None-Match überein,
+    wird 304 ohne Bild geliefert; das PNG selbst kommt aus dem QR-Code-Cache.
+    """
     # Teilnehmer laden
     participant = db.query(Participant).filter(
         Participant.id == participant_id,
@@ -1793,9 +1597,25 @@ async def generate_payment_qr_code(
     invoice_number = f"TN-{participant.id:06d}"
     purpose = f"{participant.event.name} - {participant.full_name} - Rechnungsnr: {invoice_number}"
 
-    # QR-Code generieren
-    qr_code_data = QRCodeService.generate_sepa_qr_code(
-        recipient_name=setting.organization_name or "Freizeit-Organisation",
+    recipient_name = setting.organization_name or "Freizeit-Organisation"
+
+    # ETag aus den Zahlungsdaten - unveränderter QR-Code muss nicht erneut übertragen werden.
+    # no-cache: der Browser fragt jedes Mal nach, damit nach einer Zahlung der neue Betrag erscheint
+    etag = '"' + QRCodeCache.key_for(QRCodeCache.build_epc_payload(
+        recipient_name, setting.bank_iban, outstanding, purpose, setting.bank_bic
+    )) + '"'
+    cache_headers = {
+        "ETag": etag,
+        "Cache-Control": "private, no-cache"
+    }
+
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=cache_headers)
+
+    # QR-Code generieren (aus dem Cache, falls bereits erzeugt)
+    qr_code_data = qr_code_cache.generate_sepa_qr_code(
+        recipient_name=recipient_name,
         iban=setting.bank_iban,
         amount=outstanding,
         purpose=purpose,
@@ -1806,6 +1626,7 @@ async def generate_payment_qr_code(
         content=qr_code_data,
         media_type="image/png",
         headers={
-            "Content-Disposition": f"inline; filename=payment_qr_{participant_id}.png"
+            "Content-Disposition": f"inline; filename=payment_qr_{participant_id}.png",
+            **cache_headers
         }
     )
@@ -0,0 +1,266 @@
+"""Payment Allocation Service - Verteilung von Familienzahlungen auf Teilnehmer"""
+import logging
+from collections import defaultdict
+from typing import Dict, Any, Iterable, Optional, Tuple
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+
+class PaymentAllocation:
+    """
+    Ergebnis einer Zahlungsverteilung für ein Event (oder eine einzelne Familie)
+
+    Enthält für jeden Teilnehmer die direkten Zahlungen, den Anteil an den
+    Familienzahlungen sowie Gesamtzahlung und offenen Betrag, und für jede
+    Familie die aufsummierten Werte für den Familien-Tab.
+    """
+
+    def __init__(
+        self,
+        participant_balances: Dict[int, Dict[str, float]],
+        family_balances: Dict[int, Dict[str, Any]]
+    ):
+        self.participant_balances = participant_balances
+        self.family_balances = family_balances
+
+    def get_participant(self, participant_id: int) -> Dict[str, float]:
+        """
+        Liefert die Zahlungsinformationen eines Teilnehmers
+
+        Args:
+            participant_id: ID des Teilnehmers
+
+        Returns:
+            Dictionary mit direct_payments, family_share, total_paid, outstanding
+        """
+        return self.participant_balances.get(participant_id, {
+            "direct_payments": 0.0,
+            "family_share": 0.0,
+            "total_paid": 0.0,
+            "outstanding": 0.0
+        })
+
+    def get_family(self, family_id: int) -> Dict[str, Any]:
+        """
+        Liefert die Zahlungsinformationen einer Familie
+
+        Args:
+            family_id: ID der Familie
+
+        Returns:
+            Dictionary mit participant_count, total_price, family_payments,
+            member_payments, total_paid, outstanding
+        """
+        return self.family_balances.get(family_id, {
+            "participant_count": 0,
+            "total_price": 0.0,
+            "family_payments": 0.0,
+            "member_payments": 0.0,
+            "total_paid": 0.0,
+            "outstanding": 0.0
+        })
+
+
+class PaymentAllocationService:
+    """
+    Service für die Verteilung von Familienzahlungen auf die Familienmitglieder
+
+    Familienzahlungen werden proportional zu den offenen Beträgen der Mitglieder
+    verteilt. Sind alle Mitglieder bereits durch direkte Zahlungen bezahlt, wird
+    nach Sollpreis verteilt. Alle Daten werden mit einer konstanten Anzahl an
+    Queries geladen und in einem Durchlauf berechnet.
+    """
+
+    @staticmethod
+    def allocate(
+        participants: Iterable,
+        participant_payments: Dict[int, float],
+        family_payments: Dict[int, float]
+    ) -> PaymentAllocation:
+        """
+        Berechnet die Zahlungsverteilung für bereits geladene Teilnehmer
+
+        Args:
+            participants: Teilnehmer-Objekte (benötigt id, family_id, final_price)
+            participant_payments: Summe der direkten Zahlungen je Teilnehmer-ID
+            family_payments: Summe der Familienzahlungen je Familien-ID
+
+        Returns:
+            PaymentAllocation mit Teilnehmer- und Familiensalden
+        """
+        # Teilnehmer nach Familie gruppieren (Reihenfolge bleibt erhalten)
+        members_by_family = defaultdict(list)
+        participant_balances = {}
+
+        for participant in participants:
+            final_price = float(participant.final_price)
+            direct_payments = participant_payments.get(participant.id, 0.0)
+
+            participant_balances[participant.id] = {
+                "direct_payments": direct_payments,
+                "family_share": 0.0,
+                "total_paid": direct_payments,
+                "outstanding": final_price - direct_payments
+            }
+
+            if participant.family_id:
+                members_by_family[participant.family_id].append((participant.id, final_price, direct_payments))
+
+        family_balances = {}
+        for family_id, members in members_by_family.items():
+            family_total_payments = family_payments.get(family_id, 0.0)
+
+            # Offene Beträge aller Mitglieder (nur direkte Zahlungen berücksichtigt)
+            total_outstanding = 0.0
+            member_outstanding = {}
+            for member_id, final_price, direct_payments in members:
+                member_outstanding[member_id] = max(0.0, final_price - direct_payments)
+                total_outstanding += member_outstanding[member_id]
+
+            family_total_price = float(sum((final_price for _, final_price, _ in members), 0))
+
+            for member_id, final_price, direct_payments in members:
+                family_payment_share = 0.0
+                if total_outstanding > 0:
+                    # Anteilige Verteilung basierend auf offenen Beträgen
+                    family_payment_share = (member_outstanding[member_id] / total_outstanding) * family_total_payments
+                elif family_total_payments > 0 and family_total_price > 0:
+                    # Alle Beträge bezahlt, aber Familienzahlungen vorhanden -> nach Sollpreis verteilen
+                    family_payment_share = (final_price / family_total_price) * family_total_payments
+
+                total_paid = direct_payments + family_payment_share
+                participant_balances[member_id].update({
+                    "family_share": family_payment_share,
+                    "total_paid": total_paid,
+                    "outstanding": final_price - total_paid
+                })
+
+            # Familiensalden: Familienzahlungen + Zahlungen an einzelne Mitglieder
+            member_payments = float(sum((direct for _, _, direct in members), 0))
+            total_paid = family_total_payments + member_payments
+            family_balances[family_id] = {
+                "participant_count": len(members),
+                "total_price": family_total_price,
+                "family_payments": family_total_payments,
+                "member_payments": member_payments,
+                "total_paid": total_paid,
+                "outstanding": family_total_price - total_paid
+            }
+
+        return PaymentAllocation(participant_balances, family_balances)
+
+    @staticmethod
+    def _load_payment_sums(
+        db: Session,
+        participant_ids_query,
+        family_ids_query
+    ) -> Tuple[Dict[int, float], Dict[int, float]]:
+        """
+        Lädt alle relevanten Zahlungen in einer Query und summiert sie je Teilnehmer und Familie
+
+        Args:
+            db: Datenbank-Session
+            participant_ids_query: Subquery mit den relevanten Teilnehmer-IDs
+            family_ids_query: Subquery mit den relevanten Familien-IDs
+
+        Returns:
+            Tuple (Zahlungen je Teilnehmer-ID, Zahlungen je Familien-ID)
+        """
+        from app.models import Payment
+
+        rows = db.query(Payment.participant_id, Payment.family_id, Payment.amount).filter(
+            or_(
+                Payment.participant_id.in_(participant_ids_query),
+                Payment.family_id.in_(family_ids_query)
+            )
+        ).all()
+
+        participant_sums = defaultdict(int)
+        family_sums = defaultdict(int)
+        for participant_id, family_id, amount in rows:
+            if participant_id is not None:
+                participant_sums[participant_id] += amount
+            if family_id is not None:
+                family_sums[family_id] += amount
+
+        # Konvertiere zu float um Decimal/float Typ-Konflikte zu vermeiden
+        return (
+            {key: float(value) for key, value in participant_sums.items()},
+            {key: float(value) for key, value in family_sums.items()}
+        )
+
+    @staticmethod
+    def for_event(db: Session, event_id: int) -> PaymentAllocation:
+        """
+        Berechnet die Zahlungsverteilung für alle Teilnehmer und Familien eines Events
+
+        Args:
+            db: Datenbank-Session
+            event_id: ID des Events
+
+        Returns:
+            PaymentAllocation für das gesamte Event
+        """
+        from app.models import Participant, Family
+
+        participants = db.query(Participant).filter(Participant.event_id == event_id).all()
+
+        participant_sums, family_sums = PaymentAllocationService._load_payment_sums(
+            db,
+            db.query(Participant.id).filter(Participant.event_id == event_id),
+            db.query(Family.id).filter(Family.event_id == event_id)
+        )
+
+        return PaymentAllocationService.allocate(participants, participant_sums, family_sums)
+
+    @staticmethod
+    def for_family(db: Session, family_id: Optional[int]) -> PaymentAllocation:
+        """
+        Berechnet die Zahlungsverteilung für die Mitglieder einer einzelnen Familie
+
+        Args:
+            db: Datenbank-Session
+            family_id: ID der Familie
+
+        Returns:
+            PaymentAllocation für die Familie (leer, falls keine Familie)
+        """
+        from app.models import Participant
+
+        if not family_id:
+            return PaymentAllocation({}, {})
+
+        members = db.query(Participant).filter(Participant.family_id == family_id).all()
+
+        participant_sums, family_sums = PaymentAllocationService._load_payment_sums(
+            db,
+            db.query(Participant.id).filter(Participant.family_id == family_id),
+            [family_id]
+        )
+
+        return PaymentAllocationService.allocate(members, participant_sums, family_sums)
+
+    @staticmethod
+    def for_participant(db: Session, participant) -> Dict[str, float]:
+        """
+        Berechnet Gesamtzahlung und offenen Betrag eines einzelnen Teilnehmers
+
+        Args:
+            db: Datenbank-Session
+            participant: Participant-Objekt
+
+        Returns:
+            Dictionary mit direct_payments, family_share, total_paid, outstanding
+        """
+        if participant.family_id:
+            allocation = PaymentAllocationService.for_family(db, participant.family_id)
+        else:
+            allocation = PaymentAllocationService.allocate(
+                [participant],
+                {participant.id: float(sum((payment.amount for payment in participant.payments), 0))},
+                {}
+            )
+
+        return allocation.get_participant(participant.id)
@@ -0,0 +1,194 @@
+"""Payment Rollup Service - Tagessummen der Zahlungen pro Event, gepflegt von SQLite-Triggern"""
+import logging
+import threading
+from typing import Dict, List, Tuple
+
+from sqlalchemy import select, func, table, column, text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Tabelle mit einer Zeile pro Event und Zahlungstag
+PAYMENT_ROLLUP_TABLE = "payment_daily_totals"
+
+payment_daily_totals = table(
+    PAYMENT_ROLLUP_TABLE,
+    column("event_id"),
+    column("day"),
+    column("amount"),
+    column("payment_count")
+)
+
+
+class PaymentRollupService:
+    """
+    Zahlungsverlauf aus Tagessummen
+
+    Trigger auf der Zahlungstabelle führen die Tagessummen bei INSERT,
+    UPDATE (Betrag, Datum, Event) und DELETE nach; neue Tage werden angehängt,
+    Tage ohne Zahlungen entfernt. Der kumulative Verlauf wird per
+    SUM() OVER (ORDER BY day) aus den Tagessummen gelesen, statt bei jedem
+    Aufruf alle Zahlungen zu gruppieren.
+
+    Ohne SQLite (oder ohne Trigger) läuft dieselbe Fensterfunktion direkt
+    über die Zahlungen.
+    """
+
+    _lock = threading.Lock()
+    _ready: Dict[str, bool] = {}
+
+    @staticmethod
+    def _apply_sql(row: str, sign: str) -> str:
+        """Addiert (sign "+") oder subtrahiert (sign "-") die Zahlung row (NEW/OLD) in ihrer Tagessumme"""
+        day = f"date({row}.payment_date)"
+        statements = []
+        if sign == "+":
+            statements.append(
+                f"INSERT OR IGNORE INTO {PAYMENT_ROLLUP_TABLE} (event_id, day, amount, payment_count) "
+                f"SELECT {row}.event_id, {day}, 0, 0 "
+                f"WHERE {row}.event_id IS NOT NULL AND {row}.payment_date IS NOT NULL;"
+            )
+        statements.append(
+            f"UPDATE {PAYMENT_ROLLUP_TABLE} SET amount = amount {sign} coalesce({row}.amount, 0), "
+            f"payment_count = payment_count {sign} 1 "
+            f"WHERE event_id = {row}.event_id AND day = {day};"
+        )
+        if sign == "-":
+            statements.append(
+                f"DELETE FROM {PAYMENT_ROLLUP_TABLE} "
+                f"WHERE event_id = {row}.event_id AND day = {day} AND payment_count <= 0;"
+            )
+        return " ".join(statements)
+
+    @staticmethod
+    def _ddl_statements() -> list:
+        """CREATE-Statements für Tagessummen-Tabelle und Trigger"""
+        from app.models import Payment
+
+        payments = Payment.__tablename__
+        add_new = PaymentRollupService._apply_sql("NEW", "+")
+        remove_old = PaymentRollupService._apply_sql("OLD", "-")
+
+        return [
+            f"CREATE TABLE IF NOT EXISTS {PAYMENT_ROLLUP_TABLE} ("
+            f"event_id INTEGER NOT NULL, day TEXT NOT NULL, "
+            f"amount NUMERIC NOT NULL DEFAULT 0, payment_count INTEGER NOT NULL DEFAULT 0, "
+            f"PRIMARY KEY (event_id, day))",
+            f"CREATE TRIGGER IF NOT EXISTS {PAYMENT_ROLLUP_TABLE}_ai AFTER INSERT ON {payments} "
+            f"BEGIN {add_new} END",
+            f"CREATE TRIGGER IF NOT EXISTS {PAYMENT_ROLLUP_TABLE}_au "
+            f"AFTER UPDATE OF event_id, payment_date, amount ON {payments} "
+            f"BEGIN {remove_old} {add_new} END",
+            f"CREATE TRIGGER IF NOT EXISTS {PAYMENT_ROLLUP_TABLE}_ad AFTER DELETE ON {payments} "
+            f"BEGIN {remove_old} END"
+        ]
+
+    @staticmethod
+    def ensure(db: Session) -> bool:
+        """
+        Legt Tagessummen und Trigger bei Bedarf an und befüllt sie einmalig
+
+        Args:
+            db: Datenbank-Session
+
+        Returns:
+            True, wenn die Tagessummen verwendet werden können
+        """
+        engine = db.get_bind()
+        key = str(engine.url)
+        ready = PaymentRollupService._ready.get(key)
+        if ready is not None:
+            return ready
+
+        with PaymentRollupService._lock:
+            if key in PaymentRollupService._ready:
+                return PaymentRollupService._ready[key]
+
+            if engine.dialect.name != "sqlite":
+                PaymentRollupService._ready[key] = False
+                return False
+
+            try:
+                with engine.begin() as conn:
+                    exists = conn.execute(
+                        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                        {"name": PAYMENT_ROLLUP_TABLE}
+                    ).first()
+                    for statement in PaymentRollupService._ddl_statements():
+                        conn.execute(text(statement))
+                    if not exists:
+                        PaymentRollupService._populate(conn)
+                PaymentRollupService._ready[key] = True
+            except Exception as e:
+                logger.warning(f"Payment rollup unavailable, falling back to payment scan: {e}")
+                PaymentRollupService._ready[key] = False
+
+        return PaymentRollupService._ready[key]
+
+    @staticmethod
+    def _populate(conn) -> None:
+        """Befüllt die Tagessummen vollständig aus den Zahlungen"""
+        from app.models import Payment
+
+        conn.execute(text(f"DELETE FROM {PAYMENT_ROLLUP_TABLE}"))
+        conn.execute(text(
+            f"INSERT INTO {PAYMENT_ROLLUP_TABLE} (event_id, day, amount, payment_count) "
+            f"SELECT event_id, date(payment_date), coalesce(sum(amount), 0), count(*) "
+            f"FROM {Payment.__tablename__} "
+            f"WHERE event_id IS NOT NULL AND payment_date IS NOT NULL "
+            f"GROUP BY event_id, date(payment_date)"
+        ))
+        logger.info("Payment rollup populated")
+
+    @staticmethod
+    def rebuild(db: Session) -> None:
+        """
+        Baut die Tagessummen vollständig neu auf (z.B. nach Restore eines Backups)
+
+        Args:
+            db: Datenbank-Session
+        """
+        if not PaymentRollupService.ensure(db):
+            return
+        with db.get_bind().begin() as conn:
+            PaymentRollupService._populate(conn)
+
+    @staticmethod
+    def invalidate() -> None:
+        """Erzwingt eine erneute Prüfung von Tabelle und Triggern beim nächsten Zugriff"""
+        with PaymentRollupService._lock:
+            PaymentRollupService._ready.clear()
+
+    @staticmethod
+    def cumulative_timeline(db: Session, event_id: int) -> List[Tuple[str, float]]:
+        """
+        Kumulativer Zahlungsverlauf eines Events
+
+        Args:
+            db: Datenbank-Session
+            event_id: ID des Events
+
+        Returns:
+            Liste (Tag als ISO-Datum, kumulierte Summe bis einschließlich dieses Tages)
+        """
+        if PaymentRollupService.ensure(db):
+            day = payment_daily_totals.c.day
+            statement = select(
+                day,
+                func.sum(payment_daily_totals.c.amount).over(order_by=day).label("cumulative")
+            ).where(
+                payment_daily_totals.c.event_id == event_id
+            ).order_by(day)
+        else:
+            from app.models import Payment
+
+            day = func.date(Payment.payment_date)
+            statement = select(
+                day.label("day"),
+                func.sum(func.sum(Payment.amount)).over(order_by=day).label("cumulative")
+            ).where(
+                Payment.event_id == event_id,
+                Payment.payment_date.isnot(None)
+            ).group_by(day).order_by(day)
+
+        return [(str(row.day), round(float(row.cumulative or 0), 2)) for row in db.execute(statement)]
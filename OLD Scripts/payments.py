@@ -2,18 +2,22 @@
 import logging
 import zipfile
 from fastapi import APIRouter, Request, Depends, Form, HTTPException
-from fastapi.responses import HTMLResponse, RedirectResponse, Response
+from fastapi.responses import HTMLResponse, RedirectResponse, Response, JSONResponse
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError, DataError
 from datetime import date, datetime
 from typing import Optional
-from io import BytesIO
+from collections import deque
 from pydantic import ValidationError
 
 from app.database import get_db
 from app.models import Payment, Participant, Family
 from app.dependencies import get_current_event_id
-from app.services.invoice_generator import InvoiceGenerator
+from app.services.invoice_generator import (
+    InvoiceGenerator, INVOICE_RENDER_WORKERS, get_invoice_render_pool, render_invoice_job, invoice_cache
+)
+from app.services.balance_ledger import BalanceLedgerService
+from app.services.export_jobs import export_jobs, JobContext
 from app.utils.error_handler import handle_db_exception
 from app.utils.flash import flash
 from app.schemas import PaymentCreateSchema, PaymentUpdateSchema
@@ -25,7 +29,7 @@ router = APIRouter(prefix="/payments", tags=["payments"])
 
 
 @router.get("/", response_class=HTMLResponse)
-async def list_payments(
+def list_payments(
     request: Request,
     db: Session = Depends(get_db),
     event_id: int = Depends(get_current_event_id),
@@ -59,7 +63,7 @@ async def list_payments(
 
 
 @router.get("/create", response_class=HTMLResponse)
-async def create_payment_form(
+def create_payment_form(
     request: Request,
     db: Session = Depends(get_db),
     event_id: int = Depends(get_current_event_id),
@@ -84,7 +88,7 @@ async def create_payment_form(
 
 
 @router.post("/create", response_class=HTMLResponse)
-async def create_payment(
+def create_payment(
     request: Request,
     db: Session = Depends(get_db),
     event_id: int = Depends(get_current_event_id),
@@ -128,6 +132,7 @@ async def create_payment(
         )
 
         db.add(payment)
+        BalanceLedgerService.payment_changed(db, event_id, new=BalanceLedgerService.snapshot_payment(payment))
         db.commit()
         db.refresh(payment)
 
@@ -172,7 +177,7 @@ async def create_payment(
 
 
 @router.get("/{payment_id}/edit", response_class=HTMLResponse)
-async def edit_payment_form(
+def edit_payment_form(
     payment_id: int,
     request: Request,
     db: Session = Depends(get_db),
@@ -202,7 +207,7 @@ async def edit_payment_form(
 
 
 @router.post("/{payment_id}/edit", response_class=HTMLResponse)
-async def update_payment(
+def update_payment(
     payment_id: int,
     request: Request,
     db: Session = Depends(get_db),
@@ -240,6 +245,7 @@ async def update_payment(
         )
 
         # Zahlung aktualisieren
+        old_snapshot = BalanceLedgerService.snapshot_payment(payment)
         payment.amount = payment_data.amount
         payment.payment_date = payment_data.payment_date
         payment.payment_method = payment_data.payment_method
@@ -248,6 +254,9 @@ async def update_payment(
         payment.participant_id = payment_data.participant_id
         payment.family_id = payment_data.family_id
 
+        BalanceLedgerService.payment_changed(
+            db, event_id, old=old_snapshot, new=BalanceLedgerService.snapshot_payment(payment)
+        )
         db.commit()
         db.refresh(payment)
 
@@ -284,7 +293,7 @@ async def update_payment(
 
 
 @router.post("/{payment_id}/delete")
-async def delete_payment(
+def delete_payment(
     request: Request,
     payment_id: int,
     db: Session = Depends(get_db),
@@ -298,8 +307,10 @@ async def delete_payment(
 
     try:
         payment_amount = payment.amount
+        old_snapshot = BalanceLedgerService.snapshot_payment(payment)
 
         db.delete(payment)
+        BalanceLedgerService.payment_changed(db, event_id, old=old_snapshot)
         db.commit()
         logger.info(f"Payment deleted: {payment_amount}€ (ID: {payment_id})")
 
@@ -318,7 +329,7 @@ async def delete_payment(
 
 
 @router.get("/invoice/participant/{participant_id}", response_class=Response)
-async def generate_participant_invoice(participant_id: int, db: Session = Depends(get_db)):
+def generate_participant_invoice(participant_id: int, db: Session = Depends(get_db)):
     """Generiert eine PDF-Rechnung für einen Teilnehmer oder seine Familie"""
     participant = db.query(Participant).filter(Participant.id == participant_id).first()
 
@@ -358,7 +369,7 @@ async def generate_participant_invoice(participant_id: int, db: Session = Depend
 
 
 @router.get("/invoice/family/{family_id}", response_class=Response)
-async def generate_family_invoice(family_id: int, db: Session = Depends(get_db)):
+def generate_family_invoice(family_id: int, db: Session = Depends(get_db)):
     """Generiert eine Sammelrechnung für eine Familie"""
     family = db.query(Family).filter(Family.id == family_id).first()
 
@@ -380,50 +391,93 @@ async def generate_family_invoice(family_id: int, db: Session = Depends(get_db))
     )
 
 
-@router.get("/invoice/bulk", response_class=Response)
-async def generate_bulk_invoices(db: Session = Depends(get_db), event_id: int = Depends(get_current_event_id)):
-    """Generiert alle Rechnungen als ZIP: erst Familien, dann Einzelpersonen ohne Familie"""
-    generator = InvoiceGenerator(db)
+@router.get("/invoice/bulk")
+def generate_bulk_invoices(
+    db: Session = Depends(get_db),
+    event_id: int = Depends(get_current_event_id)
+):
+    """
+    Startet den Export aller Rechnungen als ZIP: erst Familien, dann Einzelpersonen ohne Familie
+
+    Das ZIP wird als Hintergrund-Job erstellt; die Antwort leitet auf die
+    Statusseite mit Fortschritt und Download weiter.
+    """
+    job = export_jobs.submit(db, event_id, "invoices_zip", "Alle Rechnungen (ZIP)", _bulk_invoices_job)
+    return RedirectResponse(url=f"/jobs/{job.id}", status_code=303)
 
-    # ZIP im Speicher erstellen
-    zip_buffer = BytesIO()
-
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        # 1. Alle Familienrechnungen
-        families = db.query(Family).filter(Family.event_id == event_id).order_by(Family.name).all()
-
-        for family in families:
-            # Nur Familien mit Teilnehmern
-            if len(family.participants) > 0:
-                try:
-                    pdf_bytes = generator.generate_family_invoice(family)
-                    filename = f"Familien/Sammelrechnung_{family.name.replace(' ', '_').replace('/', '_')}.pdf"
-                    zip_file.writestr(filename, pdf_bytes)
-                except Exception as e:
-                    logger.error(f"Error generating invoice for family {family.id}: {e}")
-
-        # 2. Alle Einzelpersonen OHNE Familie
-        participants_without_family = db.query(Participant).filter(
-            Participant.event_id == event_id,
-            Participant.family_id == None,
-            Participant.is_active == True
-        ).order_by(Participant.last_name, Participant.first_name).all()
-
-        for participant in participants_without_family:
-            try:
-                pdf_bytes = generator.generate_participant_invoice(participant)
-                filename = f"Einzelpersonen/Rechnung_{participant.last_name}_{participant.first_name}.pdf"
+
+def _bulk_invoices_job(db: Session, context: JobContext, event_id: int):
+    """
+    Export-Job: rendert alle Rechnungen im Process-Pool und schreibt das ZIP
+
+    Die Daten werden einmalig geladen und als einfache Snapshots an den
+    Process-Pool übergeben, der die PDFs parallel rendert.
+
+    Returns:
+        Tuple (Dateiname, Media-Type)
+    """
+    generator = InvoiceGenerator(db)
+    render_jobs = generator.build_bulk_invoice_jobs(event_id)
+    total = len(render_jobs)
+
+    with context.open_artifact() as artifact, zipfile.ZipFile(artifact, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        for done, (filename, pdf_bytes, error) in enumerate(_render_invoices(render_jobs), start=1):
+            if error:
+                logger.error(f"Error generating invoice for {error}")
+            else:
                 zip_file.writestr(filename, pdf_bytes)
-            except Exception as e:
-                logger.error(f"Error generating invoice for participant {participant.id}: {e}")
+            context.progress(done, total, f"{done} von {total} Rechnungen")
 
-    # ZIP zurücksetzen und zurückgeben
-    zip_buffer.seek(0)
+    return "Alle_Rechnungen.zip", "application/zip"
 
-    return Response(
-        content=zip_buffer.getvalue(),
-        media_type="application/zip",
-        headers={
-            "Content-Disposition": f"attachment; filename=Alle_Rechnungen.zip"
-        }
-    )
+
+def _render_invoices(render_jobs):
+    """
+    Liefert die Rechnungen in Job-Reihenfolge: aus dem Rechnungs-Cache oder aus dem Process-Pool
+
+    Es sind höchstens so viele Jobs gleichzeitig in Arbeit wie der Pool Worker
+    hat, damit fertige PDFs nicht im Speicher auflaufen.
+
+    Yields:
+        Tuple (Dateiname, PDF-Bytes oder None, Fehlermeldung oder None)
+    """
+    pool = get_invoice_render_pool()
+    pending = deque()
+    job_iter = iter(render_jobs)
+
+    def submit_next() -> None:
+        job = next(job_iter, None)
+        if job is None:
+            return
+        cached = invoice_cache.get(job["cache_key"])
+        if cached is not None:
+            pending.append((job, None, cached))
+        else:
+            pending.append((job, pool.submit(render_invoice_job, job), None))
+
+    for _ in range(INVOICE_RENDER_WORKERS):
+        submit_next()
+
+    try:
+        while pending:
+            job, future, cached = pending.popleft()
+            submit_next()
+
+            if future is None:
+                yield job["filename"], cached, None
+                continue
+
+            filename, pdf_bytes, error = future.result()
+            if not error:
+                invoice_cache.put(job["cache_key"], pdf_bytes)
+            yield filename, pdf_bytes, error
+    finally:
+        for _, future, _ in pending:
+            if future is not None:
+                future.cancel()
+
+
+@router.get("/invoice/cache-stats")
+def invoice_cache_stats():
+    """Trefferquote und Größe des Rechnungs-Caches (für Monitoring)"""
+    return JSONResponse(invoice_cache.stats())
@@ -0,0 +1,137 @@
+"""PDF-Benchmark: Transaktionshistorie als eine Tabelle vs. seitenweise (sequentiell und parallel)
+
+Aufruf:
+    python -m app.services.pdf_benchmark --transactions 10000 --workers 4
+"""
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from io import BytesIO
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import cm
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
+
+from app.services.history_pdf import (
+    HistoryPdfRenderer, HISTORY_TABLE_HEADER, HISTORY_COLUMN_WIDTHS, HISTORY_TABLE_STYLE,
+    INCOME_COLOR, EXPENSE_COLOR, history_pdf_row, count_history_pages
+)
+
+BENCHMARK_HEADER = {
+    "event_name": "Benchmark",
+    "info_text": "Exportiert am: 01.01.2025 12:00<br/>",
+    "summary": [
+        ["Gesamt-Einnahmen:", "0.00 €"],
+        ["Gesamt-Ausgaben:", "0.00 €"],
+        ["Netto-Saldo:", "0.00 €"],
+        ["Anzahl Transaktionen:", "0"]
+    ],
+    "net_positive": True
+}
+
+GENERATED_AT = "01.01.2025 12:00:00"
+
+
+def _build_transactions(count: int, seed: int):
+    """Erzeugt zufällige Transaktionen im Format von TransactionQueryService"""
+    rng = random.Random(seed)
+    labels = {"payment": "Zahlungseingang", "income": "Sonstige Einnahme", "expense": "Ausgabe"}
+    start = date(2024, 1, 1)
+    balance = 0.0
+    transactions = []
+    for index in range(count):
+        kind = rng.choice(("payment", "payment", "income", "expense"))
+        amount = round(rng.uniform(5, 400), 2) * (-1 if kind == "expense" else 1)
+        balance += amount
+        transactions.append({
+            "type_label": labels[kind],
+            "amount": amount,
+            "transaction_date": start + timedelta(days=index * 365 // count),
+            "reference": f"REF-{index:06d}" if rng.random() < 0.7 else None,
+            "description": rng.choice((None, "Lebensmittel Einkauf", "Busfahrt zum Freizeitheim", "Material")),
+            "participant_name": rng.choice((None, "Anna Beispiel", "Max Mustermann")),
+            "family_name": rng.choice((None, None, "Familie Schmidt")),
+            "receipt_available": rng.random() < 0.5,
+            "running_balance": round(balance, 2)
+        })
+    return transactions
+
+
+def _render_single_table(rows) -> int:
+    """Bisheriges Verfahren: eine Tabelle über alle Transaktionen"""
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=A4,
+        topMargin=1.5*cm,
+        bottomMargin=2*cm,
+        leftMargin=1.5*cm,
+        rightMargin=1.5*cm
+    )
+    table = Table([HISTORY_TABLE_HEADER] + [cells for cells, _ in rows], colWidths=HISTORY_COLUMN_WIDTHS)
+    style = list(HISTORY_TABLE_STYLE)
+    for idx, (_, is_income) in enumerate(rows, start=1):
+        style.append(('TEXTCOLOR', (2, idx), (2, idx), INCOME_COLOR if is_income else EXPENSE_COLOR))
+    table.setStyle(TableStyle(style))
+
+    def add_page_number(canvas, doc):
+        canvas.setFont('Helvetica', 8)
+        canvas.setFillColor(colors.grey)
+        canvas.drawRightString(A4[0] - 1.5*cm, 1*cm, f"Seite {canvas.getPageNumber()} - Generiert am {GENERATED_AT}")
+
+    doc.build([table], onFirstPage=add_page_number, onLaterPages=add_page_number)
+    return doc.page
+
+
+def _render_paged(rows, pool=None, workers: int = 1) -> int:
+    """Neues Verfahren: Tabellen pro Seite, optional im Process-Pool"""
+    return HistoryPdfRenderer.render(
+        BytesIO(), BENCHMARK_HEADER, iter(rows), len(rows), GENERATED_AT, pool=pool, workers=workers
+    )
+
+
+def _time(func, repeat: int):
+    """Beste Laufzeit aus mehreren Durchläufen in Sekunden und das Ergebnis"""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transaktionshistorie als PDF: eine Tabelle vs. seitenweise")
+    parser.add_argument("--transactions", type=int, default=10000, help="Anzahl Transaktionen (Standard: 10000)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker-Prozesse (Standard: CPU-Kerne)")
+    parser.add_argument("--repeat", type=int, default=3, help="Anzahl Durchläufe, bester zählt (Standard: 3)")
+    parser.add_argument("--skip-single", action="store_true", help="Bisheriges Verfahren (eine Tabelle) auslassen")
+    parser.add_argument("--seed", type=int, default=42, help="Seed für die Testdaten")
+    args = parser.parse_args()
+
+    rows = [history_pdf_row(transaction) for transaction in _build_transactions(args.transactions, args.seed)]
+    print(f"Transaktionen: {args.transactions}, Seiten (seitenweise): {count_history_pages(len(rows))}, "
+          f"Worker: {args.workers}, Durchläufe: {args.repeat}")
+
+    variants = []
+    if not args.skip_single:
+        variants.append(("Eine Tabelle", lambda: _render_single_table(rows)))
+    variants.append(("Seitenweise", lambda: _render_paged(rows)))
+
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        # Worker einmal starten, damit der Prozessstart nicht mitgemessen wird
+        list(pool.map(abs, range(args.workers)))
+        variants.append((f"Parallel ({args.workers})", lambda: _render_paged(rows, pool, args.workers)))
+
+        for label, func in variants:
+            seconds, pages = _time(func, args.repeat)
+            print(f"{label:<14} {pages:5d} Seiten   {seconds:8.2f} s   {pages / seconds:8.1f} Seiten/s")
+
+
+if __name__ == "__main__":
+    main()
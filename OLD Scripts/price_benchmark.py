@@ -0,0 +1,112 @@
+"""Micro-Benchmark: PriceCalculator (lineare Suche) vs. kompiliertes Regelwerk (Alterstabelle)
+
+Aufruf:
+    python -m app.services.price_benchmark --participants 10000 --repeat 5
+"""
+import argparse
+import random
+import time
+from datetime import date
+from types import SimpleNamespace
+
+from app.services.price_calculator import PriceCalculator
+from app.services.ruleset_cache import CompiledRuleset
+
+# Entspricht rulesets/examples/familie_rabatt_2024.yaml
+BENCHMARK_RULESET = {
+    "age_groups": [
+        {"min_age": 0, "max_age": 2, "price": 0.0},
+        {"min_age": 3, "max_age": 12, "price": 150.0},
+        {"min_age": 13, "max_age": 17, "price": 195.0},
+        {"min_age": 18, "max_age": 99, "price": 230.0}
+    ],
+    "role_discounts": {
+        "Kinderstunde": {"discount_percent": 40, "max_count": 5, "subsidy_eligible": True},
+        "Küchenteam": {"discount_percent": 100, "max_count": 6, "subsidy_eligible": False}
+    },
+    "family_discount": {
+        "enabled": True,
+        "first_child_percent": 25,
+        "second_child_percent": 25,
+        "third_plus_child_percent": 25
+    }
+}
+
+
+def _build_participants(count: int, seed: int):
+    """Erzeugt zufällige Teilnehmerdaten (Alter, Rolle, Position in der Familie)"""
+    rng = random.Random(seed)
+    role_choices = [None] * 18 + ["kinderstunde", "KÜCHENTEAM"]
+    ages = [rng.randint(0, 80) for _ in range(count)]
+    role_names = [rng.choice(role_choices) for _ in range(count)]
+    positions = [rng.randint(1, 4) for _ in range(count)]
+    return ages, role_names, positions
+
+
+def _time(func, repeat: int) -> float:
+    """Beste Laufzeit aus mehreren Durchläufen in Sekunden"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Preisberechnung: PriceCalculator vs. kompiliertes Regelwerk")
+    parser.add_argument("--participants", type=int, default=10000, help="Anzahl Teilnehmer (Standard: 10000)")
+    parser.add_argument("--repeat", type=int, default=5, help="Anzahl Durchläufe, bester zählt (Standard: 5)")
+    parser.add_argument("--seed", type=int, default=42, help="Seed für die Testdaten")
+    args = parser.parse_args()
+
+    ages, role_names, positions = _build_participants(args.participants, args.seed)
+
+    compiled = CompiledRuleset(SimpleNamespace(
+        id=0,
+        name="Benchmark",
+        event_id=0,
+        valid_from=date.min,
+        valid_until=date.max,
+        **BENCHMARK_RULESET
+    ))
+
+    def old_base_prices():
+        return [PriceCalculator._get_base_price_by_age(age, BENCHMARK_RULESET["age_groups"]) for age in ages]
+
+    def new_base_prices():
+        return compiled.bulk_base_prices(ages)
+
+    def old_prices():
+        return [
+            PriceCalculator.calculate_participant_price(
+                age=age,
+                role_name=role_name,
+                ruleset_data=BENCHMARK_RULESET,
+                family_children_count=position
+            )
+            for age, role_name, position in zip(ages, role_names, positions)
+        ]
+
+    def new_prices():
+        return compiled.bulk_prices(ages, role_names, positions)
+
+    # Ergebnisse müssen identisch sein
+    if old_base_prices() != new_base_prices():
+        raise SystemExit("Basispreise weichen ab")
+    if old_prices() != new_prices():
+        raise SystemExit("Endpreise weichen ab")
+
+    print(f"Teilnehmer: {args.participants}, Durchläufe: {args.repeat}")
+    for label, old, new in (
+        ("Basispreis", old_base_prices, new_base_prices),
+        ("Endpreis", old_prices, new_prices)
+    ):
+        old_seconds = _time(old, args.repeat)
+        new_seconds = _time(new, args.repeat)
+        speedup = old_seconds / new_seconds if new_seconds else float("inf")
+        print(f"{label:<12} alt: {old_seconds * 1000:8.2f} ms   neu: {new_seconds * 1000:8.2f} ms   Faktor: {speedup:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""QR-Code Cache Service - Memoisierte SEPA-QR-Codes (LRU im Speicher, optional auf Festplatte)"""
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+from app.config import settings
+from app.services.qrcode_service import QRCodeService
+
+logger = logging.getLogger(__name__)
+
+
+class QRCodeCache:
+    """
+    Cache für SEPA-QR-Codes (EPC QR-Code)
+
+    Schlüssel ist der EPC-Payload (Empfänger, IBAN, BIC, Betrag, Verwendungszweck),
+    gleiche Zahlungsdaten liefern also immer dasselbe PNG. Erste Stufe ist ein
+    begrenzter LRU-Cache im Speicher, optional ergänzt durch ein Verzeichnis auf
+    der Festplatte, das auch von Worker-Prozessen geteilt wird. Das Verzeichnis
+    ist auf max_disk_bytes begrenzt; verdrängt wird nach Zugriffszeit (mtime)
+    wie im InvoiceCache.
+    """
+
+    def __init__(self, max_entries: int = 512, disk_dir: Optional[str] = None, max_disk_bytes: int = 20 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.max_disk_bytes = max_disk_bytes
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._disk_size_bytes = None
+        self._memory_hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._disk_evictions = 0
+
+    @staticmethod
+    def build_epc_payload(
+        recipient_name: str,
+        iban: str,
+        amount: float,
+        purpose: str,
+        bic: Optional[str] = None
+    ) -> str:
+        """
+        Erstellt den EPC-Payload (EPC069-12, Version 002) für eine SEPA-Überweisung
+
+        Args:
+            recipient_name: Name des Empfängers
+            iban: IBAN des Empfängers
+            amount: Betrag in Euro
+            purpose: Verwendungszweck
+            bic: Optionale BIC
+
+        Returns:
+            Payload-String
+        """
+        return "\n".join([
+            "BCD",
+            "002",
+            "1",
+            "SCT",
+            (bic or "").strip(),
+            (recipient_name or "").strip(),
+            (iban or "").replace(" ", "").upper(),
+            f"EUR{float(amount):.2f}",
+            "",
+            "",
+            (purpose or "").strip()
+        ])
+
+    @staticmethod
+    def key_for(payload: str) -> str:
+        """SHA-256 des Payloads (Cache-Schlüssel und ETag)"""
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / key[:2] / f"{key}.png"
+
+    def _remember(self, key: str, content: bytes) -> None:
+        with self._lock:
+            self._entries[key] = content
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _read_disk(self, key: str) -> Optional[bytes]:
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            content = path.read_bytes()
+            # Zugriffszeit aktualisieren (LRU)
+            os.utime(path, None)
+            return content
+        except OSError:
+            return None
+
+    def _ensure_disk_size(self) -> None:
+        """Ermittelt die aktuelle Größe des Verzeichnisses einmalig beim ersten Schreiben (Lock wird gehalten)"""
+        if self._disk_size_bytes is None:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            self._disk_size_bytes = sum(path.stat().st_size for path in self.disk_dir.glob("*/*.png"))
+
+    def _write_disk(self, key: str, content: bytes) -> None:
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            with self._disk_lock:
+                self._ensure_disk_size()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=str(path.parent), suffix=".tmp")
+            with os.fdopen(fd, "wb") as tmp_file:
+                tmp_file.write(content)
+            existed = path.exists()
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"QR code cache write failed for {key}: {e}")
+            return
+
+        with self._disk_lock:
+            if not existed:
+                self._disk_size_bytes += len(content)
+            if self._disk_size_bytes > self.max_disk_bytes:
+                self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        """Löscht die am längsten nicht verwendeten PNGs bis 90% von max_disk_bytes (Lock wird gehalten)"""
+        target = int(self.max_disk_bytes * 0.9)
+        entries = []
+        for path in self.disk_dir.glob("*/*.png"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        entries.sort()
+        size = sum(entry_size for _, entry_size, _ in entries)
+        for _, entry_size, path in entries:
+            if size <= target:
+                break
+            try:
+                path.unlink()
+                size -= entry_size
+                self._disk_evictions += 1
+            except OSError:
+                continue
+
+        self._disk_size_bytes = size
+        logger.debug(f"QR code cache evicted down to {size} bytes")
+
+    def generate_sepa_qr_code(
+        self,
+        recipient_name: str,
+        iban: str,
+        amount: float,
+        purpose: str,
+        bic: Optional[str] = None
+    ) -> bytes:
+        """
+        Liefert den SEPA-QR-Code als PNG (aus dem Cache oder über QRCodeService)
+
+        Args: wie QRCodeService.generate_sepa_qr_code
+
+        Returns:
+            PNG als bytes
+        """
+        key = self.key_for(self.build_epc_payload(recipient_name, iban, amount, purpose, bic))
+
+        with self._lock:
+            content = self._entries.get(key)
+            if content is not None:
+                self._entries.move_to_end(key)
+                self._memory_hits += 1
+                return content
+
+        content = self._read_disk(key)
+        if content is not None:
+            with self._lock:
+                self._disk_hits += 1
+            self._remember(key, content)
+            return content
+
+        content = QRCodeService.generate_sepa_qr_code(
+            recipient_name=recipient_name,
+            iban=iban,
+            amount=amount,
+            purpose=purpose,
+            bic=bic
+        )
+        with self._lock:
+            self._misses += 1
+        self._remember(key, content)
+        self._write_disk(key, content)
+        return content
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Zähler für das Monitoring
+
+        Returns:
+            Dictionary mit memory_hits, disk_hits, misses, entries, max_entries,
+            disk_evictions, disk_size_bytes, max_disk_bytes
+        """
+        with self._lock:
+            stats = {
+                "memory_hits": self._memory_hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries
+            }
+        with self._disk_lock:
+            stats.update({
+                "disk_evictions": self._disk_evictions,
+                "disk_size_bytes": self._disk_size_bytes,
+                "max_disk_bytes": self.max_disk_bytes
+            })
+        return stats
+
+
+# Prozessweiter Cache (Festplatten-Stufe wird auch von den Rechnungs-Workern genutzt)
+qr_code_cache = QRCodeCache(disk_dir=str(settings.base_dir / "cache" / "qrcodes"))
@@ -0,0 +1,324 @@
+"""Ruleset Cache Service - Kompilierte, unveränderliche Regelwerke pro Event"""
+import hashlib
+import json
+import logging
+import threading
+from datetime import date
+from types import MappingProxyType
+from typing import Dict, Any, Optional, Mapping, Iterable, List, Sequence
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Obergrenze für den Altersindex (höhere Alter werden linear gesucht)
+MAX_INDEXED_AGE = 130
+
+# Familienrabatte gelten nur für Kinder unter 18
+FAMILY_DISCOUNT_MAX_AGE = 17
+
+_NO_FAMILY_DISCOUNT = (0.0, 0.0, 0.0)
+
+
+def _freeze(value: Any) -> Any:
+    """Wandelt dicts/lists rekursiv in unveränderliche Strukturen um"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _thaw(value: Any) -> Any:
+    """Erzeugt veränderbare Kopien (z.B. für PriceCalculator, der dicts/lists erwartet)"""
+    if isinstance(value, Mapping):
+        return {key: _thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    return value
+
+
+class CompiledRuleset:
+    """
+    Unveränderliche, vorverarbeitete Kopie eines Regelwerks
+
+    - age_groups als Tupel, zusätzlich dichte Tabellen Alter -> Basispreis und
+      Alter -> Familienrabatt-Staffel (1. Kind, 2. Kind, 3.+ Kind) für O(1) Lookups
+    - role_discounts mit kleingeschriebenen Rollennamen (Groß-/Kleinschreibung egal)
+      und vorberechneten Rabatt-Prozentsätzen
+    - Keine ORM-Referenzen, kann daher prozessweit geteilt werden
+
+    Die Preislogik entspricht PriceCalculator.calculate_participant_price
+    (Rabatte werden nicht gestapelt, Rollenrabatt hat Vorrang vor Familienrabatt).
+    """
+
+    __slots__ = (
+        "id", "name", "event_id", "valid_from", "valid_until",
+        "age_groups", "role_discounts", "role_discounts_by_lower", "family_discount",
+        "_price_by_age", "_age_group_index_by_age", "_family_tiers_by_age",
+        "_role_percent_by_lower", "fingerprint"
+    )
+
+    def __init__(self, ruleset):
+        self.id = ruleset.id
+        self.name = ruleset.name
+        self.event_id = ruleset.event_id
+        self.valid_from = ruleset.valid_from
+        self.valid_until = ruleset.valid_until
+
+        self.age_groups = _freeze(list(ruleset.age_groups or []))
+        self.role_discounts = _freeze(dict(ruleset.role_discounts or {}))
+        self.family_discount = _freeze(dict(ruleset.family_discount or {}))
+
+        # Fingerprint über ID und Inhalt (z.B. für Cache-Schlüssel abhängiger Dokumente)
+        self.fingerprint = hashlib.sha1(json.dumps(
+            {
+                "id": self.id,
+                "age_groups": ruleset.age_groups or [],
+                "role_discounts": ruleset.role_discounts or {},
+                "family_discount": ruleset.family_discount or {}
+            },
+            sort_keys=True,
+            default=str
+        ).encode("utf-8")).hexdigest()
+
+        # Rollennamen kleingeschrieben indexieren (erster Treffer gewinnt, wie bei der linearen Suche)
+        by_lower = {}
+        for key, config in self.role_discounts.items():
+            by_lower.setdefault(key.lower(), config)
+        self.role_discounts_by_lower = MappingProxyType(by_lower)
+        self._role_percent_by_lower = MappingProxyType({
+            key: float(config.get("discount_percent", 0) or 0) if config else 0.0
+            for key, config in by_lower.items()
+        })
+
+        # Altersindex: für jedes Alter die erste passende Altersgruppe
+        price_by_age = []
+        group_index_by_age = []
+        for age in range(MAX_INDEXED_AGE + 1):
+            index = self._find_age_group_index(age)
+            group_index_by_age.append(index)
+            price_by_age.append(self._group_price(self.age_groups[index]) if index is not None else 0.0)
+        self._price_by_age = tuple(price_by_age)
+        self._age_group_index_by_age = tuple(group_index_by_age)
+
+        # Familienrabatt-Staffel je Alter (Erwachsene und deaktivierter Rabatt: 0%)
+        tiers = _NO_FAMILY_DISCOUNT
+        if self.family_discount.get("enabled", False):
+            tiers = (
+                float(self.family_discount.get("first_child_percent", 0) or 0),
+                float(self.family_discount.get("second_child_percent", 0) or 0),
+                float(self.family_discount.get("third_plus_child_percent", 0) or 0)
+            )
+        self._family_tiers_by_age = tuple(
+            tiers if age <= FAMILY_DISCOUNT_MAX_AGE else _NO_FAMILY_DISCOUNT
+            for age in range(MAX_INDEXED_AGE + 1)
+        )
+
+    def _find_age_group_index(self, age: int) -> Optional[int]:
+        for index, group in enumerate(self.age_groups):
+            if group.get("min_age", 0) <= age <= group.get("max_age", 999):
+                return index
+        return None
+
+    @staticmethod
+    def _group_price(group: Mapping[str, Any]) -> float:
+        # Neues Format: base_price, Legacy-Format: price
+        if "base_price" in group:
+            return float(group["base_price"])
+        return float(group.get("price", 0.0) or 0.0)
+
+    def is_valid_on(self, reference_date: Optional[date]) -> bool:
+        """Prüft ob das Regelwerk am Stichtag gültig ist"""
+        if reference_date is None:
+            return True
+        return self.valid_from <= reference_date <= self.valid_until
+
+    def get_age_group(self, age: int) -> Optional[Mapping[str, Any]]:
+        """Liefert die erste passende Altersgruppe für ein Alter"""
+        if 0 <= age <= MAX_INDEXED_AGE:
+            index = self._age_group_index_by_age[age]
+        else:
+            index = self._find_age_group_index(age)
+        return self.age_groups[index] if index is not None else None
+
+    def get_base_price(self, age: int) -> float:
+        """Basispreis für ein Alter (entspricht PriceCalculator._get_base_price_by_age)"""
+        if 0 <= age <= MAX_INDEXED_AGE:
+            return self._price_by_age[age]
+        group = self.get_age_group(age)
+        return self._group_price(group) if group is not None else 0.0
+
+    def get_role_config(self, role_name: Optional[str]) -> Optional[Mapping[str, Any]]:
+        """Rollenkonfiguration zu einem Rollennamen (Groß-/Kleinschreibung egal)"""
+        if not role_name:
+            return None
+        return self.role_discounts_by_lower.get(role_name.lower())
+
+    def get_role_discount_percent(self, role_name: Optional[str]) -> float:
+        """Rollenrabatt in Prozent (0.0 wenn keine Rolle oder kein Rabatt)"""
+        if not role_name:
+            return 0.0
+        return self._role_percent_by_lower.get(role_name.lower(), 0.0)
+
+    def get_family_discount_percent(self, age: int, child_position: int) -> float:
+        """Familienrabatt in Prozent (entspricht PriceCalculator._get_family_discount)"""
+        if age < 0:
+            tiers = self._family_tiers_by_age[0]
+        elif age <= MAX_INDEXED_AGE:
+            tiers = self._family_tiers_by_age[age]
+        else:
+            return 0.0
+        return tiers[0] if child_position == 1 else tiers[1] if child_position == 2 else tiers[2]
+
+    def calculate_price(self, age: int, role_name: Optional[str] = None, child_position: int = 1) -> float:
+        """
+        Berechnet den Preis eines Teilnehmers (ohne manuelle Rabatte/Preise)
+
+        Args:
+            age: Alter des Teilnehmers
+            role_name: Optionaler Rollenname
+            child_position: Position in der Familie (1=erstes Kind, 2=zweites, etc.)
+
+        Returns:
+            Berechneter Preis in Euro (gerundet)
+        """
+        return self.bulk_prices([age], [role_name], [child_position])[0]
+
+    def bulk_base_prices(self, ages: Iterable[int]) -> List[float]:
+        """
+        Basispreise für viele Alter in einem Durchlauf über die Alterstabelle
+
+        Args:
+            ages: Alter der Teilnehmer
+
+        Returns:
+            Basispreise in derselben Reihenfolge
+        """
+        table = self._price_by_age
+        last = MAX_INDEXED_AGE
+        return [table[age] if 0 <= age <= last else self.get_base_price(age) for age in ages]
+
+    def bulk_prices(
+        self,
+        ages: Sequence[int],
+        role_names: Sequence[Optional[str]],
+        child_positions: Sequence[int]
+    ) -> List[float]:
+        """
+        Berechnet die Preise vieler Teilnehmer in einem Durchlauf
+
+        Rabatte werden nicht gestapelt: Ein Rollenrabatt hat Vorrang, der
+        Familienrabatt wird nur ohne Rollenrabatt angewendet.
+
+        Args:
+            ages: Alter der Teilnehmer
+            role_names: Rollennamen (None für keine Rolle), gleiche Länge wie ages
+            child_positions: Positionen in der Familie, gleiche Länge wie ages
+
+        Returns:
+            Gerundete Preise in derselben Reihenfolge
+        """
+        base_prices = self.bulk_base_prices(ages)
+        role_percents = self._role_percent_by_lower
+        prices = []
+
+        for base_price, age, role_name, child_position in zip(base_prices, ages, role_names, child_positions):
+            discount_percent = role_percents.get(role_name.lower(), 0.0) if role_name else 0.0
+            if discount_percent <= 0:
+                discount_percent = self.get_family_discount_percent(age, child_position)
+            prices.append(round(base_price - base_price * (discount_percent / 100), 2))
+
+        return prices
+
+    def as_ruleset_data(self) -> Dict[str, Any]:
+        """Veränderbare Kopie im Format, das der PriceCalculator erwartet"""
+        return {
+            "age_groups": _thaw(self.age_groups),
+            "role_discounts": _thaw(self.role_discounts),
+            "family_discount": _thaw(self.family_discount)
+        }
+
+
+class RulesetCache:
+    """
+    Prozessweiter Cache des aktiven, kompilierten Regelwerks pro Event
+
+    Wird von allen Schreibpfaden für Regelwerke invalidiert (Import, Aktivieren/
+    Deaktivieren, Bearbeiten, Löschen, GitHub-Import bei Event-Erstellung).
+    Auch "kein aktives Regelwerk" wird gecacht.
+    """
+
+    _lock = threading.Lock()
+    _entries: Dict[int, Optional[CompiledRuleset]] = {}
+    _hits = 0
+    _misses = 0
+
+    @classmethod
+    def get_active(
+        cls,
+        db: Session,
+        event_id: int,
+        valid_on: Optional[date] = None
+    ) -> Optional[CompiledRuleset]:
+        """
+        Liefert das aktive Regelwerk eines Events (kompiliert, aus dem Cache)
+
+        Args:
+            db: Datenbank-Session (nur bei Cache-Miss verwendet)
+            event_id: ID des Events
+            valid_on: Optionaler Stichtag (z.B. Event-Start), an dem das Regelwerk gültig sein muss
+
+        Returns:
+            CompiledRuleset oder None
+        """
+        with cls._lock:
+            cached = event_id in cls._entries
+            if cached:
+                cls._hits += 1
+                compiled = cls._entries[event_id]
+
+        if not cached:
+            compiled = cls._load(db, event_id)
+
+        if compiled is None or not compiled.is_valid_on(valid_on):
+            return None
+        return compiled
+
+    @classmethod
+    def _load(cls, db: Session, event_id: int) -> Optional[CompiledRuleset]:
+        from app.models import Ruleset
+
+        ruleset = db.query(Ruleset).filter(
+            Ruleset.event_id == event_id,
+            Ruleset.is_active == True
+        ).first()
+
+        compiled = CompiledRuleset(ruleset) if ruleset else None
+
+        with cls._lock:
+            cls._misses += 1
+            cls._entries[event_id] = compiled
+
+        logger.debug(f"Ruleset cache miss for event {event_id}: {compiled.name if compiled else 'kein aktives Regelwerk'}")
+        return compiled
+
+    @classmethod
+    def invalidate(cls, event_id: Optional[int] = None) -> None:
+        """
+        Verwirft den Cache-Eintrag eines Events (oder alle Einträge)
+
+        Args:
+            event_id: ID des Events, None für alle Events
+        """
+        with cls._lock:
+            if event_id is None:
+                cls._entries.clear()
+            else:
+                cls._entries.pop(event_id, None)
+        logger.debug(f"Ruleset cache invalidated for event {event_id if event_id is not None else 'alle'}")
+
+    @classmethod
+    def stats(cls) -> Dict[str, int]:
+        """Cache-Statistik (Treffer, Fehlversuche, Einträge)"""
+        with cls._lock:
+            return {"hits": cls._hits, "misses": cls._misses, "entries": len(cls._entries)}
@@ -17,6 +17,8 @@ from app.services.ruleset_parser import RulesetParser
 from app.services.role_manager import RoleManager
 from app.services.ruleset_scanner import RulesetScanner
 from app.services.price_calculator import PriceCalculator
+from app.services.balance_ledger import BalanceLedgerService
+from app.services.ruleset_cache import RulesetCache
 from app.dependencies import get_current_event_id
 from app.utils.error_handler import handle_db_exception
 from app.utils.flash import flash
@@ -28,7 +30,7 @@ router = APIRouter(prefix="/rulesets", tags=["rulesets"])
 
 
 @router.get("/", response_class=HTMLResponse)
-async def list_rulesets(request: Request, db: Session = Depends(get_db), event_id: int = Depends(get_current_event_id)):
+def list_rulesets(request: Request, db: Session = Depends(get_db), event_id: int = Depends(get_current_event_id)):
     """Liste aller Regelwerke"""
     rulesets = db.query(Ruleset).filter(Ruleset.event_id == event_id).order_by(Ruleset.valid_from.desc()).all()
 
@@ -39,7 +41,7 @@ async def list_rulesets(request: Request, db: Session = Depends(get_db), event_i
 
 
 @router.get("/import", response_class=HTMLResponse)
-async def import_ruleset_form(
+def import_ruleset_form(
     request: Request,
     db: Session = Depends(get_db),
     event_id: int = Depends(get_current_event_id),
@@ -71,7 +73,7 @@ async def import_ruleset_form(
 
 
 @router.get("/import/scan", response_class=HTMLResponse)
-async def scan_rulesets_directory(
+def scan_rulesets_directory(
     request: Request,
     db: Session = Depends(get_db),
     event_id: int = Depends(get_current_event_id)
@@ -103,7 +105,7 @@ async def scan_rulesets_directory(
 
 
 @router.post("/import/from-file", response_class=HTMLResponse)
-async def import_ruleset_from_file(
+def import_ruleset_from_file(
     request: Request,
     db: Session = Depends(get_db),
     event_id: int = Depends(get_current_event_id),
@@ -164,6 +166,7 @@ async def import_ruleset_from_file(
         db.add(ruleset)
         db.commit()
         db.refresh(ruleset)
+        RulesetCache.invalidate(event_id)
 
         # Rollen automatisch aus role_discounts erstellen
         if data.get("role_discounts"):
@@ -182,7 +185,7 @@ async def import_ruleset_from_file(
 
 
 @router.post("/import/upload", response_class=HTMLResponse)
-async def import_ruleset_upload(
+def import_ruleset_upload(
     request: Request,
     db: Session = Depends(get_db),
     event_id: int = Depends(get_current_event_id),
@@ -196,7 +199,7 @@ async def import_ruleset_upload(
 
     try:
         # Datei-Inhalt lesen
-        content = await file.read()
+        content = file.file.read()
         yaml_string = content.decode('utf-8')
 
         # Bereinige YAML-String von Editor-Metadaten und unsichtbaren Zeichen
@@ -244,6 +247,7 @@ async def import_ruleset_upload(
         db.add(ruleset)
         db.commit()
         db.refresh(ruleset)
+        RulesetCache.invalidate(event_id)
 
         # Rollen automatisch aus role_discounts erstellen
         if data.get("role_discounts"):
@@ -263,7 +267,7 @@ async def import_ruleset_upload(
 
 
 @router.post("/import/github", response_class=HTMLResponse)
-async def import_ruleset_github(
+def import_ruleset_github(
     request: Request,
     db: Session = Depends(get_db),
     event_id: int = Depends(get_current_event_id),
@@ -338,8 +342,8 @@ async def import_ruleset_github(
             github_url = github_url.replace("github.com", "raw.githubusercontent.com").replace("/blob/", "/")
 
         # YAML-Datei von GitHub herunterladen
-        async with httpx.AsyncClient() as client:
-            response = await client.get(github_url, timeout=10.0)
+        with httpx.Client() as client:
+            response = client.get(github_url, timeout=10.0)
             response.raise_for_status()
             yaml_string = response.text
 
@@ -388,6 +392,7 @@ async def import_ruleset_github(
         db.add(ruleset)
         db.commit()
         db.refresh(ruleset)
+        RulesetCache.invalidate(event_id)
 
         # Rollen automatisch aus role_discounts erstellen
         if data.get("role_discounts"):
@@ -412,7 +417,7 @@ async def import_ruleset_github(
 
 
 @router.post("/import/manual", response_class=HTMLResponse)
-async def import_ruleset_manual(
+def import_ruleset_manual(
     request: Request,
     db: Session = Depends(get_db),
     event_id: int = Depends(get_current_event_id),
@@ -454,6 +459,7 @@ async def import_ruleset_manual(
         db.add(ruleset)
         db.commit()
         db.refresh(ruleset)
+        RulesetCache.invalidate(event_id)
 
         # Rollen automatisch aus role_discounts erstellen
         if data.get("role_discounts"):
@@ -473,7 +479,7 @@ async def import_ruleset_manual(
 
 
 @router.get("/{ruleset_id}", response_class=HTMLResponse)
-async def view_ruleset(
+def view_ruleset(
     request: Request,
     ruleset_id: int,
     db: Session = Depends(get_db),
@@ -501,7 +507,7 @@ async def view_ruleset(
 
 
 @router.get("/{ruleset_id}/export", response_class=Response)
-async def export_ruleset(
+def export_ruleset(
     ruleset_id: int,
     db: Session = Depends(get_db),
     event_id: int = Depends(get_current_event_id)
@@ -533,7 +539,7 @@ async def export_ruleset(
 
 
 @router.get("/{ruleset_id}/edit", response_class=HTMLResponse)
-async def edit_ruleset_form(
+def edit_ruleset_form(
     request: Request,
     ruleset_id: int,
     db: Session = Depends(get_db),
@@ -567,7 +573,7 @@ async def edit_ruleset_form(
 
 
 @router.post("/{ruleset_id}/edit", response_class=HTMLResponse)
-async def update_ruleset(
+def update_ruleset(
     request: Request,
     ruleset_id: int,
     db: Session = Depends(get_db),
@@ -607,6 +613,7 @@ async def update_ruleset(
         ruleset.family_discount = data.get("family_discount")
 
         db.commit()
+        RulesetCache.invalidate(event_id)
 
         flash(request, f"Regelwerk '{ruleset.name}' wurde erfolgreich aktualisiert", "success")
         return RedirectResponse(url=f"/rulesets/{ruleset_id}", status_code=303)
@@ -633,7 +640,7 @@ async def update_ruleset(
 
 
 @router.post("/{ruleset_id}/toggle")
-async def toggle_ruleset(
+def toggle_ruleset(
     request: Request,
     ruleset_id: int,
     db: Session = Depends(get_db),
@@ -677,6 +684,7 @@ async def toggle_ruleset(
             flash(request, f"Regelwerk '{ruleset.name}' deaktiviert", "info")
 
         db.commit()
+        RulesetCache.invalidate(event_id)
         logger.info(f"Successfully toggled ruleset {ruleset_id} to {new_status}")
 
         # Wenn ein Ruleset aktiviert wurde, alle Preise neu berechnen
@@ -684,6 +692,8 @@ async def toggle_ruleset(
             try:
                 logger.info(f"Recalculating all prices for event {event_id} after ruleset activation")
                 updated_count, skipped_count = PriceCalculator.recalculate_all_prices(db, event_id)
+                BalanceLedgerService.rebuild(db, event_id)
+                db.commit()
                 logger.info(f"Price recalculation completed: {updated_count} updated, {skipped_count} skipped")
 
                 # Flash-Message mit Info über deaktivierte Rulesets und Preisaktualisierung
@@ -709,7 +719,7 @@ async def toggle_ruleset(
 
 
 @router.post("/{ruleset_id}/delete")
-async def delete_ruleset(
+def delete_ruleset(
     ruleset_id: int,
     db: Session = Depends(get_db),
     event_id: int = Depends(get_current_event_id)
@@ -726,6 +736,7 @@ async def delete_ruleset(
     try:
         db.delete(ruleset)
         db.commit()
+        RulesetCache.invalidate(event_id)
         return RedirectResponse(url="/rulesets", status_code=303)
     except Exception as e:
         db.rollback()
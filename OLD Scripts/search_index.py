@@ -0,0 +1,329 @@
+"""Search Index Service - SQLite-FTS5-Volltextindex für Teilnehmer, Familien und Transaktionen"""
+import logging
+import threading
+from typing import Dict, Any, Sequence
+
+from sqlalchemy import select, or_, table, column, literal_column, text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Name der virtuellen FTS5-Tabelle
+SEARCH_INDEX_TABLE = "search_index"
+
+# Durchsuchbare Spalten (Bedeutung je nach Entität, siehe SearchIndexService._entities)
+SEARCH_COLUMNS = ("title", "details", "related")
+
+# Trigram-Tokenizer: ab 3 Zeichen über den Index, kürzere Begriffe per LIKE
+MIN_MATCH_LENGTH = 3
+
+# rowid = entity_id * ROWID_STRIDE + Code der Entität (O(log n) Updates/Deletes in den Triggern)
+ROWID_STRIDE = 8
+ENTITY_CODES = {
+    "participant": 1,
+    "family": 2,
+    "payment": 3,
+    "income": 4,
+    "expense": 5
+}
+
+search_index = table(
+    SEARCH_INDEX_TABLE,
+    column("entity"),
+    column("entity_id"),
+    column("event_id"),
+    *[column(name) for name in SEARCH_COLUMNS]
+)
+
+
+class SearchIndexService:
+    """
+    Volltextsuche über eine FTS5-Tabelle (Tokenizer "trigram")
+
+    Der Trigram-Tokenizer findet wie bisher ILIKE '%begriff%' beliebige
+    Teilstrings, nutzt dafür aber den Index statt eines Table-Scans. Der
+    Index wird von SQLite-Triggern auf den Quelltabellen gepflegt (auch bei
+    bulk_insert_mappings und Änderungen außerhalb der Router) und beim ersten
+    Zugriff einmalig aufgebaut.
+
+    Spalten je Entität:
+    - participant: title = Vor- und Nachname, details = E-Mail
+    - family: title = Name, details = Ansprechpartner
+    - payment: title = Referenz, details = Notizen, related = Teilnehmer- und Familienname
+    - income: title = Name, details = Beschreibung
+    - expense: title = Titel, details = Beschreibung, related = Bezahlt von, Belegnummer
+    """
+
+    _lock = threading.Lock()
+    _ready: Dict[str, bool] = {}
+
+    @staticmethod
+    def _entities() -> Dict[str, Dict[str, Any]]:
+        """Definition der indizierten Entitäten ({r} = Zeilen-Alias im SQL)"""
+        from app.models import Participant, Family, Payment, Income, Expense
+
+        participants = Participant.__tablename__
+        families = Family.__tablename__
+
+        return {
+            "participant": {
+                "model": Participant,
+                "title": "coalesce({r}.first_name, '') || ' ' || coalesce({r}.last_name, '')",
+                "details": "coalesce({r}.email, '')",
+                "related": "''",
+                "watch": ("first_name", "last_name", "email", "event_id"),
+                "fallback": {
+                    "title": (Participant.first_name, Participant.last_name),
+                    "details": (Participant.email,),
+                    "related": ()
+                }
+            },
+            "family": {
+                "model": Family,
+                "title": "coalesce({r}.name, '')",
+                "details": "coalesce({r}.contact_person, '')",
+                "related": "''",
+                "watch": ("name", "contact_person", "event_id"),
+                "fallback": {
+                    "title": (Family.name,),
+                    "details": (Family.contact_person,),
+                    "related": ()
+                }
+            },
+            "payment": {
+                "model": Payment,
+                "title": "coalesce({r}.reference, '')",
+                "details": "coalesce({r}.notes, '')",
+                "related": (
+                    f"coalesce((SELECT p.first_name || ' ' || p.last_name FROM {participants} AS p"
+                    f" WHERE p.id = {{r}}.participant_id), '') || ' ' || "
+                    f"coalesce((SELECT f.name FROM {families} AS f WHERE f.id = {{r}}.family_id), '')"
+                ),
+                "watch": None,
+                # Zahlungen enthalten Teilnehmer- und Familiennamen
+                "depends_on": {"participant": "participant_id", "family": "family_id"},
+                "fallback": {
+                    "title": (Payment.reference,),
+                    "details": (Payment.notes,),
+                    "related": ()
+                }
+            },
+            "income": {
+                "model": Income,
+                "title": "coalesce({r}.name, '')",
+                "details": "coalesce({r}.description, '')",
+                "related": "''",
+                "watch": None,
+                "fallback": {
+                    "title": (Income.name,),
+                    "details": (Income.description,),
+                    "related": ()
+                }
+            },
+            "expense": {
+                "model": Expense,
+                "title": "coalesce({r}.title, '')",
+                "details": "coalesce({r}.description, '')",
+                "related": "coalesce({r}.paid_by, '') || ' ' || coalesce({r}.receipt_number, '')",
+                "watch": None,
+                "fallback": {
+                    "title": (Expense.title,),
+                    "details": (Expense.description,),
+                    "related": (Expense.paid_by, Expense.receipt_number)
+                }
+            }
+        }
+
+    # ===== DDL =====
+
+    @staticmethod
+    def _row_select(entity: str, spec: Dict[str, Any], alias: str) -> str:
+        """SELECT-Liste für eine Indexzeile (alias = NEW oder Tabellen-Alias)"""
+        values = ", ".join(spec[name].format(r=alias) for name in SEARCH_COLUMNS)
+        return (
+            f"SELECT {alias}.id * {ROWID_STRIDE} + {ENTITY_CODES[entity]}, '{entity}', "
+            f"{alias}.id, {alias}.event_id, {values}"
+        )
+
+    @staticmethod
+    def _insert_prefix() -> str:
+        return (
+            f"INSERT INTO {SEARCH_INDEX_TABLE}(rowid, entity, entity_id, event_id, "
+            f"{', '.join(SEARCH_COLUMNS)}) "
+        )
+
+    @staticmethod
+    def _refresh_dependents_sql(entities: Dict[str, Dict[str, Any]], source: str) -> str:
+        """Trigger-Statements, die abhängige Einträge (z.B. Zahlungen eines Teilnehmers) neu schreiben"""
+        statements = []
+        for entity, spec in entities.items():
+            foreign_key = spec.get("depends_on", {}).get(source)
+            if not foreign_key:
+                continue
+            table_name = spec["model"].__tablename__
+            code = ENTITY_CODES[entity]
+            statements.append(
+                f"DELETE FROM {SEARCH_INDEX_TABLE} WHERE rowid IN "
+                f"(SELECT r.id * {ROWID_STRIDE} + {code} FROM {table_name} AS r WHERE r.{foreign_key} = NEW.id);"
+            )
+            statements.append(
+                SearchIndexService._insert_prefix()
+                + SearchIndexService._row_select(entity, spec, "r")
+                + f" FROM {table_name} AS r WHERE r.{foreign_key} = NEW.id;"
+            )
+        return " ".join(statements)
+
+    @staticmethod
+    def _ddl_statements() -> list:
+        """CREATE-Statements für FTS-Tabelle und Trigger"""
+        entities = SearchIndexService._entities()
+        statements = [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_INDEX_TABLE} USING fts5("
+            f"entity UNINDEXED, entity_id UNINDEXED, event_id UNINDEXED, "
+            f"{', '.join(SEARCH_COLUMNS)}, tokenize = 'trigram')"
+        ]
+
+        for entity, spec in entities.items():
+            table_name = spec["model"].__tablename__
+            code = ENTITY_CODES[entity]
+            insert_new = SearchIndexService._insert_prefix() + SearchIndexService._row_select(entity, spec, "NEW") + ";"
+            delete_old = f"DELETE FROM {SEARCH_INDEX_TABLE} WHERE rowid = OLD.id * {ROWID_STRIDE} + {code};"
+            update_of = f" OF {', '.join(spec['watch'])}" if spec["watch"] else ""
+            dependents = SearchIndexService._refresh_dependents_sql(entities, entity)
+
+            statements.append(
+                f"CREATE TRIGGER IF NOT EXISTS {SEARCH_INDEX_TABLE}_{entity}_ai AFTER INSERT ON {table_name} "
+                f"BEGIN {insert_new} END"
+            )
+            statements.append(
+                f"CREATE TRIGGER IF NOT EXISTS {SEARCH_INDEX_TABLE}_{entity}_au AFTER UPDATE{update_of} ON {table_name} "
+                f"BEGIN {delete_old} {insert_new} {dependents} END"
+            )
+            statements.append(
+                f"CREATE TRIGGER IF NOT EXISTS {SEARCH_INDEX_TABLE}_{entity}_ad AFTER DELETE ON {table_name} "
+                f"BEGIN {delete_old} END"
+            )
+        return statements
+
+    @staticmethod
+    def ensure(db: Session) -> bool:
+        """
+        Legt Index und Trigger bei Bedarf an und befüllt den Index einmalig
+
+        Args:
+            db: Datenbank-Session
+
+        Returns:
+            True, wenn der FTS-Index verwendet werden kann
+        """
+        engine = db.get_bind()
+        key = str(engine.url)
+        ready = SearchIndexService._ready.get(key)
+        if ready is not None:
+            return ready
+
+        with SearchIndexService._lock:
+            if key in SearchIndexService._ready:
+                return SearchIndexService._ready[key]
+
+            if engine.dialect.name != "sqlite":
+                SearchIndexService._ready[key] = False
+                return False
+
+            try:
+                with engine.begin() as conn:
+                    exists = conn.execute(
+                        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                        {"name": SEARCH_INDEX_TABLE}
+                    ).first()
+                    for statement in SearchIndexService._ddl_statements():
+                        conn.execute(text(statement))
+                    if not exists:
+                        SearchIndexService._populate(conn)
+                SearchIndexService._ready[key] = True
+            except Exception as e:
+                # z.B. SQLite ohne FTS5 oder ohne trigram-Tokenizer (< 3.34)
+                logger.warning(f"Search index unavailable, falling back to LIKE search: {e}")
+                SearchIndexService._ready[key] = False
+
+        return SearchIndexService._ready[key]
+
+    @staticmethod
+    def _populate(conn) -> None:
+        """Befüllt den Index vollständig aus den Quelltabellen"""
+        conn.execute(text(f"DELETE FROM {SEARCH_INDEX_TABLE}"))
+        for entity, spec in SearchIndexService._entities().items():
+            conn.execute(text(
+                SearchIndexService._insert_prefix()
+                + SearchIndexService._row_select(entity, spec, "r")
+                + f" FROM {spec['model'].__tablename__} AS r"
+            ))
+        logger.info("Search index populated")
+
+    @staticmethod
+    def rebuild(db: Session) -> None:
+        """
+        Baut den Index vollständig neu auf (z.B. nach Restore eines Backups)
+
+        Args:
+            db: Datenbank-Session
+        """
+        if not SearchIndexService.ensure(db):
+            return
+        with db.get_bind().begin() as conn:
+            SearchIndexService._populate(conn)
+
+    @staticmethod
+    def invalidate() -> None:
+        """Erzwingt eine erneute Prüfung von Index und Triggern beim nächsten Zugriff"""
+        with SearchIndexService._lock:
+            SearchIndexService._ready.clear()
+
+    # ===== Suche =====
+
+    @staticmethod
+    def matching_ids(
+        db: Session,
+        event_id: int,
+        entity: str,
+        term: str,
+        columns: Sequence[str] = SEARCH_COLUMNS
+    ):
+        """
+        Liefert eine Subquery mit den IDs aller Treffer
+
+        Verwendung: query.filter(Model.id.in_(SearchIndexService.matching_ids(...)))
+
+        Args:
+            db: Datenbank-Session
+            event_id: ID des Events
+            entity: participant, family, payment, income oder expense
+            term: Suchbegriff (Teilstring, Groß-/Kleinschreibung egal)
+            columns: Zu durchsuchende Spalten (Teilmenge von SEARCH_COLUMNS)
+
+        Returns:
+            Select mit einer ID-Spalte
+        """
+        term = (term or "").strip()
+
+        if not SearchIndexService.ensure(db):
+            spec = SearchIndexService._entities()[entity]
+            model = spec["model"]
+            fields = [field for name in columns for field in spec["fallback"][name]]
+            return select(model.id).where(
+                model.event_id == event_id,
+                or_(*[field.ilike(f"%{term}%") for field in fields])
+            )
+
+        if len(term) >= MIN_MATCH_LENGTH:
+            # Phrase mit Spaltenfilter, z.B. {title details} : "müller"
+            phrase = '"' + term.replace('"', '""') + '"'
+            condition = literal_column(SEARCH_INDEX_TABLE).match(f"{{{' '.join(columns)}}} : {phrase}")
+        else:
+            condition = or_(*[search_index.c[name].like(f"%{term}%") for name in columns])
+
+        return select(search_index.c.entity_id).where(
+            search_index.c.entity == entity,
+            search_index.c.event_id == event_id,
+            condition
+        )
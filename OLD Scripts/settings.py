@@ -16,6 +16,7 @@ from app.utils.error_handler import handle_db_exception
 from app.utils.flash import flash
 from app.schemas import SettingUpdateSchema
 from app.templates_config import templates
+from app.services.balance_ledger import BalanceLedgerService
 
 logger = logging.getLogger(__name__)
 
@@ -47,7 +48,7 @@ def _get_or_create_setting(db: Session, event_id: int) -> Setting:
 
 
 @router.get("/", response_class=HTMLResponse)
-async def view_settings(
+def view_settings(
     request: Request,
     db: Session = Depends(get_db),
     event_id: int = Depends(get_current_event_id)
@@ -86,7 +87,7 @@ async def view_settings(
 
 
 @router.get("/edit", response_class=HTMLResponse)
-async def edit_settings_form(
+def edit_settings_form(
     request: Request,
     db: Session = Depends(get_db),
     event_id: int = Depends(get_current_event_id)
@@ -112,7 +113,7 @@ async def edit_settings_form(
 
 
 @router.post("/edit", response_class=HTMLResponse)
-async def update_settings(
+def update_settings(
     request: Request,
     db: Session = Depends(get_db),
     event_id: int = Depends(get_current_event_id),
@@ -199,7 +200,7 @@ async def update_settings(
 
 
 @router.post("/categories/rename")
-async def rename_category(
+def rename_category(
     request: Request,
     db: Session = Depends(get_db),
     event_id: int = Depends(get_current_event_id),
@@ -245,7 +246,7 @@ async def rename_category(
 
 
 @router.post("/categories/delete")
-async def delete_category(
+def delete_category(
     request: Request,
     db: Session = Depends(get_db),
     event_id: int = Depends(get_current_event_id),
@@ -278,7 +279,7 @@ async def delete_category(
 
 
 @router.post("/categories/add")
-async def add_category(
+def add_category(
     request: Request,
     db: Session = Depends(get_db),
     event_id: int = Depends(get_current_event_id),
@@ -312,6 +313,7 @@ async def add_category(
             is_settled=False
         )
         db.add(dummy_expense)
+        BalanceLedgerService.expense_changed(db, event_id, new=BalanceLedgerService.snapshot_expense(dummy_expense))
         db.commit()
 
         logger.info(f"Added new category '{name}' for event {event_id}")
@@ -0,0 +1,308 @@
+"""Subsidy (Zuschuss) Calculator Service"""
+import logging
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Any, List, Optional, Iterable, Tuple
+from sqlalchemy.orm import Session, joinedload
+
+from app.services.ruleset_cache import RulesetCache
+
+logger = logging.getLogger(__name__)
+
+
+def age_at(reference_date: date, birth_date: date) -> int:
+    """Alter am Stichtag (z.B. Event-Start)"""
+    age = reference_date.year - birth_date.year
+    if (reference_date.month, reference_date.day) < (birth_date.month, birth_date.day):
+        age -= 1
+    return age
+
+
+def expected_subsidy_total(ruleset, start_date: date, participants: Iterable[Tuple]) -> float:
+    """
+    Summe aller erwarteten Zuschüsse (rollenbasiert + Familienrabatt) aus einfachen Zeilen
+
+    Gemeinsame Berechnung für SubsidyCalculator.total() und die Dashboard-
+    Kennzahlen, damit beide mit dem Zuschüsse-Tab übereinstimmen.
+
+    Args:
+        ruleset: Kompiliertes Regelwerk
+        start_date: Event-Start (Stichtag für das Alter)
+        participants: Aktive Teilnehmer als Tupel (ID, Geburtsdatum, Familien-ID,
+            hat manuellen Preis, kleingeschriebener Rollenname der Event-Rolle oder None),
+            sortiert nach ID
+
+    Returns:
+        Gerundete Summe in Euro
+    """
+    if not ruleset:
+        return 0.0
+
+    participants = list(participants)
+
+    # Zuschussberechtigte Rollen des Regelwerks
+    eligible_roles = {
+        role_name.lower(): role_config
+        for role_name, role_config in (ruleset.role_discounts or {}).items()
+        if role_config.get("subsidy_eligible", True)
+    }
+    family_enabled = bool(ruleset.family_discount and ruleset.family_discount.get("enabled", False))
+
+    # Geschwisterposition je Familie (nach Geburtsdatum sortiert)
+    members_by_family = defaultdict(list)
+    for participant_id, birth_date, family_id, _, _ in participants:
+        if family_id:
+            members_by_family[family_id].append((birth_date, participant_id))
+    positions = {}
+    for members in members_by_family.values():
+        members.sort(key=lambda member: member[0])
+        for position, (_, participant_id) in enumerate(members, start=1):
+            positions[participant_id] = position
+
+    total_subsidies = 0.0
+    for participant_id, birth_date, family_id, has_override, role_key in participants:
+        if has_override:
+            continue
+
+        age = age_at(start_date, birth_date)
+        base_price = None
+
+        role_config = eligible_roles.get(role_key) if role_key else None
+        if role_config:
+            base_price = ruleset.get_base_price(age)
+            total_subsidies += base_price * (role_config.get("discount_percent", 0) / 100)
+
+        # Familienrabatt nur für Kinder unter 18
+        if family_enabled and family_id and age < 18:
+            if base_price is None:
+                base_price = ruleset.get_base_price(age)
+            discount_percent = ruleset.get_family_discount_percent(age, positions.get(participant_id, 1))
+            subsidy_amount = base_price * (discount_percent / 100)
+            if subsidy_amount > 0:
+                total_subsidies += subsidy_amount
+
+    return round(total_subsidies, 2)
+
+
+class SubsidyCalculator:
+    """
+    Berechnet rollenbasierte Zuschüsse und Kinderrabatte für ein ganzes Event
+
+    Lädt Event, Regelwerk, Rollen und alle aktiven Teilnehmer genau einmal,
+    gruppiert die Teilnehmer nach Familie und ermittelt die Geschwisterposition
+    (nach Geburtsdatum) in einem Durchlauf statt mit einer Query pro Kind.
+
+    Berücksichtigt nur:
+    - Rollen mit subsidy_eligible=true (für die Gesamtsumme)
+    - Teilnehmer ohne manual_price_override
+    - Kinder unter 18 für Familienrabatte
+    """
+
+    def __init__(self, db: Session, event_id: int):
+        from app.models import Event, Role, Participant
+
+        self.db = db
+        self.event_id = event_id
+        self.event = db.query(Event).filter(Event.id == event_id).first()
+        self.ruleset = None
+        self._participants = []
+        self._family_positions = {}
+        self._roles_by_name = {}
+
+        if not self.event:
+            return
+
+        # Aktives Ruleset für das Event finden (kompiliert, aus dem Cache)
+        self.ruleset = RulesetCache.get_active(db, event_id, valid_on=self.event.start_date)
+
+        if not self.ruleset:
+            return
+
+        # Aktive Rollen nach (kleingeschriebenem) Namen indexieren
+        roles = db.query(Role).filter(
+            Role.event_id == event_id,
+            Role.is_active == True
+        ).order_by(Role.id).all()
+        for role in roles:
+            self._roles_by_name.setdefault(role.name.lower(), role)
+
+        # Alle aktiven Teilnehmer einmalig laden
+        self._participants = db.query(Participant).options(
+            joinedload(Participant.family)
+        ).filter(
+            Participant.event_id == event_id,
+            Participant.is_active == True
+        ).order_by(Participant.id).all()
+
+        # Geschwisterposition je Familie (nach Geburtsdatum sortiert) in einem Durchlauf
+        members_by_family = defaultdict(list)
+        for participant in self._participants:
+            if participant.family_id:
+                members_by_family[participant.family_id].append(participant)
+
+        for members in members_by_family.values():
+            members.sort(key=lambda p: p.birth_date)
+            for position, member in enumerate(members, start=1):
+                self._family_positions[member.id] = position
+
+    @property
+    def age_groups(self) -> List[Dict[str, Any]]:
+        return list(self.ruleset.age_groups) if self.ruleset else []
+
+    def _participant_entry(self, participant, age: int, base_price: float, subsidy_amount: float) -> Dict[str, Any]:
+        return {
+            "participant_id": participant.id,
+            "full_name": participant.full_name,
+            "name": participant.full_name,
+            "birth_date": participant.birth_date,
+            "age": age,
+            "family_name": participant.family.name if participant.family else None,
+            "base_price": base_price,
+            "subsidy_amount": subsidy_amount
+        }
+
+    def find_role_config(self, role) -> Optional[Dict[str, Any]]:
+        """
+        Sucht die Konfiguration einer Rolle im Regelwerk (Groß-/Kleinschreibung egal)
+
+        Args:
+            role: Role-Objekt
+
+        Returns:
+            Rollenkonfiguration oder None
+        """
+        if not self.ruleset:
+            return None
+
+        return self.ruleset.get_role_config(role.name)
+
+    def role_subsidy(self, role, role_config: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Berechnet den Rollenzuschuss für alle Teilnehmer einer Rolle
+
+        Args:
+            role: Role-Objekt
+            role_config: Rollenkonfiguration aus dem Regelwerk
+
+        Returns:
+            Dictionary mit Teilnehmerliste und (ungerundeten) Summen
+        """
+        discount_percent = role_config.get("discount_percent", 0)
+        participants_data = []
+        total_base_price = 0.0
+        total_subsidy = 0.0
+
+        for participant in self._participants:
+            if participant.role_id != role.id or participant.manual_price_override is not None:
+                continue
+
+            age = age_at(self.event.start_date, participant.birth_date)
+            base_price = self.ruleset.get_base_price(age)
+            subsidy_amount = base_price * (discount_percent / 100)
+
+            participants_data.append(self._participant_entry(participant, age, base_price, subsidy_amount))
+            total_base_price += base_price
+            total_subsidy += subsidy_amount
+
+        return {
+            "role_id": role.id,
+            "role_name": role.name,
+            "role_display_name": role.display_name,
+            "participants": participants_data,
+            "total_base_price": total_base_price,
+            "total_subsidy": total_subsidy
+        }
+
+    def role_subsidies(self) -> List[Dict[str, Any]]:
+        """
+        Berechnet die Zuschüsse aller zuschussberechtigten Rollen
+
+        Returns:
+            Liste der Rollenzuschüsse (in Reihenfolge des Regelwerks)
+        """
+        if not self.ruleset or not self.ruleset.role_discounts:
+            return []
+
+        result = []
+        for role_name, role_config in self.ruleset.role_discounts.items():
+            if not role_config.get("subsidy_eligible", True):
+                continue
+
+            role = self._roles_by_name.get(role_name.lower())
+            if not role:
+                continue
+
+            result.append(self.role_subsidy(role, role_config))
+        return result
+
+    def family_discount_enabled(self) -> bool:
+        return bool(self.ruleset and self.ruleset.family_discount and self.ruleset.family_discount.get("enabled", False))
+
+    def family_subsidy(self) -> Dict[str, Any]:
+        """
+        Berechnet die Kinderrabatte (Familienrabatt) aller Kinder unter 18
+
+        Returns:
+            Dictionary mit Teilnehmerliste (nur Einträge mit Zuschuss) und (ungerundeten) Summen
+        """
+        participants_data = []
+        total_base_price = 0.0
+        total_subsidy = 0.0
+
+        if not self.family_discount_enabled():
+            return {"participants": participants_data, "total_base_price": 0.0, "total_subsidy": 0.0}
+
+        for participant in self._participants:
+            if not participant.family_id or participant.manual_price_override is not None:
+                continue
+
+            age = age_at(self.event.start_date, participant.birth_date)
+
+            # Nur Kinder unter 18
+            if age >= 18:
+                continue
+
+            base_price = self.ruleset.get_base_price(age)
+            child_position = self._family_positions.get(participant.id, 1)
+
+            family_discount_percent = self.ruleset.get_family_discount_percent(age, child_position)
+
+            subsidy_amount = base_price * (family_discount_percent / 100)
+
+            # Wenn kein Familienrabatt, überspringe diesen Teilnehmer
+            if subsidy_amount == 0:
+                continue
+
+            participants_data.append(self._participant_entry(participant, age, base_price, subsidy_amount))
+            total_base_price += base_price
+            total_subsidy += subsidy_amount
+
+        return {
+            "participants": participants_data,
+            "total_base_price": total_base_price,
+            "total_subsidy": total_subsidy
+        }
+
+    def total(self) -> float:
+        """
+        Summe aller erwarteten Zuschüsse (rollenbasiert + Familienrabatt)
+
+        Returns:
+            Gerundete Summe in Euro
+        """
+        if not self.ruleset:
+            return 0.0
+
+        # Regelwerk-Rollen werden der ersten aktiven Event-Rolle gleichen Namens zugeordnet
+        role_keys = {role.id: role_name for role_name, role in self._roles_by_name.items()}
+
+        return expected_subsidy_total(self.ruleset, self.event.start_date, [
+            (
+                participant.id,
+                participant.birth_date,
+                participant.family_id,
+                participant.manual_price_override is not None,
+                role_keys.get(participant.role_id)
+            )
+            for participant in self._participants
+        ])
@@ -12,6 +12,11 @@ from app.dependencies import get_current_event_id
 from app.utils.flash import flash
 from app.utils.datetime_utils import utcnow
 from app.templates_config import templates
+from app.services.balance_ledger import (
+    BalanceLedger, BalanceLedgerService, SCOPE_PARTICIPANT,
+    PAYMENT_STATUS_OUTSTANDING, PAYMENT_STATUS_TOLERANCE
+)
+from app.services.payment_allocation import PaymentAllocationService
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/tasks", tags=["tasks"])
@@ -54,7 +59,7 @@ def is_task_completed(completed_tasks: set, task_type: str, reference_id: int) -
 
 
 @router.get("/", response_class=HTMLResponse)
-async def list_tasks(request: Request, db: Session = Depends(get_db), event_id: int = Depends(get_current_event_id)):
+def list_tasks(request: Request, db: Session = Depends(get_db), event_id: int = Depends(get_current_event_id)):
     """Liste aller offenen Aufgaben"""
     logger.info(f"Loading tasks list for event {event_id}")
 
@@ -114,38 +119,42 @@ async def list_tasks(request: Request, db: Session = Depends(get_db), event_id:
                 "amount": expense.amount
             })
 
-    # 3. Offene Zahlungseingänge (Teilnehmer mit ausstehenden Zahlungen)
-    participants_with_payments = db.query(
+    # 3. Offene Zahlungseingänge (persistierter Zahlungsstatus aus dem Balance-Ledger,
+    #    inkl. anteiliger Familienzahlungen - nur die offenen Teilnehmer werden geladen)
+    BalanceLedgerService.get_event_balance(db, event_id)
+    participants_outstanding = db.query(
         Participant.id,
         Participant.first_name,
         Participant.last_name,
-        Participant.calculated_price,
-        Participant.manual_price_override,
-        func.coalesce(func.sum(Payment.amount), 0).label("total_paid")
-    ).outerjoin(
-        Payment, Payment.participant_id == Participant.id
+        BalanceLedger.total_paid,
+        BalanceLedger.outstanding
+    ).join(
+        BalanceLedger, and_(
+            BalanceLedger.event_id == event_id,
+            BalanceLedger.scope == SCOPE_PARTICIPANT,
+            BalanceLedger.reference_id == Participant.id
+        )
     ).filter(
         Participant.event_id == event_id,
-        Participant.is_active == True
-    ).group_by(
-        Participant.id
+        Participant.is_active == True,
+        BalanceLedger.payment_status == PAYMENT_STATUS_OUTSTANDING
+    ).order_by(
+        Participant.last_name, Participant.id
     ).all()
 
-    for participant in participants_with_payments:
-        final_price = float(participant.manual_price_override if participant.manual_price_override is not None else participant.calculated_price)
-        total_paid = float(participant.total_paid)
-        outstanding = final_price - total_paid
-
-        if outstanding > 0.01:  # Nur wenn mehr als 1 Cent ausstehend
-            if not is_task_completed(completed_tasks, "outstanding_payment", participant.id):
-                tasks["outstanding_payments"].append({
-                    "id": participant.id,
-                    "title": f"{participant.first_name} {participant.last_name}",
-                    "description": f"Ausstehend: {outstanding:.2f}€ (von {final_price:.2f}€)",
-                    "link": f"/participants/{participant.id}",
-                    "task_type": "outstanding_payment",
-                    "amount": outstanding
-                })
+    for participant in participants_outstanding:
+        outstanding = float(participant.outstanding)
+        final_price = float(participant.total_paid) + outstanding
+
+        if not is_task_completed(completed_tasks, "outstanding_payment", participant.id):
+            tasks["outstanding_payments"].append({
+                "id": participant.id,
+                "title": f"{participant.first_name} {participant.last_name}",
+                "description": f"Ausstehend: {outstanding:.2f}€ (von {final_price:.2f}€)",
+                "link": f"/participants/{participant.id}",
+                "task_type": "outstanding_payment",
+                "amount": outstanding
+            })
 
     # 7. Manuelle Preisanpassungen prüfen
     participants_with_override = db.query(Participant).filter(
@@ -181,13 +190,9 @@ async def list_tasks(request: Request, db: Session = Depends(get_db), event_id:
 
     # 10. Zuschuss-Validierung (prüfe ob Einnahmen mit Rabatten übereinstimmen)
     # Hole das Regelwerk für diesen Event
-    from app.models import Ruleset
-    from app.services.price_calculator import PriceCalculator
+    from app.services.ruleset_cache import RulesetCache
 
-    ruleset = db.query(Ruleset).filter(
-        Ruleset.event_id == event_id,
-        Ruleset.is_active == True
-    ).first()
+    ruleset = RulesetCache.get_active(db, event_id)
 
     # Hole alle Einnahmen mit Rollenverknüpfung
     role_incomes = db.query(
@@ -217,13 +222,12 @@ async def list_tasks(request: Request, db: Session = Depends(get_db), event_id:
         expected_discounts = 0.0
         if ruleset and ruleset.age_groups:
             role_discounts = ruleset.role_discounts or {}
-            age_groups = ruleset.age_groups or []
 
             for participant in participants_with_role:
                 # Berechne die tatsächlich gewährten Rollenrabatte (egal ob calculated oder manual_price_override)
                 if participant.age_at_event is not None:
                     # Berechne Basispreis aus Altersgruppen
-                    base_price = PriceCalculator._get_base_price_by_age(participant.age_at_event, age_groups)
+                    base_price = ruleset.get_base_price(participant.age_at_event)
 
                     # Hole Rollenrabatt-Prozentsatz
                     role_name_lower = participant.role.name.lower() if participant.role else ""
@@ -269,12 +273,6 @@ async def list_tasks(request: Request, db: Session = Depends(get_db), event_id:
 
         expected_family_discounts = 0.0
         if ruleset and ruleset.family_discount:
-            from app.models import Family
-            from app.services.price_calculator import PriceCalculator
-
-            family_discount_config = ruleset.family_discount or {}
-            age_groups = ruleset.age_groups or []
-
             # Gruppiere Kinder nach Familie
             families_dict = {}
             for participant in children_participants:
@@ -293,13 +291,12 @@ async def list_tasks(request: Request, db: Session = Depends(get_db), event_id:
                     child_position = idx + 1  # 1 = ältestes Kind, 2 = zweites, etc.
 
                     # Berechne Basispreis
-                    base_price = PriceCalculator._get_base_price_by_age(participant.age_at_event, age_groups)
+                    base_price = ruleset.get_base_price(participant.age_at_event)
 
                     # Ermittle Familienrabatt-Prozentsatz
-                    family_discount_percent = PriceCalculator._get_family_discount(
+                    family_discount_percent = ruleset.get_family_discount_percent(
                         participant.age_at_event,
-                        child_position,
-                        family_discount_config
+                        child_position
                     )
 
                     if family_discount_percent > 0:
@@ -325,11 +322,7 @@ async def list_tasks(request: Request, db: Session = Depends(get_db), event_id:
                 })
 
     # 11. Rollenüberschreitungen (zu viele Teilnehmer einer Rolle zugewiesen)
-    from app.models import Ruleset
-    ruleset = db.query(Ruleset).filter(
-        Ruleset.event_id == event_id,
-        Ruleset.is_active == True
-    ).first()
+    # Regelwerk aus Abschnitt 10 wiederverwenden (kompiliert, aus dem Cache)
 
     if ruleset and ruleset.role_discounts:
         # Durchlaufe alle Rollen mit max_count im Regelwerk
@@ -464,7 +457,7 @@ async def list_tasks(request: Request, db: Session = Depends(get_db), event_id:
 
 
 @router.post("/complete")
-async def complete_task(
+def complete_task(
     request: Request,
     task_type: str = Form(...),
     reference_id: int = Form(...),
@@ -505,7 +498,9 @@ async def complete_task(
     if task_type == "expense_reimbursement":
         expense = db.query(Expense).filter(Expense.id == reference_id).first()
         if expense:
+            old_snapshot = BalanceLedgerService.snapshot_expense(expense)
             expense.is_settled = True
+            BalanceLedgerService.expense_changed(db, event_id, old_snapshot, BalanceLedgerService.snapshot_expense(expense))
             logger.info(f"Marked expense {expense.id} as settled")
 
     # Spezielle Behandlung für outstanding_payment
@@ -513,14 +508,10 @@ async def complete_task(
     if task_type == "outstanding_payment":
         participant = db.query(Participant).filter(Participant.id == reference_id).first()
         if participant:
-            # Berechne ausstehenden Betrag
-            final_price = float(participant.final_price)
-            total_paid = float(db.query(func.sum(Payment.amount)).filter(
-                Payment.participant_id == participant.id
-            ).scalar() or 0)
-            outstanding = final_price - total_paid
-
-            if outstanding > 0.01:  # Nur wenn mehr als 1 Cent ausstehend
+            # Ausstehender Betrag wie in der Aufgabenliste (inkl. anteiliger Familienzahlungen)
+            outstanding = PaymentAllocationService.for_participant(db, participant)["outstanding"]
+
+            if outstanding > PAYMENT_STATUS_TOLERANCE:  # Nur wenn mehr als 1 Cent ausstehend
                 # Erstelle automatisch einen Zahlungseingang
                 new_payment = Payment(
                     amount=outstanding,
@@ -532,6 +523,8 @@ async def complete_task(
                     participant_id=participant.id
                 )
                 db.add(new_payment)
+                db.flush()
+                BalanceLedgerService.payment_changed(db, event_id, None, BalanceLedgerService.snapshot_payment(new_payment))
                 logger.info(f"Automatically created payment of {outstanding}€ for participant {participant.id}")
 
     db.commit()
@@ -542,7 +535,7 @@ async def complete_task(
 
 
 @router.post("/uncomplete")
-async def uncomplete_task(
+def uncomplete_task(
     request: Request,
     task_type: str = Form(...),
     reference_id: int = Form(...),
@@ -567,7 +560,9 @@ async def uncomplete_task(
         if task_type == "expense_reimbursement":
             expense = db.query(Expense).filter(Expense.id == reference_id).first()
             if expense:
+                old_snapshot = BalanceLedgerService.snapshot_expense(expense)
                 expense.is_settled = False
+                BalanceLedgerService.expense_changed(db, event_id, old_snapshot, BalanceLedgerService.snapshot_expense(expense))
                 logger.info(f"Marked expense {expense.id} as not settled")
 
         db.commit()
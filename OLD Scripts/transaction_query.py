@@ -0,0 +1,503 @@
+"""Transaction Query Service - gefilterte Transaktionshistorie (Zahlungen, Einnahmen, Ausgaben) als Stream"""
+import base64
+import json
+import logging
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Optional, Iterator, Dict, Any, List, Tuple
+
+from sqlalchemy import select, func, literal, union_all, case, and_, or_
+from sqlalchemy.orm import Session
+
+from app.services.search_index import SearchIndexService, SEARCH_COLUMNS
+from app.services.balance_ledger import BalanceLedgerService
+
+logger = logging.getLogger(__name__)
+
+# Anzeigenamen in Exporten
+TYPE_LABELS = {
+    "payment": "Zahlungseingang",
+    "income": "Sonstige Einnahme",
+    "expense": "Ausgabe"
+}
+
+# Reihenfolge der Buchungsarten bei gleichem Datum (Teil des Sortierschlüssels)
+TYPE_RANKS = {
+    "payment": 0,
+    "income": 1,
+    "expense": 2
+}
+
+# Zeilen pro Fetch beim Streamen
+STREAM_BATCH_SIZE = 500
+
+# Seitengröße der Historie (Keyset-Pagination)
+HISTORY_PAGE_SIZE = 50
+
+
+def _parse_date(value: Optional[str], name: str) -> Optional[date]:
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        logger.warning(f"Invalid {name} format: {value}")
+        return None
+
+
+@dataclass(frozen=True)
+class TransactionFilter:
+    """Filter der Transaktionshistorie (wie in der Historie und den Exporten)"""
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    transaction_type: Optional[str] = None
+    min_amount: Optional[float] = None
+    max_amount: Optional[float] = None
+    search: Optional[str] = None
+
+    @classmethod
+    def from_params(
+        cls,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        transaction_type: Optional[str] = None,
+        min_amount: Optional[float] = None,
+        max_amount: Optional[float] = None,
+        search: Optional[str] = None
+    ) -> "TransactionFilter":
+        """Erstellt den Filter aus Query-Parametern (ungültige Datumswerte werden ignoriert)"""
+        return cls(
+            date_from=_parse_date(date_from, "date_from"),
+            date_to=_parse_date(date_to, "date_to"),
+            transaction_type=transaction_type or None,
+            min_amount=min_amount,
+            max_amount=max_amount,
+            search=search or None
+        )
+
+    def includes(self, transaction_type: str) -> bool:
+        return not self.transaction_type or self.transaction_type == transaction_type
+
+
+class TransactionQueryService:
+    """
+    Eine Abfrage für Historie, Excel-, CSV- und PDF-Export
+
+    Zahlungen, Einnahmen und Ausgaben werden per UNION ALL zusammengeführt.
+    Alle Filter (Datum, Betrag, Typ, Volltextsuche über den FTS-Index),
+    die Sortierung und für die Exporte der laufende Saldo (SUM() OVER)
+    laufen in SQL. Die Zeilen werden mit stream_results/yield_per blockweise
+    gelesen, damit auch große Historien nie vollständig im Speicher liegen.
+
+    Die Seiten der Historie kommen ohne Fensterfunktion aus: Keyset-Bedingung
+    und LIMIT stehen in jedem Zweig des UNION ALL, der Saldo der ersten Zeile
+    ist der Gesamtsaldo (Ledger bzw. eine Summe), jede weitere Zeile zieht den
+    Betrag der vorherigen ab. Der Cursor trägt den Saldo zur nächsten Seite.
+
+    Ausgaben haben negative Beträge; Betragsfilter gelten für den Betrag der
+    einzelnen Buchung (ohne Vorzeichen). Reihenfolge bei gleichem Datum:
+    Zahlungen, Einnahmen, Ausgaben, jeweils nach ID.
+    """
+
+    @staticmethod
+    def _union(
+        db: Session,
+        event_id: int,
+        filters: TransactionFilter,
+        before: Optional[Tuple[date, int, int]] = None,
+        limit: Optional[int] = None
+    ):
+        """
+        UNION ALL der drei Buchungsarten mit allen Filtern (None, wenn der Typ-Filter alles ausschließt)
+
+        Mit limit liefert jeder Zweig nur seine neuesten limit Zeilen (optional
+        älter als before), sortiert über Datum und ID - die Seite einer
+        Buchungsart kann so über einen Index gelesen werden, statt alle Treffer
+        zu sortieren.
+        """
+        from app.models import Payment, Income, Expense, Participant, Family
+
+        def apply_keyset(statement, date_column, model, entity: str):
+            rank = TYPE_RANKS[entity]
+            if before:
+                before_date, before_rank, before_id = before
+                # Der Typ-Rang ist je Zweig konstant, die Keyset-Bedingung vereinfacht sich
+                if rank < before_rank:
+                    statement = statement.where(date_column <= before_date)
+                elif rank == before_rank:
+                    statement = statement.where(or_(
+                        date_column < before_date,
+                        and_(date_column == before_date, model.id < before_id)
+                    ))
+                else:
+                    statement = statement.where(date_column < before_date)
+            return statement.order_by(date_column.desc(), model.id.desc()).limit(limit)
+
+        def apply_filters(statement, amount_column, date_column, model, entity: str, search_columns=SEARCH_COLUMNS):
+            if filters.date_from:
+                statement = statement.where(date_column >= filters.date_from)
+            if filters.date_to:
+                statement = statement.where(date_column <= filters.date_to)
+            if filters.min_amount is not None:
+                statement = statement.where(amount_column >= filters.min_amount)
+            if filters.max_amount is not None:
+                statement = statement.where(amount_column <= filters.max_amount)
+            if filters.search:
+                statement = statement.where(model.id.in_(
+                    SearchIndexService.matching_ids(db, event_id, entity, filters.search, search_columns)
+                ))
+            if limit:
+                statement = apply_keyset(statement, date_column, model, entity)
+            return statement
+
+        selects = []
+
+        if filters.includes("payment"):
+            selects.append(apply_filters(
+                select(
+                    Payment.id.label("id"),
+                    literal("payment").label("type"),
+                    literal(TYPE_RANKS["payment"]).label("type_rank"),
+                    Payment.amount.label("amount"),
+                    Payment.payment_date.label("transaction_date"),
+                    Payment.payment_method.label("method"),
+                    Payment.reference.label("reference"),
+                    Payment.notes.label("description"),
+                    Participant.first_name.label("participant_first_name"),
+                    Participant.last_name.label("participant_last_name"),
+                    Family.name.label("family_name"),
+                    Payment.created_at.label("created_at"),
+                    literal(None).label("receipt_file_path")  # Zahlungseingänge haben keine Belege
+                ).outerjoin(
+                    Participant, Payment.participant_id == Participant.id
+                ).outerjoin(
+                    Family, Payment.family_id == Family.id
+                ).where(
+                    Payment.event_id == event_id
+                ),
+                Payment.amount, Payment.payment_date, Payment, "payment"
+            ))
+
+        if filters.includes("income"):
+            selects.append(apply_filters(
+                select(
+                    Income.id.label("id"),
+                    literal("income").label("type"),
+                    literal(TYPE_RANKS["income"]).label("type_rank"),
+                    Income.amount.label("amount"),
+                    Income.date.label("transaction_date"),
+                    literal(None).label("method"),
+                    Income.name.label("reference"),
+                    Income.description.label("description"),
+                    literal(None).label("participant_first_name"),
+                    literal(None).label("participant_last_name"),
+                    literal(None).label("family_name"),
+                    literal(None).label("created_at"),
+                    Income.receipt_file_path.label("receipt_file_path")
+                ).where(
+                    Income.event_id == event_id
+                ),
+                Income.amount, Income.date, Income, "income", ("title", "details")
+            ))
+
+        if filters.includes("expense"):
+            selects.append(apply_filters(
+                select(
+                    Expense.id.label("id"),
+                    literal("expense").label("type"),
+                    literal(TYPE_RANKS["expense"]).label("type_rank"),
+                    (Expense.amount * -1).label("amount"),  # Negativ für Ausgaben
+                    Expense.expense_date.label("transaction_date"),
+                    Expense.category.label("method"),
+                    Expense.title.label("reference"),
+                    Expense.description.label("description"),
+                    literal(None).label("participant_first_name"),
+                    literal(None).label("participant_last_name"),
+                    literal(None).label("family_name"),
+                    Expense.created_at.label("created_at"),
+                    Expense.receipt_file_path.label("receipt_file_path")
+                ).where(
+                    Expense.event_id == event_id
+                ),
+                Expense.amount, Expense.expense_date, Expense, "expense", ("title", "details")
+            ))
+
+        if not selects:
+            return None
+        if limit:
+            # ORDER BY/LIMIT je Zweig sind in SQLite nur in Subqueries erlaubt
+            selects = [select(branch.subquery()) for branch in selects]
+        return union_all(*selects).subquery("transactions")
+
+    @staticmethod
+    def _with_balance(db: Session, event_id: int, filters: TransactionFilter):
+        """Subquery der gefilterten Transaktionen mit laufendem Saldo (chronologisch über alle Treffer)"""
+        transactions = TransactionQueryService._union(db, event_id, filters)
+        if transactions is None:
+            return None
+
+        chronological = (transactions.c.transaction_date, transactions.c.type_rank, transactions.c.id)
+        running_balance = func.sum(transactions.c.amount).over(order_by=chronological)
+        return select(transactions, running_balance.label("running_balance")).subquery("history")
+
+    @staticmethod
+    def statement(db: Session, event_id: int, filters: TransactionFilter, newest_first: bool = False):
+        """
+        Gefilterte Transaktionen mit laufendem Saldo
+
+        Args:
+            db: Datenbank-Session
+            event_id: ID des Events
+            filters: Filter der Historie
+            newest_first: Neueste zuerst statt chronologisch
+
+        Returns:
+            Select oder None, wenn der Typ-Filter alle Buchungsarten ausschließt
+        """
+        history = TransactionQueryService._with_balance(db, event_id, filters)
+        if history is None:
+            return None
+
+        chronological = (history.c.transaction_date, history.c.type_rank, history.c.id)
+        order = [column.desc() for column in chronological] if newest_first else list(chronological)
+        return select(history).order_by(*order)
+
+    @staticmethod
+    def _row_dict(row, running_balance: float) -> Dict[str, Any]:
+        return {
+            "id": row.id,
+            "type": row.type,
+            "type_label": TYPE_LABELS.get(row.type, row.type),
+            "amount": float(row.amount or 0),
+            "transaction_date": row.transaction_date,
+            "method": row.method,
+            "reference": row.reference,
+            "description": row.description,
+            "participant_name": (
+                f"{row.participant_first_name} {row.participant_last_name}"
+                if row.participant_first_name else None
+            ),
+            "family_name": row.family_name,
+            "created_at": row.created_at,
+            "receipt_available": bool(row.receipt_file_path),
+            "running_balance": running_balance
+        }
+
+    @staticmethod
+    def stream(
+        db: Session,
+        event_id: int,
+        filters: TransactionFilter,
+        newest_first: bool = False,
+        batch_size: int = STREAM_BATCH_SIZE
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Liest die gefilterten Transaktionen blockweise
+
+        Args:
+            db: Datenbank-Session
+            event_id: ID des Events
+            filters: Filter der Historie
+            newest_first: Neueste zuerst (Historie) statt chronologisch (Exporte)
+            batch_size: Zeilen pro Fetch
+
+        Yields:
+            Dict mit id, type, type_label, amount (float), transaction_date, method,
+            reference, description, participant_name, family_name, created_at,
+            receipt_available und running_balance
+        """
+        statement = TransactionQueryService.statement(db, event_id, filters, newest_first)
+        if statement is None:
+            return
+
+        result = db.execute(statement, execution_options={"stream_results": True, "yield_per": batch_size})
+        try:
+            for row in result:
+                yield TransactionQueryService._row_dict(row, float(row.running_balance or 0))
+        finally:
+            result.close()
+
+    @staticmethod
+    def encode_cursor(transaction: Dict[str, Any]) -> str:
+        """Cursor der nächsten Seite aus der letzten angezeigten Transaktion (inkl. Saldo davor)"""
+        values = [
+            transaction["transaction_date"].isoformat(),
+            TYPE_RANKS[transaction["type"]],
+            transaction["id"],
+            round(transaction["running_balance"] - transaction["amount"], 2)
+        ]
+        return base64.urlsafe_b64encode(json.dumps(values).encode("utf-8")).decode("ascii")
+
+    @staticmethod
+    def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[Tuple[date, int, int], Optional[float]]]:
+        """
+        Dekodiert einen Cursor
+
+        Returns:
+            Tupel (Keyset (Datum, Typ-Rang, ID), Saldo der nächsten Zeile oder None)
+            oder None bei leerem oder ungültigem Cursor
+        """
+        if not cursor:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+            transaction_date, type_rank, transaction_id = values[:3]
+            keyset = (date.fromisoformat(transaction_date), int(type_rank), int(transaction_id))
+            balance = float(values[3]) if len(values) > 3 else None
+            return keyset, balance
+        except (ValueError, TypeError, IndexError):
+            return None
+
+    @staticmethod
+    def _older_total(db: Session, event_id: int, filters: TransactionFilter, before: Tuple[date, int, int]) -> float:
+        """Summe aller Treffer, die älter als before sind (Saldo, falls der Cursor keinen enthält)"""
+        transactions = TransactionQueryService._union(db, event_id, filters)
+        if transactions is None:
+            return 0.0
+
+        before_date, before_rank, before_id = before
+        older = or_(
+            transactions.c.transaction_date < before_date,
+            and_(transactions.c.transaction_date == before_date, transactions.c.type_rank < before_rank),
+            and_(
+                transactions.c.transaction_date == before_date,
+                transactions.c.type_rank == before_rank,
+                transactions.c.id < before_id
+            )
+        )
+        return float(db.execute(
+            select(func.coalesce(func.sum(transactions.c.amount), 0)).where(older)
+        ).scalar() or 0)
+
+    @staticmethod
+    def net_total(db: Session, event_id: int, filters: TransactionFilter) -> float:
+        """
+        Saldo aller Treffer
+
+        Ohne Filter aus dem Event-Eintrag des Balance-Ledgers, sonst eine Summe
+        über die gefilterten Transaktionen.
+        """
+        if filters == TransactionFilter():
+            ledger = BalanceLedgerService.get_event_balance(db, event_id)
+            if ledger is not None:
+                return float(ledger.payments_total or 0) + float(ledger.incomes_total or 0) \
+                    - float(ledger.expenses_total or 0)
+        return TransactionQueryService.totals(db, event_id, filters)["net_total"]
+
+    @staticmethod
+    def page(
+        db: Session,
+        event_id: int,
+        filters: TransactionFilter,
+        cursor: Optional[str] = None,
+        page_size: int = HISTORY_PAGE_SIZE,
+        net_total: Optional[float] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Eine Seite der Historie (neueste zuerst, Keyset-Pagination)
+
+        Args:
+            db: Datenbank-Session
+            event_id: ID des Events
+            filters: Filter der Historie
+            cursor: Cursor der vorherigen Seite (None für die erste Seite)
+            page_size: Transaktionen pro Seite
+            net_total: Saldo aller Treffer, falls bereits bekannt (erste Seite)
+
+        Returns:
+            Tupel (Transaktionen wie bei stream(), Cursor der nächsten Seite oder None)
+        """
+        decoded = TransactionQueryService.decode_cursor(cursor)
+        before, balance = decoded if decoded else (None, None)
+
+        transactions = TransactionQueryService._union(db, event_id, filters, before=before, limit=page_size + 1)
+        if transactions is None:
+            return [], None
+
+        newest_first = (
+            transactions.c.transaction_date.desc(),
+            transactions.c.type_rank.desc(),
+            transactions.c.id.desc()
+        )
+        rows = db.execute(select(transactions).order_by(*newest_first).limit(page_size + 1)).all()
+        if not rows:
+            return [], None
+
+        # Saldo der neuesten Zeile der Seite: Gesamtsaldo bzw. Saldo aus dem Cursor
+        if balance is None:
+            if before:
+                balance = TransactionQueryService._older_total(db, event_id, filters, before)
+            elif net_total is not None:
+                balance = net_total
+            else:
+                balance = TransactionQueryService.net_total(db, event_id, filters)
+
+        page = []
+        for row in rows[:page_size]:
+            transaction = TransactionQueryService._row_dict(row, round(balance, 2))
+            page.append(transaction)
+            balance -= transaction["amount"]
+
+        next_cursor = TransactionQueryService.encode_cursor(page[-1]) if len(rows) > page_size else None
+        return page, next_cursor
+
+    @staticmethod
+    def categories(db: Session, event_id: int, filters: TransactionFilter) -> List[Dict[str, Any]]:
+        """
+        Summen nach Kategorie (ein GROUP BY über die gefilterten Transaktionen)
+
+        Einnahmen werden nach Buchungsart gruppiert, Ausgaben nach Kategorie
+        (ohne Kategorie: "Sonstiges").
+
+        Returns:
+            Liste von Dicts mit name, type (income/expense), total (positiv) und count,
+            absteigend nach Summe
+        """
+        transactions = TransactionQueryService._union(db, event_id, filters)
+        if transactions is None:
+            return []
+
+        amount = transactions.c.amount
+        is_income = amount > 0
+        kind = case((is_income, literal("income")), else_=literal("expense")).label("kind")
+        name = case((is_income, transactions.c.type), else_=func.coalesce(transactions.c.method, "Sonstiges")).label("name")
+        total = func.sum(func.abs(amount)).label("total")
+
+        rows = db.execute(
+            select(kind, name, total, func.count().label("count"))
+            .group_by(kind, name)
+            .order_by(total.desc())
+        ).all()
+
+        return [
+            {"name": row.name, "type": row.kind, "total": float(row.total or 0), "count": row.count}
+            for row in rows
+        ]
+
+    @staticmethod
+    def totals(db: Session, event_id: int, filters: TransactionFilter) -> Dict[str, Any]:
+        """
+        Summen der gefilterten Transaktionen (eine Aggregat-Abfrage, z.B. für Kopfzeilen vor dem Stream)
+
+        Returns:
+            Dict mit total_income, total_expenses, net_total und count
+        """
+        transactions = TransactionQueryService._union(db, event_id, filters)
+        if transactions is None:
+            return {"total_income": 0.0, "total_expenses": 0.0, "net_total": 0.0, "count": 0}
+
+        amount = transactions.c.amount
+        row = db.execute(select(
+            func.coalesce(func.sum(case((amount > 0, amount), else_=0)), 0).label("total_income"),
+            func.coalesce(func.sum(case((amount < 0, -amount), else_=0)), 0).label("total_expenses"),
+            func.count().label("count")
+        )).one()
+
+        total_income = float(row.total_income)
+        total_expenses = float(row.total_expenses)
+        return {
+            "total_income": total_income,
+            "total_expenses": total_expenses,
+            "net_total": total_income - total_expenses,
+            "count": row.count
+        }